@@ -0,0 +1,155 @@
+"""
+Benchmark de concorrência: latência sob carga mista, sessão síncrona vs assíncrona
+
+Dispara, no mesmo event loop e a uma taxa fixa, requisições rápidas
+(GET /investors/{id}) misturadas com requisições pesadas
+(POST /calculate-fees/by-date) e mede p50/p99 de cada tipo em dois modos:
+
+    bloqueante: serviços executados direto com Session síncrona no event loop
+                (comportamento anterior à camada assíncrona)
+    async:      AsyncSession (aiosqlite) via get_db, como em produção
+
+Uso:
+    python benchmarks/bench_concurrency.py
+    python benchmarks/bench_concurrency.py --movements 200000 --requests 400 --rate 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.database import Base, get_db
+from database.models import Investor, Stock, Movement
+from services.position_service import PositionService
+from main import app
+
+START = datetime(2024, 1, 1)
+
+
+class BlockingSession:
+    """Imita o caminho antigo: executa o serviço na hora, com I/O síncrono no event loop"""
+
+    def __init__(self, session):
+        self.session = session
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return fn(self.session, *args, **kwargs)
+
+
+def seed(path: str, investors: int, movements: int) -> None:
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    rng = random.Random(3)
+    db.bulk_insert_mappings(Investor, [{"name": f"Investidor {i}", "email": f"inv{i}@email.com"} for i in range(investors)])
+    db.bulk_insert_mappings(Stock, [{"symbol": f"FUND{i:02d}", "name": f"Fundo {i}"} for i in range(4)])
+    db.bulk_insert_mappings(Movement, [
+        {
+            "investor_id": rng.randint(1, investors),
+            "stock_id": rng.randint(1, 4),
+            "stock_value_cents": rng.randint(5000, 20000),
+            "date_of_occurrence": START + timedelta(minutes=rng.randint(0, 365 * 24 * 60))
+        }
+        for _ in range(movements)
+    ])
+    db.commit()
+    PositionService().rebuild(db)
+    db.close()
+    engine.dispose()
+
+
+def percentile(samples, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def run_load(requests: int, rate: float, heavy_ratio: float, investors: int) -> dict:
+    """Carga em malha aberta: a requisição i é disparada em i / rate segundos e a
+    latência conta a partir desse instante, incluindo a espera pelo event loop"""
+    rng = random.Random(5)
+    plan = ["heavy" if rng.random() < heavy_ratio else "light" for _ in range(requests)]
+    latencies = {"light": [], "heavy": []}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+
+        async def one(index: int, kind: str):
+            scheduled = start + index / rate
+            await asyncio.sleep(max(0.0, scheduled - loop.time()))
+            if kind == "heavy":
+                response = await client.post("/calculate-fees/by-date", json={
+                    "calculation_date": (START + timedelta(days=rng.randint(30, 364))).isoformat(), "taxa": 0.01
+                })
+            else:
+                response = await client.get(f"/investors/{rng.randint(1, investors)}")
+            response.raise_for_status()
+            latencies[kind].append((loop.time() - scheduled) * 1000)
+
+        await asyncio.gather(*(one(index, kind) for index, kind in enumerate(plan)))
+        elapsed = loop.time() - start
+
+    return {
+        "throughput_rps": round(requests / elapsed, 1),
+        **{
+            kind: {
+                "count": len(samples),
+                "p50_ms": round(statistics.median(samples), 2),
+                "p99_ms": round(percentile(samples, 0.99), 2)
+            }
+            for kind, samples in latencies.items() if samples
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--movements", type=int, default=50_000)
+    parser.add_argument("--investors", type=int, default=2_000)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--rate", type=float, default=100.0, help="Requisições disparadas por segundo")
+    parser.add_argument("--heavy-ratio", type=float, default=0.1)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "concurrency.db")
+    seed(path, args.investors, args.movements)
+
+    sync_factory = sessionmaker(bind=create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False}))
+    async_factory = async_sessionmaker(bind=create_async_engine(f"sqlite+aiosqlite:///{path}"), expire_on_commit=False)
+
+    async def blocking_get_db():
+        db = sync_factory()
+        try:
+            yield BlockingSession(db)
+        finally:
+            db.close()
+
+    async def async_get_db():
+        async with async_factory() as db:
+            yield db
+
+    results = {}
+    for mode, dependency in (("bloqueante", blocking_get_db), ("async", async_get_db)):
+        app.dependency_overrides[get_db] = dependency
+        try:
+            results[mode] = asyncio.run(run_load(args.requests, args.rate, args.heavy_ratio, args.investors))
+        finally:
+            app.dependency_overrides.pop(get_db, None)
+
+    print(json.dumps({"parameters": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
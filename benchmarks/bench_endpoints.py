@@ -0,0 +1,315 @@
+"""
+Suíte de benchmarks dos endpoints da API
+
+Mede /calculate-fees com dias x investidores crescentes (e /calculate-fees/batch
+com os quatro fundos contra quatro chamadas separadas) e os endpoints que
+dependem do banco (/calculate-fees/by-date, /by-investor, portfólio e
+listagens paginadas) contra bancos sintéticos de tamanhos diferentes, gerados
+por init_database.generate_synthetic_data. As requisições passam pelo
+TestClient, então o custo medido inclui validação, roteamento e serialização.
+
+Para cada cenário são registrados vazão, latências p50/p99 e o pico de RSS do
+processo, em JSON, para que execuções diferentes possam ser comparadas.
+
+Os bancos sintéticos são gravados em --data-dir e reaproveitados entre
+execuções (mesma semente, mesmos dados); gerar 10M de movimentações leva
+alguns minutos.
+
+Uso:
+    python benchmarks/bench_endpoints.py
+    python benchmarks/bench_endpoints.py --movements 10000 1000000 10000000 --output resultado.json
+    python benchmarks/bench_endpoints.py --only calculate-fees --sizes 10x100 250x10000
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.database import Base, get_db
+from init_database import generate_synthetic_data
+from services.investor_service import investor_cache
+from services.stock_service import stock_cache
+from services.portfolio_fee_service import fee_result_cache
+from main import app
+
+SEED = 42
+DAYS = 365
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_scenario(name: str, params: dict, request, iterations: int, warmup: int, before=None) -> dict:
+    """
+    Executa `request` (que recebe o número da iteração) e resume as latências
+
+    `before` roda antes de cada chamada, fora da medição (ex.: limpar caches).
+    """
+    for i in range(warmup):
+        if before:
+            before()
+        request(i)
+
+    latencies = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        if before:
+            before()
+        t0 = time.perf_counter()
+        request(i)
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    result = {
+        "scenario": name,
+        "params": params,
+        "iterations": iterations,
+        "throughput_rps": round(iterations / sum(latencies), 2),
+        "wall_time_s": round(elapsed, 3),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+    print(f"{name:32} {json.dumps(params):48} p50 {result['p50_ms']:10.2f} ms  p99 {result['p99_ms']:10.2f} ms  "
+          f"{result['throughput_rps']:9.1f} req/s  rss {result['peak_rss_mb']:.0f} MB", file=sys.stderr)
+    return result
+
+
+def checked(response):
+    if response.status_code != 200:
+        raise RuntimeError(f"{response.request.method} {response.request.url}: {response.status_code} {response.text[:200]}")
+    return response
+
+
+def clear_caches():
+    investor_cache.clear()
+    stock_cache.clear()
+    fee_result_cache.clear()
+
+
+def seeded_database(data_dir: str, movements: int) -> tuple:
+    """Caminho do banco sintético com `movements` movimentações (gerado se não existir)"""
+    path = os.path.join(data_dir, f"sparta_bench_{movements}_s{SEED}.db")
+    investors = max(10, movements // 100)
+    if not os.path.exists(path):
+        print(f"gerando {path} ...", file=sys.stderr)
+        partial = path + ".tmp"
+        if os.path.exists(partial):
+            os.remove(partial)
+        engine = create_engine(f"sqlite:///{partial}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+        try:
+            generate_synthetic_data(db, movements, investors=investors, days=DAYS, seed=SEED)
+        finally:
+            db.close()
+            engine.dispose()
+        os.replace(partial, path)
+    return path, investors
+
+
+def bench_calculate_fees(client: TestClient, sizes: list, iterations: int, warmup: int) -> list:
+    results = []
+    for size in sizes:
+        dias, investidores = (int(x) for x in size.lower().split("x"))
+        rng = random.Random(SEED)
+        payload = {
+            "taxa": 0.01,
+            "cotas": [
+                {"valor": round(rng.uniform(90, 110), 4), "quantidades": [round(rng.uniform(0, 1000), 2) for _ in range(investidores)]}
+                for _ in range(dias)
+            ]
+        }
+        body = json.dumps(payload)
+        results.append(run_scenario(
+            "POST /calculate-fees", {"dias": dias, "investidores": investidores},
+            lambda i: checked(client.post("/calculate-fees", content=body, headers={"content-type": "application/json"})),
+            iterations, warmup
+        ))
+    return results
+
+
+def bench_calculate_fees_batch(client: TestClient, sizes: list, iterations: int, warmup: int) -> list:
+    """Os quatro fundos Sparta em uma chamada a /calculate-fees/batch contra quatro chamadas a /calculate-fees"""
+    results = []
+    for size in sizes:
+        dias, investidores = (int(x) for x in size.lower().split("x"))
+        rng = random.Random(SEED)
+        grupos = [
+            {
+                "fundo": fundo,
+                "taxa": taxa,
+                "cotas": [
+                    {"valor": round(rng.uniform(90, 110), 4), "quantidades": [round(rng.uniform(0, 1000), 2) for _ in range(investidores)]}
+                    for _ in range(dias)
+                ]
+            }
+            for fundo, taxa in (("JURO11", 0.01), ("CDII11", 0.008), ("CRAA11", 0.012), ("DIVS11", 0.009))
+        ]
+        batch_body = json.dumps({"grupos": grupos})
+        single_bodies = [json.dumps({"taxa": grupo["taxa"], "cotas": grupo["cotas"]}) for grupo in grupos]
+        headers = {"content-type": "application/json"}
+        params = {"fundos": len(grupos), "dias": dias, "investidores": investidores}
+
+        results.append(run_scenario(
+            "POST /calculate-fees/batch", params,
+            lambda i: checked(client.post("/calculate-fees/batch", content=batch_body, headers=headers)),
+            iterations, warmup
+        ))
+        results.append(run_scenario(
+            "POST /calculate-fees (por fundo)", params,
+            lambda i: [checked(client.post("/calculate-fees", content=body, headers=headers)) for body in single_bodies],
+            iterations, warmup
+        ))
+    return results
+
+
+def bench_database(client: TestClient, movements: int, investors: int, iterations: int, warmup: int,
+                   warm_cache: bool) -> list:
+    params = {"movimentos": movements, "investidores": investors}
+    before = None if warm_cache else clear_caches
+    rng = random.Random(SEED)
+    investor_ids = [rng.randint(1, investors) for _ in range(max(iterations, warmup))]
+    dates = [f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T23:59:59" for _ in range(max(iterations, warmup))]
+    results = []
+
+    results.append(run_scenario(
+        "POST /calculate-fees/by-date", params,
+        lambda i: checked(client.post("/calculate-fees/by-date", json={"calculation_date": dates[i], "taxa": 0.01})),
+        iterations, warmup, before
+    ))
+    results.append(run_scenario(
+        "POST /calculate-fees/by-investor", params,
+        lambda i: checked(client.post("/calculate-fees/by-investor", json={"investor_id": investor_ids[i], "taxa": 0.01})),
+        iterations, warmup, before
+    ))
+    results.append(run_scenario(
+        "GET /investors/{id}/portfolio", params,
+        lambda i: checked(client.get(f"/investors/{investor_ids[i]}/portfolio")),
+        iterations, warmup, before
+    ))
+    results.append(run_scenario(
+        "GET /investors", {**params, "limit": 100},
+        lambda i: checked(client.get("/investors", params={"limit": 100})),
+        iterations, warmup, before
+    ))
+    results.append(run_scenario(
+        "GET /movements", {**params, "limit": 100},
+        lambda i: checked(client.get("/movements", params={"limit": 100})),
+        iterations, warmup, before
+    ))
+    results.append(run_scenario(
+        "GET /movements/investor/{id}", params,
+        lambda i: checked(client.get(f"/movements/investor/{investor_ids[i]}")),
+        iterations, warmup, before
+    ))
+
+    # Paginação profunda: cada iteração segue o cursor a partir de onde a anterior parou
+    cursor = {"next": None}
+
+    def next_page(i):
+        query = {"limit": 1000}
+        if cursor["next"]:
+            query["cursor"] = cursor["next"]
+        cursor["next"] = checked(client.get("/movements", params=query)).json()["next_cursor"]
+
+    results.append(run_scenario("GET /movements (cursor)", {**params, "limit": 1000}, next_page, iterations, warmup))
+    return results
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", default=["10x100", "100x1000", "250x10000"],
+                        help="Tamanhos de /calculate-fees no formato DIASxINVESTIDORES")
+    parser.add_argument("--movements", nargs="+", type=int, default=[10000],
+                        help="Tamanhos dos bancos sintéticos (ex.: 10000 1000000 10000000)")
+    parser.add_argument("--only", choices=["calculate-fees", "database"], help="Executa apenas um grupo de cenários")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--warm-cache", action="store_true",
+                        help="Mantém os caches entre requisições (por padrão são limpos antes de cada uma)")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "sparta_bench"))
+    parser.add_argument("--output", help="Arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    results = []
+    client = TestClient(app)
+
+    if args.only in (None, "calculate-fees"):
+        results += bench_calculate_fees(client, args.sizes, args.iterations, args.warmup)
+        results += bench_calculate_fees_batch(client, args.sizes, args.iterations, args.warmup)
+
+    if args.only in (None, "database"):
+        os.makedirs(args.data_dir, exist_ok=True)
+        for movements in args.movements:
+            path, investors = seeded_database(args.data_dir, movements)
+            engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+            factory = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+            async def override_get_db():
+                async with factory() as db:
+                    yield db
+
+            app.dependency_overrides[get_db] = override_get_db
+            try:
+                results += bench_database(client, movements, investors, args.iterations, args.warmup, args.warm_cache)
+            finally:
+                app.dependency_overrides.pop(get_db, None)
+                clear_caches()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "warm_cache": args.warm_cache,
+            "seed": SEED,
+        },
+        "results": results,
+    }
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark de escalabilidade do cálculo de taxas por investidor
+
+Gera posições sintéticas em memória e mede
+PortfolioFeeService.calculate_fees_partitioned com 1..N workers, conferindo
+que o resultado é idêntico ao da execução serial.
+
+Uso:
+    python benchmarks/bench_fee_parallel.py
+    python benchmarks/bench_fee_parallel.py --investors 200000 --stocks 8 --executor thread
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.portfolio_fee_service import PortfolioFeeService, get_fee_executor
+
+
+def build_positions(investors: int, stocks: int):
+    rng = random.Random(13)
+    start = datetime(2025, 1, 1)
+    return [
+        (investor_id, [
+            {
+                'investor_id': investor_id,
+                'investor_name': f"Investidor {investor_id}",
+                'stock_id': stock_id,
+                'stock_symbol': f"FUND{stock_id:02d}",
+                'stock_name': f"Fundo {stock_id}",
+                'total_value_cents': rng.randint(10000, 10000000),
+                'movements_count': rng.randint(1, 50),
+                'last_date_of_occurrence': start + timedelta(minutes=rng.randint(0, 500000))
+            }
+            for stock_id in range(1, rng.randint(1, stocks) + 1)
+        ])
+        for investor_id in range(1, investors + 1)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--investors", type=int, default=100_000)
+    parser.add_argument("--stocks", type=int, default=4)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--executor", choices=["process", "thread"], default="process")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    investor_positions = build_positions(args.investors, args.stocks)
+    reference = PortfolioFeeService(workers=1).calculate_fees_partitioned(investor_positions, 0.01)
+
+    results = []
+    workers = 1
+    while workers <= args.max_workers:
+        service = PortfolioFeeService(workers=workers, executor=args.executor, parallel_min_investors=0)
+        if workers > 1:
+            get_fee_executor(args.executor, workers).submit(int).result()
+
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            fees = service.calculate_fees_partitioned(investor_positions, 0.01)
+            best = min(best, time.perf_counter() - start)
+
+        if fees != reference:
+            raise SystemExit(f"Resultado com {workers} workers difere da execução serial")
+
+        results.append({"workers": workers, "seconds": round(best, 4)})
+        workers *= 2
+
+    baseline = results[0]["seconds"]
+    for result in results:
+        result["speedup"] = round(baseline / result["seconds"], 2)
+
+    print(json.dumps({"parameters": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark do caminho de requisição de /calculate-fees
+
+Compara o caminho antigo (model.dict() -> nova validação -> lista de dicts)
+com o caminho tipado atual (modelo validado -> arrays -> serviço). Os dois
+caminhos terminam no mesmo motor vetorizado, então a diferença medida é só o
+custo de tratar a requisição.
+
+Uso:
+    python benchmarks/bench_fee_request.py
+    python benchmarks/bench_fee_request.py --sizes 10x100 250x10000 --repeat 5
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from controllers.fee_controller import FeeController
+from models.fee_models import FeeCalculationRequest
+from services.fee_calculation_service import FeeCalculationService
+
+
+def build_request(dias: int, investidores: int) -> FeeCalculationRequest:
+    rng = random.Random(42)
+    return FeeCalculationRequest(
+        taxa=0.01,
+        cotas=[
+            {"valor": rng.uniform(90, 110), "quantidades": [rng.uniform(0, 1000) for _ in range(investidores)]}
+            for _ in range(dias)
+        ]
+    )
+
+
+def legacy_path(service: FeeCalculationService, request_data: FeeCalculationRequest):
+    validated_request = FeeCalculationRequest(**request_data.model_dump())
+    cotas_data = [{"valor": cota.valor, "quantidades": cota.quantidades} for cota in validated_request.cotas]
+    return service.calculate_fees(validated_request.taxa, cotas_data)
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", default=["10x100", "100x1000", "250x10000"],
+                        help="Tamanhos no formato DIASxINVESTIDORES")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    service = FeeCalculationService()
+    controller = FeeController()
+    loop = asyncio.new_event_loop()
+
+    print(f"{'payload':>14} {'antigo (ms)':>12} {'tipado (ms)':>12} {'economia (ms)':>14} {'speedup':>8}")
+    for size in args.sizes:
+        dias, investidores = (int(x) for x in size.lower().split("x"))
+        request_data = build_request(dias, investidores)
+
+        legacy = best_of(lambda: legacy_path(service, request_data), args.repeat)
+        typed = best_of(lambda: loop.run_until_complete(controller.calculate_fees(request_data)), args.repeat)
+
+        print(f"{size:>14} {legacy * 1000:12.2f} {typed * 1000:12.2f} {(legacy - typed) * 1000:14.2f} {legacy / typed:7.1f}x")
+
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
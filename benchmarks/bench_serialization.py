@@ -0,0 +1,121 @@
+"""
+Benchmark do caminho rápido de serialização contra o caminho Pydantic
+
+Para cada endpoint com caminho rápido (GET /investors, GET /movements,
+GET /movements/investor/{id} e POST /calculate-fees/by-date), mede a mesma
+requisição com o caminho atual (objetos do ORM -> modelos Pydantic ->
+response_model) e com o rápido (tuplas -> TypeAdapter.dump_json), alternando
+o `fast_json` dos controladores. Confere que os dois caminhos retornam o mesmo
+JSON antes de medir. Usa os bancos sintéticos de bench_endpoints.py.
+
+Uso:
+    python benchmarks/bench_serialization.py
+    python benchmarks/bench_serialization.py --movements 1000000 --limit 1000 --output serializacao.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from bench_endpoints import seeded_database, run_scenario, checked, clear_caches
+from database.database import get_db
+import main
+
+CONTROLLERS = (main.investor_controller, main.movement_controller, main.portfolio_fee_controller)
+
+
+def set_fast_json(enabled: bool) -> None:
+    for controller in CONTROLLERS:
+        controller.fast_json = enabled
+
+
+def scenarios(limit: int, investor_id: int) -> list:
+    return [
+        ("GET /investors", {"limit": limit}, lambda client: client.get("/investors", params={"limit": limit})),
+        ("GET /movements", {"limit": limit}, lambda client: client.get("/movements", params={"limit": limit})),
+        ("GET /movements/investor/{id}", {"investor_id": investor_id},
+         lambda client: client.get(f"/movements/investor/{investor_id}")),
+        # Cache de resultados mantido: mede a serialização, não o cálculo
+        ("POST /calculate-fees/by-date", {},
+         lambda client: client.post("/calculate-fees/by-date", json={"calculation_date": "2025-01-01T00:00:00", "taxa": 0.01})),
+    ]
+
+
+def main_benchmark(movements: int, limit: int, iterations: int, warmup: int, data_dir: str) -> list:
+    path, investors = seeded_database(data_dir, movements)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    factory = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+    async def override_get_db():
+        async with factory() as db:
+            yield db
+
+    main.app.dependency_overrides[get_db] = override_get_db
+    client = TestClient(main.app)
+    results = []
+    try:
+        for name, params, request in scenarios(limit, investor_id=1):
+            params = {"movimentos": movements, **params}
+
+            bodies = {}
+            for fast in (False, True):
+                set_fast_json(fast)
+                bodies[fast] = checked(request(client)).json()
+            if bodies[False] != bodies[True]:
+                raise RuntimeError(f"{name}: caminhos de serialização retornam JSON diferente")
+
+            timings = {}
+            for fast in (False, True):
+                set_fast_json(fast)
+                path_name = "rapido" if fast else "pydantic"
+                timings[path_name] = run_scenario(f"{name} [{path_name}]", params,
+                                                  lambda i: checked(request(client)), iterations, warmup)
+            results.append({
+                "scenario": name,
+                "params": params,
+                "response_kb": round(len(json.dumps(bodies[True])) / 1024, 1),
+                "pydantic": timings["pydantic"],
+                "rapido": timings["rapido"],
+                "speedup_p50": round(timings["pydantic"]["p50_ms"] / timings["rapido"]["p50_ms"], 2),
+            })
+    finally:
+        set_fast_json(True)
+        main.app.dependency_overrides.pop(get_db, None)
+        clear_caches()
+    return results
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--movements", type=int, default=100000, help="Tamanho do banco sintético")
+    parser.add_argument("--limit", type=int, default=1000, help="Tamanho das páginas de /investors e /movements")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "sparta_bench"))
+    parser.add_argument("--output", help="Arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = main_benchmark(args.movements, args.limit, args.iterations, args.warmup, args.data_dir)
+    for result in results:
+        print(f"{result['scenario']:32} {result['speedup_p50']:5.2f}x p50", file=sys.stderr)
+
+    output = json.dumps({"timestamp": datetime.now().isoformat(timespec="seconds"), "results": results},
+                        indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,145 @@
+"""
+Benchmark da importação/exportação de planilhas (CSV e Excel)
+
+Gera planilhas de movimentações com --rows linhas em disco, importa cada uma
+por SpreadsheetService.import_movements (o mesmo caminho de POST
+/import/movements) em um banco novo e exporta as taxas por data
+(GET /export/fees). Registra linhas/s e o pico de RSS após cada etapa: com a
+leitura em modo read_only e a escrita linha a linha, o pico não deve crescer
+com o número de linhas.
+
+Uso:
+    python benchmarks/bench_spreadsheet.py
+    python benchmarks/bench_spreadsheet.py --rows 100000 1000000 --formats csv
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from database.database import Base, make_engine
+from database.models import Investor, Stock
+from models.portfolio_models import FeeCalculationByDateRequest
+from services.spreadsheet_service import SpreadsheetService, SPREADSHEET_FORMATS
+from services.investor_service import investor_cache
+from services.stock_service import stock_cache
+from services.portfolio_fee_service import fee_result_cache
+
+INVESTORS = 1000
+STOCKS = 20
+COLUMNS = ("investor_id", "stock_id", "stock_value", "date_of_occurrence")
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def generate_rows(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    for _ in range(count):
+        yield (rng.randint(1, INVESTORS), rng.randint(1, STOCKS), round(rng.uniform(50, 1000), 2),
+               start + timedelta(seconds=rng.randint(0, 365 * 24 * 3600)))
+
+
+def write_spreadsheet(path: str, file_format: str, count: int) -> None:
+    if file_format == "csv":
+        with open(path, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(COLUMNS)
+            for investor_id, stock_id, value, occurred_at in generate_rows(count):
+                writer.writerow((investor_id, stock_id, value, occurred_at.isoformat()))
+    else:
+        import openpyxl
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet("Movimentações")
+        sheet.append(COLUMNS)
+        for row in generate_rows(count):
+            sheet.append(row)
+        workbook.save(path)
+
+
+def run(file_format: str, rows: int, data_dir: str) -> dict:
+    spreadsheet = os.path.join(data_dir, f"movimentos_{rows}.{file_format}")
+    if not os.path.exists(spreadsheet):
+        print(f"gerando {spreadsheet} ...", file=sys.stderr)
+        write_spreadsheet(spreadsheet, file_format, rows)
+
+    database = os.path.join(data_dir, f"import_{file_format}_{rows}.db")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(database + suffix):
+            os.remove(database + suffix)
+    engine = make_engine(f"sqlite:///{database}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    investor_cache.clear()
+    stock_cache.clear()
+    fee_result_cache.clear()
+
+    service = SpreadsheetService()
+    try:
+        db.execute(insert(Investor), [{"name": f"Investidor {i}", "email": f"investidor{i}@example.com"}
+                                      for i in range(1, INVESTORS + 1)])
+        db.execute(insert(Stock), [{"symbol": f"BNCH{i:02d}", "name": f"Fundo {i}"} for i in range(1, STOCKS + 1)])
+        db.commit()
+
+        with open(spreadsheet, "rb") as file:
+            imported = service.import_movements(db, file, file_format, chunk_size=5000)
+        rss_import = peak_rss_mb()
+
+        with tempfile.TemporaryFile() as output:
+            request = FeeCalculationByDateRequest(calculation_date=datetime(2025, 1, 1), taxa=0.01)
+            exported = service.export_fees(db, request, file_format, output)
+        rss_export = peak_rss_mb()
+    finally:
+        db.close()
+        engine.dispose()
+
+    result = {
+        "format": file_format,
+        "rows": rows,
+        "file_mb": round(os.path.getsize(spreadsheet) / (1024 * 1024), 1),
+        "import": {key: imported[key] for key in ("inserted", "failed", "elapsed_seconds", "rows_per_second")},
+        "export": exported,
+        "peak_rss_mb_after_import": round(rss_import, 1),
+        "peak_rss_mb_after_export": round(rss_export, 1),
+    }
+    print(f"{file_format:5} {rows:9} linhas  importação {imported['rows_per_second']:10.1f} linhas/s  "
+          f"exportação {exported['rows_per_second']:10.1f} linhas/s  rss {rss_export:.0f} MB", file=sys.stderr)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", nargs="+", type=int, default=[10000, 100000])
+    parser.add_argument("--formats", nargs="+", choices=SPREADSHEET_FORMATS, default=list(SPREADSHEET_FORMATS))
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "sparta_spreadsheet"))
+    parser.add_argument("--output", help="Arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = [run(file_format, rows, args.data_dir) for file_format in args.formats for rows in sorted(args.rows)]
+
+    output = json.dumps({"timestamp": datetime.now().isoformat(timespec="seconds"), "results": results},
+                        indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
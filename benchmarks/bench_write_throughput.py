@@ -0,0 +1,319 @@
+"""
+Benchmark de escrita concorrente: create_movement com configurações de SQLite diferentes
+
+Cada perfil usa um banco novo, criado por make_engine com os PRAGMAs do
+perfil. Várias threads gravam movimentações ao mesmo tempo pelo
+MovementService (uma transação por movimento, como em POST /movements),
+enquanto threads leitoras consultam portfólios. Mede commits/s, p50/p99 das
+escritas e das leituras e quantas operações falharam (ex.: "database is locked").
+
+Perfis:
+    padrao:  PRAGMAs padrão do SQLite (journal DELETE, synchronous FULL)
+    wal:     journal_mode=WAL, synchronous=NORMAL
+    config:  PRAGMAs de config.py (WAL, NORMAL, mmap, cache e busy_timeout)
+    http:    a API de verdade: uvicorn com --http-workers processos e os PRAGMAs
+             de config.py, recebendo writers x writes POST /movements com até
+             --concurrency requisições simultâneas (caminho assíncrono do aiosqlite)
+
+Uso:
+    python benchmarks/bench_write_throughput.py
+    python benchmarks/bench_write_throughput.py --writers 16 --writes 100 --readers 4 --output escrita.json
+    python benchmarks/bench_write_throughput.py --profiles http --writers 10 --writes 20 --concurrency 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from sqlalchemy.orm import sessionmaker
+
+import database.database as database
+from database.database import Base, make_engine, default_sqlite_pragmas
+from init_database import generate_synthetic_data
+from models.portfolio_models import MovementCreate
+from services.movement_service import MovementService
+from services.investor_service import investor_cache
+from services.stock_service import stock_cache
+from services.portfolio_fee_service import fee_result_cache
+
+PROFILES = {
+    "padrao": {},
+    "wal": {"journal_mode": "WAL", "synchronous": "NORMAL"},
+    "config": default_sqlite_pragmas(),
+}
+
+HTTP_PROFILE = "http"
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+INVESTORS = 200
+STOCKS = 10
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, round(fraction * (len(sorted_values) - 1)))]
+
+
+def summarize(latencies: list) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "count": len(latencies),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def remove_database(path: str) -> None:
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def random_movement(rng: random.Random) -> dict:
+    return {
+        "investor_id": rng.randint(1, INVESTORS),
+        "stock_id": rng.randint(1, STOCKS),
+        "stock_value": round(rng.uniform(50, 1000), 2),
+        "date_of_occurrence": datetime(2025, 1, 1) + timedelta(minutes=rng.randint(0, 60 * 24 * 30))
+    }
+
+
+def print_result(result: dict) -> None:
+    print(f"{result['profile']:8} {result['commits_per_s']:9.1f} commits/s  escrita p50 {result['writes']['p50_ms']:8.2f} ms "
+          f"p99 {result['writes']['p99_ms']:8.2f} ms  leitura p99 {result['reads']['p99_ms']:8.2f} ms  "
+          f"erros {result['errors']}", file=sys.stderr)
+
+
+def run_profile(name: str, pragmas: dict, writers: int, writes: int, readers: int, data_dir: str) -> dict:
+    path = os.path.join(data_dir, f"write_{name}.db")
+    remove_database(path)
+
+    engine = make_engine(f"sqlite:///{path}", pragmas=pragmas, pool_size=writers + readers, max_overflow=0)
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = factory()
+    generate_synthetic_data(db, 10000, investors=INVESTORS, stocks=STOCKS, seed=11)
+    db.close()
+
+    investor_cache.clear()
+    stock_cache.clear()
+    fee_result_cache.clear()
+
+    service = MovementService()
+    write_latencies, read_latencies, errors = [], [], []
+    lock = threading.Lock()
+    writing = threading.Event()
+    writing.set()
+
+    def writer(worker: int):
+        rng = random.Random(worker)
+        session = factory()
+        try:
+            for _ in range(writes):
+                movement = MovementCreate(**random_movement(rng))
+                started = time.perf_counter()
+                try:
+                    service.create_movement(session, movement)
+                except Exception as e:
+                    session.rollback()
+                    with lock:
+                        errors.append(f"{type(e).__name__}: {str(e).splitlines()[0]}")
+                    continue
+                with lock:
+                    write_latencies.append(time.perf_counter() - started)
+        finally:
+            session.close()
+
+    def reader(worker: int):
+        rng = random.Random(1000 + worker)
+        session = factory()
+        try:
+            while writing.is_set():
+                started = time.perf_counter()
+                try:
+                    service.get_investor_portfolio_summary(session, rng.randint(1, INVESTORS))
+                    session.rollback()
+                except Exception as e:
+                    session.rollback()
+                    with lock:
+                        errors.append(f"{type(e).__name__}: {str(e).splitlines()[0]}")
+                    continue
+                with lock:
+                    read_latencies.append(time.perf_counter() - started)
+        finally:
+            session.close()
+
+    write_threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    read_threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+
+    started = time.perf_counter()
+    for thread in read_threads + write_threads:
+        thread.start()
+    for thread in write_threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    writing.clear()
+    for thread in read_threads:
+        thread.join()
+
+    with engine.connect() as connection:
+        applied = {pragma: connection.exec_driver_sql(f"PRAGMA {pragma}").scalar()
+                   for pragma in ("journal_mode", "synchronous", "busy_timeout")}
+    engine.dispose()
+
+    result = {
+        "profile": name,
+        "pragmas": applied,
+        "writers": writers,
+        "readers": readers,
+        "commits_per_s": round(len(write_latencies) / elapsed, 1),
+        "writes": summarize(write_latencies),
+        "reads": summarize(read_latencies),
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:3],
+    }
+    print_result(result)
+    return result
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def http_load(base_url: str, writers: int, writes: int, readers: int, concurrency: int) -> dict:
+    """Dispara writers x writes POST /movements (até `concurrency` simultâneos) enquanto `readers` leem portfólios"""
+    write_latencies, read_latencies, errors = [], [], []
+    limit = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency + readers, max_keepalive_connections=concurrency + readers)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        async def write(index: int):
+            movement = random_movement(random.Random(index))
+            movement["date_of_occurrence"] = movement["date_of_occurrence"].isoformat()
+            async with limit:
+                started = time.perf_counter()
+                response = await client.post("/movements", json=movement)
+            if response.status_code == 200:
+                write_latencies.append(time.perf_counter() - started)
+            else:
+                errors.append(f"{response.status_code}: {response.text[:120]}")
+
+        async def read(worker: int, done: asyncio.Event):
+            rng = random.Random(1000 + worker)
+            while not done.is_set():
+                started = time.perf_counter()
+                response = await client.get(f"/investors/{rng.randint(1, INVESTORS)}/portfolio")
+                if response.status_code == 200:
+                    read_latencies.append(time.perf_counter() - started)
+                else:
+                    errors.append(f"{response.status_code}: {response.text[:120]}")
+
+        done = asyncio.Event()
+        reader_tasks = [asyncio.create_task(read(i, done)) for i in range(readers)]
+        started = time.perf_counter()
+        await asyncio.gather(*(write(i) for i in range(writers * writes)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await asyncio.gather(*reader_tasks)
+
+    return {"elapsed": elapsed, "writes": write_latencies, "reads": read_latencies, "errors": errors}
+
+
+def run_http_profile(writers: int, writes: int, readers: int, data_dir: str, http_workers: int, concurrency: int) -> dict:
+    """Perfil http: sobe a API com uvicorn em um banco novo e mede POST /movements de ponta a ponta"""
+    path = os.path.join(data_dir, f"write_{HTTP_PROFILE}.db")
+    remove_database(path)
+
+    url = f"sqlite:///{path}"
+    database.engine = make_engine(url)
+    database.create_tables()
+    db = sessionmaker(autocommit=False, autoflush=False, bind=database.engine)()
+    generate_synthetic_data(db, 10000, investors=INVESTORS, stocks=STOCKS, seed=11)
+    db.close()
+    database.engine.dispose()
+
+    port = free_port()
+    env = dict(os.environ, SPARTA_DATABASE_URL=url, SPARTA_JOB_WORKERS="0")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(http_workers), "--log-level", "warning"],
+        cwd=PROJECT_DIR, env=env
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                if httpx.get(base_url + "/", timeout=1).status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            if server.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError("O servidor uvicorn não respondeu")
+            time.sleep(0.2)
+
+        load = asyncio.run(http_load(base_url, writers, writes, readers, concurrency))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    result = {
+        "profile": HTTP_PROFILE,
+        "pragmas": default_sqlite_pragmas(),
+        "http_workers": http_workers,
+        "concurrency": concurrency,
+        "readers": readers,
+        "commits_per_s": round(len(load["writes"]) / load["elapsed"], 1),
+        "writes": summarize(load["writes"]),
+        "reads": summarize(load["reads"]),
+        "errors": len(load["errors"]),
+        "error_samples": sorted(set(load["errors"]))[:3],
+    }
+    print_result(result)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", nargs="+", choices=sorted([*PROFILES, HTTP_PROFILE]), default=[*PROFILES, HTTP_PROFILE])
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--writes", type=int, default=100, help="Movimentações por thread escritora")
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--http-workers", type=int, default=2, help="Processos do uvicorn no perfil http")
+    parser.add_argument("--concurrency", type=int, default=200, help="Requisições simultâneas no perfil http")
+    parser.add_argument("--data-dir", default=tempfile.mkdtemp(prefix="sparta_write_"))
+    parser.add_argument("--output", help="Arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    results = [
+        run_http_profile(args.writers, args.writes, args.readers, args.data_dir, args.http_workers, args.concurrency)
+        if name == HTTP_PROFILE else
+        run_profile(name, PROFILES[name], args.writers, args.writes, args.readers, args.data_dir)
+        for name in args.profiles
+    ]
+
+    output = json.dumps({"timestamp": datetime.now().isoformat(timespec="seconds"), "results": results},
+                        indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Verifica que cada endpoint emite um número constante de comandos SQL
+
+Popula bancos SQLite em memória de tamanhos diferentes, chama cada endpoint
+via TestClient e compara a quantidade de comandos emitidos. Termina com
+código 1 se algum endpoint variar com o volume de dados (N+1).
+
+Uso:
+    python benchmarks/check_query_counts.py
+"""
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.database import Base, get_db
+from database.models import Investor, Stock, Movement
+from database.query_counter import count_queries
+from services.position_service import PositionService
+from services.investor_service import investor_cache
+from services.stock_service import stock_cache
+from services.portfolio_fee_service import fee_result_cache
+from main import app
+
+ENDPOINTS = [
+    ("GET", "/investors", None),
+    ("GET", "/investors/1", None),
+    ("GET", "/stocks", None),
+    ("GET", "/movements", None),
+    ("GET", "/movements/1", None),
+    ("GET", "/movements/investor/1", None),
+    ("GET", "/investors/1/portfolio", None),
+    ("POST", "/calculate-fees/by-date", {"calculation_date": "2025-06-30T23:59:59", "taxa": 0.01}),
+    ("POST", "/calculate-fees/by-investor", {"investor_id": 1, "taxa": 0.01}),
+]
+
+
+def seeded_session_factory(investors: int, stocks: int, movements: int) -> async_sessionmaker:
+    path = os.path.join(tempfile.mkdtemp(), "query_counts.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    rng = random.Random(7)
+    start = datetime(2025, 1, 1)
+    db = factory()
+    db.bulk_insert_mappings(Investor, [{"name": f"Investidor {i}", "email": f"inv{i}@email.com"} for i in range(investors)])
+    db.bulk_insert_mappings(Stock, [{"symbol": f"FUND{i:02d}", "name": f"Fundo {i}"} for i in range(stocks)])
+    db.bulk_insert_mappings(Movement, [
+        {
+            "investor_id": rng.randint(1, investors),
+            "stock_id": rng.randint(1, stocks),
+            "stock_value_cents": rng.randint(5000, 20000),
+            "date_of_occurrence": start + timedelta(minutes=rng.randint(0, 180 * 24 * 60))
+        }
+        for _ in range(movements)
+    ])
+    db.commit()
+    PositionService().rebuild(db)
+    db.close()
+    engine.dispose()
+
+    return async_sessionmaker(bind=create_async_engine(f"sqlite+aiosqlite:///{path}"), expire_on_commit=False)
+
+
+def measure(factory: async_sessionmaker) -> dict:
+    async def override_get_db():
+        async with factory() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    investor_cache.clear()
+    stock_cache.clear()
+    fee_result_cache.clear()
+    client = TestClient(app)
+    counts = {}
+    try:
+        for method, path, body in ENDPOINTS:
+            with count_queries(factory.kw["bind"].sync_engine) as counter:
+                response = client.request(method, path, json=body)
+            response.raise_for_status()
+            counts[f"{method} {path}"] = counter.count
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+    return counts
+
+
+def main():
+    small = measure(seeded_session_factory(investors=3, stocks=2, movements=20))
+    large = measure(seeded_session_factory(investors=200, stocks=20, movements=5000))
+
+    failed = False
+    for endpoint, count in small.items():
+        status = "ok" if count == large[endpoint] else "VARIA"
+        failed = failed or status != "ok"
+        print(f"{endpoint:40} {count:4} {large[endpoint]:4}  {status}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
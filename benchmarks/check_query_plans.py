@@ -0,0 +1,172 @@
+"""
+Regressão de planos de consulta da tabela de movimentações
+
+Popula um banco SQLite (1 milhão de movimentações por padrão) através das
+migrações Alembic, executa as consultas de cada serviço capturando o SQL
+emitido e roda EXPLAIN QUERY PLAN em cada uma. Termina com código 1 se
+alguma consulta varrer movements/position_snapshots (inclusive por índice)
+sem estar em ALLOWED_SCANS. A mesma verificação roda no pytest
+(tests/test_query_plans.py) quando SPARTA_QUERY_PLAN_ROWS está definida.
+
+Uso:
+    python benchmarks/check_query_plans.py
+    python benchmarks/check_query_plans.py --rows 100000 --db /tmp/plans.db
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+import database.database as database
+from database.models import Movement
+from models.portfolio_models import FeeCalculationByDateRequest, FeeCalculationByInvestorRequest
+from services.movement_service import MovementService
+from services.portfolio_fee_service import PortfolioFeeService
+from services.position_service import PositionService
+from services.pagination import encode_cursor
+
+FULL_SCAN = re.compile(r"^SCAN (TABLE )?(movements|position_snapshots)\b")
+
+# Varreduras aceitas, por consulta: a primeira página sem filtro percorre
+# ix_movements_date a partir do fim e para no LIMIT
+ALLOWED_SCANS = {
+    "get_movements_page": {"SCAN movements USING INDEX ix_movements_date"},
+}
+START = datetime(2020, 1, 1)
+
+
+def seed(engine, rows: int, investors: int, stocks: int) -> None:
+    rng = random.Random(11)
+    with engine.begin() as connection:
+        raw = connection.connection
+        raw.executemany("INSERT INTO investors (name, email) VALUES (?, ?)",
+                        [(f"Investidor {i}", f"inv{i}@email.com") for i in range(investors)])
+        raw.executemany("INSERT INTO stocks (symbol, name) VALUES (?, ?)",
+                        [(f"FUND{i:03d}", f"Fundo {i}") for i in range(stocks)])
+        raw.executemany(
+            "INSERT INTO movements (investor_id, stock_id, stock_value_cents, date_of_occurrence) VALUES (?, ?, ?, ?)",
+            (
+                (rng.randint(1, investors), rng.randint(1, stocks), rng.randint(5000, 20000),
+                 (START + timedelta(minutes=rng.randint(0, 5 * 365 * 24 * 60))).strftime("%Y-%m-%d %H:%M:%S.%f"))
+                for _ in range(rows)
+            )
+        )
+
+
+def service_queries():
+    movement_service = MovementService()
+    fee_service = PortfolioFeeService()
+    position_service = PositionService()
+    middle = START + timedelta(days=900)
+
+    return [
+        ("get_movements(investor_id)", lambda db: movement_service.get_movements(db, investor_id=7)),
+        ("get_movements(stock_id)", lambda db: movement_service.get_movements(db, stock_id=3)),
+        ("get_movements_page", lambda db: movement_service.get_movements_page(db, 50)),
+        ("get_movements_page(cursor)", lambda db: movement_service.get_movements_page(
+            db, 50, encode_cursor([middle.isoformat(), 1]))),
+        ("get_movements_count(investor_id)", lambda db: movement_service.get_movements_count(db, investor_id=7)),
+        ("get_movements_by_date_range", lambda db: movement_service.get_movements_by_date_range(
+            db, middle, middle + timedelta(days=1))),
+        ("get_investor_portfolio_summary", lambda db: movement_service.get_investor_portfolio_summary(db, 7)),
+        ("get_investor_portfolio_summary(as_of)", lambda db: movement_service.get_investor_portfolio_summary(
+            db, 7, datetime(2022, 6, 30, 12, 0))),
+        ("calculate_fees_by_investor", lambda db: fee_service.calculate_fees_by_investor(
+            db, FeeCalculationByInvestorRequest(investor_id=7, taxa=0.01))),
+        ("calculate_fees_by_date", lambda db: fee_service.calculate_fees_by_date(
+            db, FeeCalculationByDateRequest(calculation_date=middle, taxa=0.01))),
+        ("apply_movement", lambda db: position_service.apply_movement(db, Movement(
+            investor_id=7, stock_id=3, stock_value=100.0, date_of_occurrence=middle))),
+    ]
+
+
+def build_database(path: str, rows: int, investors: int, stocks: int):
+    """Cria o banco pelas migrações (se ainda não existir), popula e recria as posições"""
+    engine = create_engine(f"sqlite:///{path}")
+    database.engine = engine
+
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        database.create_tables()
+        seed(engine, rows, investors, stocks)
+        session = sessionmaker(bind=engine)()
+        PositionService().rebuild(session)
+        session.close()
+    return engine
+
+
+def collect_plans(engine) -> List[Tuple[str, List[List[str]], List[str]]]:
+    """
+    Executa as consultas de service_queries e coleta os planos de cada uma
+
+    Returns:
+        (nome, planos distintos, varreduras não permitidas) por consulta
+    """
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE")):
+            captured.append((statement, parameters))
+
+    results = []
+    session = sessionmaker(bind=engine)()
+    try:
+        for name, run in service_queries():
+            captured.clear()
+            event.listen(engine, "before_cursor_execute", capture)
+            try:
+                run(session)
+            finally:
+                event.remove(engine, "before_cursor_execute", capture)
+            session.rollback()
+
+            plans = []
+            for statement, parameters in captured:
+                plan = [row[3] for row in session.connection().exec_driver_sql(
+                    f"EXPLAIN QUERY PLAN {statement}", parameters
+                )]
+                if plan not in plans:
+                    plans.append(plan)
+
+            allowed = ALLOWED_SCANS.get(name, set())
+            scans = [line for plan in plans for line in plan if FULL_SCAN.match(line) and line not in allowed]
+            results.append((name, plans, scans))
+    finally:
+        session.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--investors", type=int, default=10_000)
+    parser.add_argument("--stocks", type=int, default=50)
+    parser.add_argument("--db", help="Arquivo SQLite a usar (padrão: arquivo temporário)")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), "query_plans.db")
+    print(f"Usando {path} ({args.rows} movimentações se precisar popular)...")
+    engine = build_database(path, args.rows, args.investors, args.stocks)
+
+    failed = False
+    for name, plans, scans in collect_plans(engine):
+        failed = failed or bool(scans)
+        print(f"[{'FALHA' if scans else 'ok'}] {name}")
+        for plan in plans:
+            for line in plan:
+                print(f"        {line}")
+            print()
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import argparse
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database.database import SessionLocal, create_tables
+from services.position_service import PositionService
+
+
+def print_differences(differences, table, limit):
+    print(f"{len(differences)} divergência(s) em {table}:")
+    for difference in differences[:limit]:
+        day = f", dia {difference['snapshot_date']}" if 'snapshot_date' in difference else ""
+        print(f"   - investidor {difference['investor_id']}, ação {difference['stock_id']}{day}: "
+              f"esperado {difference['expected']}, gravado {difference['actual']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Recalcula as posições correntes (position_totals) e os snapshots diários "
+                    "(position_snapshots) a partir das movimentações e lista as divergências"
+    )
+    parser.add_argument("--fix", action="store_true", help="Recria position_totals e os snapshots quando houver divergências")
+    parser.add_argument("--limit", type=int, default=20, help="Quantidade máxima de divergências exibidas por tabela")
+    args = parser.parse_args()
+
+    create_tables()
+    db = SessionLocal()
+    position_service = PositionService()
+
+    try:
+        total_differences = position_service.check_totals(db)
+        snapshot_differences = position_service.check_snapshots(db)
+        if not total_differences and not snapshot_differences:
+            print("Posições consistentes com o histórico de movimentações.")
+            return 0
+
+        if total_differences:
+            print_differences(total_differences, "position_totals", args.limit)
+        if snapshot_differences:
+            print_differences(snapshot_differences, "position_snapshots", args.limit)
+
+        if args.fix:
+            snapshots = position_service.rebuild(db)
+            print(f"Posições recriadas ({snapshots} snapshots).")
+            return 0
+        return 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,10 @@
 from fastapi import HTTPException
-from typing import List
+from typing import Dict, List, Tuple, AsyncIterator
+import json
+import numpy as np
 from services.fee_calculation_service import FeeCalculationService
-from models.fee_models import FeeCalculationRequest
+from services.metrics import stage
+from models.fee_models import FeeCalculationRequest, FeeCalculationBinaryRequest, FeeCalculationBatchRequest
 
 class FeeController:
     """Controller para requisições de cálculo de taxa de administração"""
@@ -9,29 +12,122 @@ class FeeController:
     def __init__(self):
         self.fee_service = FeeCalculationService()
     
-    async def calculate_fees(self, request_data: dict) -> List[float]:
+    async def calculate_fees(self, request_data: FeeCalculationRequest) -> List[float]:
         """
         Processa requisição de cálculo
-        
+
         Args:
-            request_data: Dados da requisição
-            
+            request_data: Requisição já validada pelo FastAPI
+
         Returns:
             Taxas calculadas
         """
         try:
+            with stage("decode"):
+                valores, quantidades = self._to_arrays(request_data)
 
-            validated_request = FeeCalculationRequest(**request_data)
-            
+            fees = self.fee_service.calculate_fees_array(request_data.taxa, valores, quantidades)
 
-            taxa = validated_request.taxa
-            cotas_data = [{"valor": cota.valor, "quantidades": cota.quantidades} for cota in validated_request.cotas]
-            
-            fees = self.fee_service.calculate_fees(taxa, cotas_data)
-            
             return fees
-            
+
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erro interno do servidor: {str(e)}")
+
+    async def calculate_fees_batch(self, request_data: FeeCalculationBatchRequest) -> Dict[str, List[float]]:
+        """
+        Processa requisição de cálculo com vários fundos, cada um com a sua taxa
+
+        Args:
+            request_data: Requisição já validada pelo FastAPI
+
+        Returns:
+            Taxas calculadas por fundo
+        """
+        try:
+            with stage("decode"):
+                grupos = [(grupo.taxa, *self._to_arrays(grupo)) for grupo in request_data.grupos]
+
+            fees = self.fee_service.calculate_fees_batch(grupos)
+
+            return {grupo.fundo: fundo_fees for grupo, fundo_fees in zip(request_data.grupos, fees)}
+
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erro interno do servidor: {str(e)}")
+
+    def _to_arrays(self, request_data: FeeCalculationRequest) -> Tuple[np.ndarray, np.ndarray]:
+        cotas = request_data.cotas
+        valores = np.fromiter((cota.valor for cota in cotas), dtype=np.float64, count=len(cotas))
+        quantidades = np.array([cota.quantidades for cota in cotas], dtype=np.float64)
+        return valores, quantidades
+
+    async def calculate_fees_binary(self, body: bytes) -> bytes:
+        """
+        Processa requisição de cálculo em formato binário colunar
+
+        Args:
+            body: Payload binário (ver FeeCalculationBinaryRequest)
+
+        Returns:
+            Taxas calculadas em float64 little-endian
+        """
+        try:
+            binary_request = FeeCalculationBinaryRequest.from_bytes(body)
+
+            fees = self.fee_service.calculate_fees_array(
+                binary_request.taxa, binary_request.valores, binary_request.quantidades
+            )
+
+            return FeeCalculationBinaryRequest.encode_fees(fees)
+
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erro interno do servidor: {str(e)}")
+
+    async def calculate_fees_stream(self, taxa: float, chunks: AsyncIterator[bytes]) -> List[float]:
+        """
+        Processa requisição de cálculo em streaming (NDJSON)
+
+        Args:
+            taxa: Taxa anual (ex: 0.01 = 1%)
+            chunks: Corpo da requisição em blocos; cada linha é {"valor": ..., "quantidades": [...]}
+
+        Returns:
+            Taxas calculadas
+        """
+        try:
+            if taxa < 0:
+                raise ValueError("Taxa deve ser não negativa")
+
+            accumulator = self.fee_service.create_accumulator(taxa)
+
+            async for line in self._iter_lines(chunks):
+                try:
+                    cota = json.loads(line)
+                    valor = cota["valor"]
+                    quantidades = cota["quantidades"]
+                    accumulator.add(valor, quantidades)
+                except (json.JSONDecodeError, TypeError, KeyError) as e:
+                    raise ValueError(f"Cota {accumulator.dias}: linha inválida ({e})")
+
+            return accumulator.result()
+
         except ValueError as e:
             raise HTTPException(status_code=400, detail=str(e))
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Erro interno do servidor: {str(e)}")
+
+    async def _iter_lines(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        buffer = b""
+        async for chunk in chunks:
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield line
+        if buffer.strip():
+            yield buffer
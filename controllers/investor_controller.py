@@ -1,30 +1,40 @@
 from fastapi import HTTPException, Depends
+from fastapi.responses import Response
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
 from database.database import get_db
 from services.investor_service import InvestorService
 from models.portfolio_models import InvestorCreate, InvestorResponse, InvestorListResponse
+from services.pagination import DEFAULT_PAGE_SIZE
+from controllers.streaming import ndjson_response
+from controllers.serialization import investor_list_json
+from config import FAST_JSON_ENDPOINTS
 
 class InvestorController:
     
-    def __init__(self):
+    def __init__(self, fast_json: bool = "investors" in FAST_JSON_ENDPOINTS):
         self.investor_service = InvestorService()
+        self.fast_json = fast_json
     
-    async def create_investor(self, investor_data: InvestorCreate, db: Session) -> InvestorResponse:
+    async def create_investor(self, investor_data: InvestorCreate, db: AsyncSession) -> InvestorResponse:
         try:
-            existing_investor = self.investor_service.get_investor_by_email(db, investor_data.email)
+            existing_investor = await db.run_sync(self.investor_service.get_investor_by_email, investor_data.email)
             if existing_investor:
                 raise HTTPException(status_code=400, detail="Investidor com este email já existe")
             
-            db_investor = self.investor_service.create_investor(db, investor_data)
-            return InvestorResponse.model_validate(db_investor)
+            def create(session: Session) -> InvestorResponse:
+                db_investor = self.investor_service.create_investor(session, investor_data)
+                return InvestorResponse.model_validate(db_investor)
+            
+            return await db.run_sync(create)
             
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Erro ao criar investidor: {str(e)}")
     
-    async def get_investor(self, investor_id: int, db: Session) -> InvestorResponse:
+    async def get_investor(self, investor_id: int, db: AsyncSession) -> InvestorResponse:
         try:
-            db_investor = self.investor_service.get_investor(db, investor_id)
+            db_investor = await db.run_sync(self.investor_service.get_investor, investor_id)
             if not db_investor:
                 raise HTTPException(status_code=404, detail="Investidor não encontrado")
             
@@ -35,17 +45,38 @@ class InvestorController:
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Erro ao buscar investidor: {str(e)}")
     
-    async def get_investors(self, db: Session) -> InvestorListResponse:
+    async def get_investors(self, db: AsyncSession, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                            include_total: bool = False, stream: bool = False) -> Union[InvestorListResponse, Response]:
         try:
-            investors = self.investor_service.get_investors(db)
-            total = self.investor_service.get_investors_count(db)
+            if stream:
+                return ndjson_response(
+                    lambda session: self.investor_service.iter_investors(session, cursor),
+                    InvestorResponse
+                )
+            
+            if self.fast_json:
+                def get_rows(session: Session) -> Response:
+                    rows, next_cursor = self.investor_service.get_investor_rows_page(session, limit, cursor)
+                    total = self.investor_service.get_investors_count(session) if include_total else None
+                    return investor_list_json(rows, total, next_cursor)
+                
+                return await db.run_sync(get_rows)
             
-            investor_responses = [InvestorResponse.model_validate(investor) for investor in investors]
+            def get_page(session: Session) -> InvestorListResponse:
+                investors, next_cursor = self.investor_service.get_investors_page(session, limit, cursor)
+                total = self.investor_service.get_investors_count(session) if include_total else None
+                
+                investor_responses = [InvestorResponse.model_validate(investor) for investor in investors]
+                
+                return InvestorListResponse(
+                    investors=investor_responses,
+                    total=total,
+                    next_cursor=next_cursor
+                )
             
-            return InvestorListResponse(
-                investors=investor_responses,
-                total=total
-            )
+            return await db.run_sync(get_page)
             
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Erro ao buscar investidores: {str(e)}")
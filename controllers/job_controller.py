@@ -0,0 +1,73 @@
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+import json
+from database.models import Job
+from services.job_service import JobService, JOB_COMPLETED
+from services.job_worker import job_worker_pool
+from services.pagination import DEFAULT_PAGE_SIZE
+from models.job_models import JobResponse
+from models.portfolio_models import FeeCalculationByDateRequest
+
+class JobController:
+
+    def __init__(self):
+        self.job_service = JobService()
+
+    async def create_fee_run(self, request: FeeCalculationByDateRequest, db: AsyncSession) -> JobResponse:
+        try:
+            def create(session: Session) -> JobResponse:
+                return self._job_response(self.job_service.create_fee_run(session, request))
+
+            job = await db.run_sync(create)
+            job_worker_pool.notify()
+            return job
+
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erro ao criar tarefa: {str(e)}")
+
+    async def get_job(self, job_id: int, db: AsyncSession, limit: int = DEFAULT_PAGE_SIZE,
+                      cursor: Optional[str] = None) -> JobResponse:
+        try:
+            def get(session: Session) -> Optional[JobResponse]:
+                job = self.job_service.get_job(session, job_id)
+                if job is None:
+                    return None
+                results, next_cursor = self.job_service.get_results_page(session, job_id, limit, cursor)
+                return self._job_response(job, results, next_cursor)
+
+            job = await db.run_sync(get)
+            if job is None:
+                raise HTTPException(status_code=404, detail="Tarefa não encontrada")
+
+            return job
+
+        except HTTPException:
+            raise
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erro ao buscar tarefa: {str(e)}")
+
+    def _job_response(self, job: Job, results: Optional[list] = None, next_cursor: Optional[str] = None) -> JobResponse:
+        if job.total:
+            progress = job.processed / job.total
+        else:
+            progress = 1.0 if job.status == JOB_COMPLETED else 0.0
+
+        return JobResponse(
+            id=job.id,
+            kind=job.kind,
+            status=job.status,
+            params=json.loads(job.params),
+            processed=job.processed,
+            total=job.total,
+            progress=round(progress, 4),
+            error=job.error,
+            created_at=job.created_at,
+            started_at=job.started_at,
+            finished_at=job.finished_at,
+            results=results or [],
+            next_cursor=next_cursor
+        )
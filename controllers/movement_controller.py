@@ -1,78 +1,177 @@
 from fastapi import HTTPException, Depends
+from fastapi.responses import Response
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Iterator, List, Optional, Union
+import csv
+import io
+import json
 from datetime import datetime
 from database.database import get_db
-from services.movement_service import MovementService
-from models.portfolio_models import MovementCreate, MovementResponse, MovementListResponse
+from services.movement_service import MovementService, DEFAULT_BULK_CHUNK_SIZE
+from models.portfolio_models import MovementCreate, MovementResponse, MovementListResponse, MovementBulkResponse
+from services.pagination import DEFAULT_PAGE_SIZE
+from controllers.streaming import ndjson_response
+from controllers.serialization import movement_list_json
+from config import FAST_JSON_ENDPOINTS
 
 class MovementController:
     
-    def __init__(self):
+    def __init__(self, fast_json: bool = "movements" in FAST_JSON_ENDPOINTS):
         self.movement_service = MovementService()
+        self.fast_json = fast_json
     
-    async def create_movement(self, movement_data: MovementCreate, db: Session) -> MovementResponse:
+    async def create_movement(self, movement_data: MovementCreate, db: AsyncSession) -> MovementResponse:
         try:
-            db_movement = self.movement_service.create_movement(db, movement_data)
-            return MovementResponse.model_validate(db_movement)
+            def create(session: Session) -> MovementResponse:
+                db_movement = self.movement_service.create_movement(session, movement_data)
+                return MovementResponse.model_validate(db_movement)
+            
+            return await db.run_sync(create)
             
         except ValueError as e:
             raise HTTPException(status_code=400, detail=str(e))
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Erro ao criar movimento: {str(e)}")
     
-    async def get_movement(self, movement_id: int, db: Session) -> MovementResponse:
+    async def create_movements_bulk(self, content_type: Optional[str], body: bytes, db: AsyncSession,
+                                    chunk_size: int = DEFAULT_BULK_CHUNK_SIZE) -> MovementBulkResponse:
         try:
-            db_movement = self.movement_service.get_movement(db, movement_id)
-            if not db_movement:
+            rows = self._parse_bulk_body(content_type, body)
+            inserted, errors = await db.run_sync(self.movement_service.create_movements_bulk, rows, chunk_size)
+            
+            return MovementBulkResponse(
+                inserted=inserted,
+                failed=len(errors),
+                errors=errors
+            )
+            
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erro ao importar movimentos: {str(e)}")
+    
+    def _parse_bulk_body(self, content_type: Optional[str], body: bytes) -> Iterator:
+        media_type = (content_type or "application/json").split(";")[0].strip().lower()
+        
+        if media_type == "application/json":
+            try:
+                rows = json.loads(body)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"JSON inválido: {e}")
+            if not isinstance(rows, list):
+                raise ValueError("O corpo JSON deve ser uma lista de movimentações")
+            return iter(rows)
+        
+        if media_type in ("application/x-ndjson", "application/jsonl"):
+            return self._parse_ndjson(body)
+        
+        if media_type == "text/csv":
+            return csv.DictReader(io.StringIO(body.decode("utf-8-sig")))
+        
+        raise ValueError(f"Content-Type não suportado: {media_type} (use application/json, application/x-ndjson ou text/csv)")
+    
+    def _parse_ndjson(self, body: bytes) -> Iterator:
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                yield line.decode("utf-8", errors="replace")
+    
+    async def get_movement(self, movement_id: int, db: AsyncSession) -> MovementResponse:
+        try:
+            def get(session: Session) -> Optional[MovementResponse]:
+                db_movement = self.movement_service.get_movement(session, movement_id)
+                return MovementResponse.model_validate(db_movement) if db_movement else None
+            
+            movement = await db.run_sync(get)
+            if not movement:
                 raise HTTPException(status_code=404, detail="Movimento não encontrado")
             
-            return MovementResponse.model_validate(db_movement)
+            return movement
             
         except HTTPException:
             raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Erro ao buscar movimento: {str(e)}")
     
-    async def get_movements(self, db: Session, investor_id: Optional[int] = None, stock_id: Optional[int] = None) -> MovementListResponse:
+    async def get_movements(self, db: AsyncSession, investor_id: Optional[int] = None, stock_id: Optional[int] = None,
+                            limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                            include_total: bool = False, stream: bool = False) -> Union[MovementListResponse, Response]:
         try:
-            movements = self.movement_service.get_movements(db, investor_id, stock_id)
-            total = self.movement_service.get_movements_count(db, investor_id, stock_id)
+            if stream:
+                return ndjson_response(
+                    lambda session: self.movement_service.iter_movements(session, cursor, investor_id, stock_id),
+                    MovementResponse
+                )
             
-            movement_responses = [MovementResponse.model_validate(movement) for movement in movements]
+            if self.fast_json:
+                def get_rows(session: Session) -> Response:
+                    rows, next_cursor = self.movement_service.get_movement_rows_page(session, limit, cursor, investor_id, stock_id)
+                    total = self.movement_service.get_movements_count(session, investor_id, stock_id) if include_total else None
+                    return movement_list_json(rows, total, next_cursor)
+                
+                return await db.run_sync(get_rows)
             
-            return MovementListResponse(
-                movements=movement_responses,
-                total=total
-            )
+            def get_page(session: Session) -> MovementListResponse:
+                movements, next_cursor = self.movement_service.get_movements_page(session, limit, cursor, investor_id, stock_id)
+                total = self.movement_service.get_movements_count(session, investor_id, stock_id) if include_total else None
+                
+                movement_responses = [MovementResponse.model_validate(movement) for movement in movements]
+                
+                return MovementListResponse(
+                    movements=movement_responses,
+                    total=total,
+                    next_cursor=next_cursor
+                )
             
+            return await db.run_sync(get_page)
+            
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Erro ao buscar movimentos: {str(e)}")
     
-    async def get_movements_by_investor(self, investor_id: int, db: Session) -> MovementListResponse:
+    async def get_movements_by_investor(self, investor_id: int, db: AsyncSession) -> Union[MovementListResponse, Response]:
         try:
-            movements = self.movement_service.get_movements_by_investor(db, investor_id)
-            total = self.movement_service.get_movements_count(db, investor_id=investor_id)
+            if self.fast_json:
+                def get_rows(session: Session) -> Response:
+                    rows = self.movement_service.get_movement_rows(session, investor_id=investor_id)
+                    return movement_list_json(rows, len(rows))
+                
+                return await db.run_sync(get_rows)
             
-            movement_responses = [MovementResponse.model_validate(movement) for movement in movements]
+            def get_all(session: Session) -> MovementListResponse:
+                movements = self.movement_service.get_movements_by_investor(session, investor_id)
+                total = self.movement_service.get_movements_count(session, investor_id=investor_id)
+                
+                movement_responses = [MovementResponse.model_validate(movement) for movement in movements]
+                
+                return MovementListResponse(
+                    movements=movement_responses,
+                    total=total
+                )
             
-            return MovementListResponse(
-                movements=movement_responses,
-                total=total
-            )
+            return await db.run_sync(get_all)
             
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Erro ao buscar movimentos do investidor: {str(e)}")
     
-    async def get_investor_portfolio_summary(self, investor_id: int, db: Session) -> dict:
+    async def get_investor_portfolio_summary(self, investor_id: int, db: AsyncSession,
+                                             as_of: Optional[datetime] = None) -> dict:
         try:
-            portfolio = self.movement_service.get_investor_portfolio_summary(db, investor_id)
-            return {
+            portfolio = await db.run_sync(self.movement_service.get_investor_portfolio_summary, investor_id, as_of)
+            summary = {
                 "investor_id": investor_id,
                 "portfolio": portfolio,
                 "total_stocks": len(portfolio),
-                "total_value": sum(stock['total_value'] for stock in portfolio.values())
+                "total_value": round(sum(stock['total_value'] for stock in portfolio.values()), 2)
             }
+            if as_of is not None:
+                summary["as_of"] = as_of
+            return summary
             
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Erro ao buscar resumo do portfólio: {str(e)}")
\ No newline at end of file
+            raise HTTPException(status_code=500, detail=f"Erro ao buscar resumo do portfólio: {str(e)}")
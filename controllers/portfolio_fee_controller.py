@@ -1,35 +1,52 @@
 from fastapi import HTTPException, Depends
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi.responses import Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Union
 from database.database import get_db
 from services.portfolio_fee_service import PortfolioFeeService
+from services.fee_accrual_service import FeeAccrualService
+from controllers.serialization import fee_results_json
+from config import FAST_JSON_ENDPOINTS
 from models.portfolio_models import (
     FeeCalculationByDateRequest, 
-    FeeCalculationByInvestorRequest
+    FeeCalculationByInvestorRequest,
+    FeeCalculationByPeriodRequest
 )
 
 class PortfolioFeeController:
     
-    def __init__(self):
+    def __init__(self, fast_json: bool = "fees" in FAST_JSON_ENDPOINTS):
         self.portfolio_fee_service = PortfolioFeeService()
+        self.fee_accrual_service = FeeAccrualService()
+        self.fast_json = fast_json
     
     async def calculate_fees_by_date(self, request: FeeCalculationByDateRequest, 
-                                    db: Session) -> List[dict]:
+                                    db: AsyncSession) -> Union[List[dict], Response]:
         try:
-            results = self.portfolio_fee_service.calculate_fees_by_date(db, request)
-            return results
+            results = await db.run_sync(self.portfolio_fee_service.calculate_fees_by_date, request)
+            return fee_results_json(results) if self.fast_json else results
             
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Erro ao calcular taxas por data: {str(e)}")
     
     async def calculate_fees_by_investor(self, request: FeeCalculationByInvestorRequest,
-                                    db: Session) -> dict:
+                                    db: AsyncSession) -> dict:
         try:
-            result = self.portfolio_fee_service.calculate_fees_by_investor(db, request)
+            result = await db.run_sync(self.portfolio_fee_service.calculate_fees_by_investor, request)
             return result
             
         except ValueError as e:
             raise HTTPException(status_code=400, detail=str(e))
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Erro ao calcular taxas por investidor: {str(e)}")
-    
\ No newline at end of file
+    
+    async def calculate_fees_by_period(self, request: FeeCalculationByPeriodRequest,
+                                    db: AsyncSession) -> dict:
+        try:
+            result = await db.run_sync(self.fee_accrual_service.calculate_fees_by_period, request)
+            return result
+            
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erro ao calcular taxas por período: {str(e)}")
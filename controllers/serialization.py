@@ -0,0 +1,99 @@
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+from sqlalchemy.engine import Row
+from typing import Any, Dict, List, Optional, Sequence
+from typing_extensions import TypedDict
+from datetime import datetime
+from services.money import from_cents
+
+# Caminho rápido de serialização: as listagens grandes selecionam tuplas (sem objetos do
+# ORM) e as gravam direto em bytes JSON com TypeAdapter.dump_json, sem passar pelos
+# modelos Pydantic nem pela segunda validação do response_model. Os TypedDicts
+# espelham InvestorListResponse e MovementListResponse, então o JSON é o mesmo.
+
+
+class InvestorPayload(TypedDict):
+    id: int
+    name: str
+    email: str
+    created_at: datetime
+
+
+class StockPayload(TypedDict):
+    id: int
+    symbol: str
+    name: str
+    created_at: datetime
+
+
+class MovementPayload(TypedDict):
+    id: int
+    investor_id: int
+    stock_id: int
+    stock_value: float
+    date_of_occurrence: datetime
+    created_at: datetime
+    investor: InvestorPayload
+    stock: StockPayload
+
+
+class InvestorListPayload(TypedDict):
+    investors: List[InvestorPayload]
+    total: Optional[int]
+    next_cursor: Optional[str]
+
+
+class MovementListPayload(TypedDict):
+    movements: List[MovementPayload]
+    total: Optional[int]
+    next_cursor: Optional[str]
+
+
+_investor_list_adapter = TypeAdapter(InvestorListPayload)
+_movement_list_adapter = TypeAdapter(MovementListPayload)
+# Resultados de taxas são dicts montados pelos serviços; os tipos são inferidos na serialização
+_fee_results_adapter = TypeAdapter(List[Dict[str, Any]])
+
+
+def json_response(content: bytes) -> Response:
+    return Response(content=content, media_type="application/json")
+
+
+def investor_list_json(rows: Sequence[Row], total: Optional[int] = None, next_cursor: Optional[str] = None) -> Response:
+    """Serializa tuplas de InvestorService.get_investor_rows_page"""
+    return json_response(_investor_list_adapter.dump_json({
+        "investors": [
+            {"id": id, "name": name, "email": email, "created_at": created_at}
+            for id, name, email, created_at in rows
+        ],
+        "total": total,
+        "next_cursor": next_cursor
+    }))
+
+
+def movement_list_json(rows: Sequence[Row], total: Optional[int] = None, next_cursor: Optional[str] = None) -> Response:
+    """Serializa tuplas de MovementService.get_movement_rows_page / get_movement_rows"""
+    return json_response(_movement_list_adapter.dump_json({
+        "movements": [
+            {
+                "id": id,
+                "investor_id": investor_id,
+                "stock_id": stock_id,
+                "stock_value": from_cents(stock_value_cents),
+                "date_of_occurrence": date_of_occurrence,
+                "created_at": created_at,
+                "investor": {"id": investor_id, "name": investor_name, "email": investor_email,
+                             "created_at": investor_created_at},
+                "stock": {"id": stock_id, "symbol": stock_symbol, "name": stock_name, "created_at": stock_created_at}
+            }
+            for (id, investor_id, stock_id, stock_value_cents, date_of_occurrence, created_at, investor_name,
+                 investor_email, investor_created_at, stock_symbol, stock_name, stock_created_at) in rows
+        ],
+        "total": total,
+        "next_cursor": next_cursor
+    }))
+
+
+def fee_results_json(results: List[Dict[str, Any]]) -> Response:
+    """Serializa a lista de taxas por investidor de PortfolioFeeService.calculate_fees_by_date"""
+    return json_response(_fee_results_adapter.dump_json(results))
@@ -0,0 +1,90 @@
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from typing import Any, AsyncIterator, BinaryIO, Callable, Optional
+from datetime import datetime
+import tempfile
+from database.database import SessionLocal
+from services.spreadsheet_service import SpreadsheetService, MEDIA_TYPES, spreadsheet_format
+from services.movement_service import DEFAULT_BULK_CHUNK_SIZE
+from models.portfolio_models import FeeCalculationByDateRequest, MovementImportResponse
+
+# Tamanho dos blocos ao gravar o upload e ao transmitir o arquivo exportado
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+class SpreadsheetController:
+    """
+    Importação e exportação rodam no threadpool com uma sessão síncrona própria:
+    a leitura/gravação da planilha é CPU e I/O de arquivo, que em db.run_sync
+    ocupariam a thread do event loop durante todo o processamento.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self.session_factory = session_factory
+        self.spreadsheet_service = SpreadsheetService()
+
+    async def import_movements(self, content_type: Optional[str], requested_format: Optional[str],
+                               body: AsyncIterator[bytes], chunk_size: int = DEFAULT_BULK_CHUNK_SIZE) -> MovementImportResponse:
+        try:
+            file_format = spreadsheet_format(content_type, requested_format)
+
+            # O corpo vai para um arquivo temporário em blocos: o .xlsx é um zip e precisa de acesso aleatório
+            with tempfile.TemporaryFile() as upload:
+                async for chunk in body:
+                    await run_in_threadpool(upload.write, chunk)
+                upload.seek(0)
+
+                result = await run_in_threadpool(
+                    self._with_session, self.spreadsheet_service.import_movements, upload, file_format, chunk_size
+                )
+
+            return MovementImportResponse(**result)
+
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erro ao importar planilha: {str(e)}")
+
+    async def export_fees(self, calculation_date: datetime, taxa: float, file_format: str) -> StreamingResponse:
+        output = tempfile.TemporaryFile()
+        try:
+            file_format = spreadsheet_format(None, file_format)
+            request = FeeCalculationByDateRequest(calculation_date=calculation_date, taxa=taxa)
+            result = await run_in_threadpool(
+                self._with_session, self.spreadsheet_service.export_fees, request, file_format, output
+            )
+            output.seek(0)
+        except ValueError as e:
+            output.close()
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            output.close()
+            raise HTTPException(status_code=500, detail=f"Erro ao exportar taxas: {str(e)}")
+
+        filename = f"taxas_{calculation_date:%Y%m%d}.{file_format}"
+        return StreamingResponse(
+            self._iter_file(output),
+            media_type=MEDIA_TYPES[file_format],
+            headers={
+                "Content-Disposition": f'attachment; filename="{filename}"',
+                "X-Export-Rows": str(result["rows"]),
+                "X-Export-Rows-Per-Second": str(result["rows_per_second"]),
+            }
+        )
+
+    def _with_session(self, operation: Callable[..., Any], *args: Any) -> Any:
+        db = self.session_factory()
+        try:
+            return operation(db, *args)
+        finally:
+            db.close()
+
+    def _iter_file(self, file: BinaryIO):
+        # Gerador síncrono: o Starlette o consome no threadpool
+        try:
+            while chunk := file.read(FILE_CHUNK_SIZE):
+                yield chunk
+        finally:
+            file.close()
@@ -1,5 +1,5 @@
 from fastapi import HTTPException, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from database.database import get_db
 from services.stock_service import StockService
@@ -10,22 +10,22 @@ class StockController:
     def __init__(self):
         self.stock_service = StockService()
     
-    async def create_stock(self, stock_data: StockCreate, db: Session) -> StockResponse:
+    async def create_stock(self, stock_data: StockCreate, db: AsyncSession) -> StockResponse:
         try:
-            existing_stock = self.stock_service.get_stock_by_symbol(db, stock_data.symbol)
+            existing_stock = await db.run_sync(self.stock_service.get_stock_by_symbol, stock_data.symbol)
             if existing_stock:
                 raise HTTPException(status_code=400, detail="Ação com este símbolo já existe")
             
-            db_stock = self.stock_service.create_stock(db, stock_data)
+            db_stock = await db.run_sync(self.stock_service.create_stock, stock_data)
             return StockResponse.model_validate(db_stock)
             
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Erro ao criar ação: {str(e)}")
     
-    async def get_stocks(self, db: Session) -> StockListResponse:
+    async def get_stocks(self, db: AsyncSession) -> StockListResponse:
         try:
-            stocks = self.stock_service.get_stocks(db)
-            total = self.stock_service.get_stocks_count(db)
+            stocks = await db.run_sync(self.stock_service.get_stocks)
+            total = await db.run_sync(self.stock_service.get_stocks_count)
             
             stock_responses = [StockResponse.model_validate(stock) for stock in stocks]
             
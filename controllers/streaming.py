@@ -0,0 +1,32 @@
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy.orm import Query, Session
+from typing import Callable, Type
+from database.database import SessionLocal
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def ndjson_response(build_query: Callable[[Session], Query], schema: Type[BaseModel]) -> StreamingResponse:
+    """
+    Transmite o resultado de uma consulta como NDJSON, uma linha por registro
+
+    A consulta é montada de imediato (erros de parâmetros viram 400), mas só é
+    executada durante o streaming, em lotes via yield_per. O gerador síncrono
+    roda no threadpool do Starlette com uma sessão própria, fechada ao final.
+    """
+    db = SessionLocal()
+    try:
+        query = build_query(db)
+    except Exception:
+        db.close()
+        raise
+
+    def generate():
+        try:
+            for row in query:
+                yield schema.model_validate(row).model_dump_json().encode() + b"\n"
+        finally:
+            db.close()
+
+    return StreamingResponse(generate(), media_type=NDJSON_MEDIA_TYPE)
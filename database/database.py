@@ -1,27 +1,131 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from typing import Any, Dict, Optional
 import os
+import config
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./sparta_portfolio.db"
+SQLALCHEMY_DATABASE_URL = config.DATABASE_URL
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, 
-    connect_args={"check_same_thread": False}
-)
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def to_async_url(url: str) -> str:
+    """Map a sync database URL to its async driver (aiosqlite/asyncpg)"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database backend: {backend}")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+def default_sqlite_pragmas() -> Dict[str, Any]:
+    """PRAGMAs from config.py, applied in this order on every new SQLite connection"""
+    return {
+        "journal_mode": config.SQLITE_JOURNAL_MODE,
+        "synchronous": config.SQLITE_SYNCHRONOUS,
+        "mmap_size": config.SQLITE_MMAP_SIZE,
+        "cache_size": config.SQLITE_CACHE_SIZE,
+        "busy_timeout": config.SQLITE_BUSY_TIMEOUT_MS,
+    }
+
+
+def _engine_options(url: str, pool_size: Optional[int], max_overflow: Optional[int]) -> Dict[str, Any]:
+    parsed = make_url(url)
+    options: Dict[str, Any] = {}
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        # In-memory SQLite uses a single static connection
+        return options
+    if parsed.get_driver_name() == "aiosqlite":
+        # SQLAlchemy defaults aiosqlite file databases to NullPool: a new connection (and
+        # worker thread, with the PRAGMAs re-applied) per session. Each pooled aiosqlite
+        # connection owns a non-daemon thread, so the engine must be disposed on shutdown
+        # (the app lifespan does it) or the interpreter never exits.
+        options["poolclass"] = AsyncAdaptedQueuePool
+    options["pool_size"] = config.DB_POOL_SIZE if pool_size is None else pool_size
+    options["max_overflow"] = config.DB_MAX_OVERFLOW if max_overflow is None else max_overflow
+    options["pool_timeout"] = config.DB_POOL_TIMEOUT
+    options["pool_pre_ping"] = parsed.get_backend_name() != "sqlite"
+    return options
+
+
+def _apply_sqlite_pragmas(engine: Engine, pragmas: Dict[str, Any]) -> None:
+    if engine.dialect.name != "sqlite" or not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def make_engine(url: str = SQLALCHEMY_DATABASE_URL, pragmas: Optional[Dict[str, Any]] = None,
+                pool_size: Optional[int] = None, max_overflow: Optional[int] = None) -> Engine:
+    """
+    Create the sync engine with pool sizing from config.py
+
+    For SQLite, `pragmas` (default: default_sqlite_pragmas()) are set on every
+    new connection; pass an empty dict to keep SQLite's own defaults. Other
+    backends ignore them.
+    """
+    connect_args = {"check_same_thread": False} if make_url(url).get_backend_name() == "sqlite" else {}
+    engine = create_engine(url, connect_args=connect_args, **_engine_options(url, pool_size, max_overflow))
+    _apply_sqlite_pragmas(engine, default_sqlite_pragmas() if pragmas is None else pragmas)
+    return engine
+
+
+def make_async_engine(url: str = SQLALCHEMY_DATABASE_URL, pragmas: Optional[Dict[str, Any]] = None,
+                      pool_size: Optional[int] = None, max_overflow: Optional[int] = None) -> AsyncEngine:
+    """Async counterpart of make_engine; `url` is the sync URL and is mapped with to_async_url"""
+    async_url = to_async_url(url)
+    engine = create_async_engine(async_url, **_engine_options(async_url, pool_size, max_overflow))
+    _apply_sqlite_pragmas(engine.sync_engine, default_sqlite_pragmas() if pragmas is None else pragmas)
+    return engine
+
+
+engine = make_engine()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = make_async_engine()
+
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
-def get_db():
-    """Dependency to get database session"""
-    db = SessionLocal()
-    try:
+async def get_db():
+    """
+    Dependency to get an async database session
+
+    Services keep a synchronous API; controllers run them through
+    AsyncSession.run_sync so database I/O doesn't block the event loop.
+    """
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 def create_tables():
-    """Create all tables in the database"""
-    Base.metadata.create_all(bind=engine)
+    """Create or upgrade all tables in the database through the Alembic migrations"""
+    from alembic import command
+    from alembic.config import Config
+
+    project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    alembic_config = Config(os.path.join(project_dir, "alembic.ini"))
+    alembic_config.set_main_option(
+        "sqlalchemy.url", engine.url.render_as_string(hide_password=False).replace("%", "%%")
+    )
+    alembic_config.attributes["configure_logger"] = False
+
+    # Bancos criados antes das migrações são marcados em migrations/env.py, que vale também para a CLI
+    with engine.begin() as connection:
+        alembic_config.attributes["connection"] = connection
+        command.upgrade(alembic_config, "head")
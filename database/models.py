@@ -1,7 +1,9 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Date, DateTime, ForeignKey, Boolean, Index, UniqueConstraint
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database.database import Base
+from services.money import CENTS, to_cents, from_cents
 
 class Investor(Base):
     __tablename__ = "investors"
@@ -25,14 +27,117 @@ class Stock(Base):
 
 class Movement(Base):
     __tablename__ = "movements"
+    __table_args__ = (
+        Index("ix_movements_investor_date", "investor_id", "date_of_occurrence"),
+        Index("ix_movements_stock_date", "stock_id", "date_of_occurrence"),
+        Index("ix_movements_date", "date_of_occurrence"),
+        Index("ix_movements_investor_stock_date", "investor_id", "stock_id", "date_of_occurrence", "stock_value_cents"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     investor_id = Column(Integer, ForeignKey("investors.id"), nullable=False)
     stock_id = Column(Integer, ForeignKey("stocks.id"), nullable=False)
-    stock_value = Column(Float, nullable=False)
+    stock_value_cents = Column(BigInteger, nullable=False)
     date_of_occurrence = Column(DateTime(timezone=True), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     investor = relationship("Investor", back_populates="movements")
     stock = relationship("Stock", back_populates="movements")
 
+    @hybrid_property
+    def stock_value(self) -> float:
+        """Valor em reais; o armazenamento é em centavos (stock_value_cents)"""
+        return from_cents(self.stock_value_cents)
+
+    @stock_value.setter
+    def stock_value(self, value: float) -> None:
+        self.stock_value_cents = to_cents(value)
+
+    @stock_value.expression
+    def stock_value(cls):
+        return cls.stock_value_cents / float(CENTS)
+
+class PositionSnapshot(Base):
+    """Posição acumulada de um investidor em uma ação até o fim de cada dia com movimentações"""
+    __tablename__ = "position_snapshots"
+    __table_args__ = (
+        UniqueConstraint("investor_id", "stock_id", "snapshot_date", name="uq_position_snapshot"),
+        Index("ix_position_snapshots_date", "snapshot_date"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    snapshot_date = Column(Date, nullable=False)
+    investor_id = Column(Integer, ForeignKey("investors.id"), nullable=False)
+    stock_id = Column(Integer, ForeignKey("stocks.id"), nullable=False)
+    total_value_cents = Column(BigInteger, nullable=False, default=0)
+    movements_count = Column(Integer, nullable=False, default=0)
+    last_date_of_occurrence = Column(DateTime(timezone=True), nullable=False)
+
+    @hybrid_property
+    def total_value(self) -> float:
+        return from_cents(self.total_value_cents)
+
+    @total_value.expression
+    def total_value(cls):
+        return cls.total_value_cents / float(CENTS)
+
+
+class PositionTotal(Base):
+    """Posição corrente (soma, quantidade e última data dos movimentos) de um investidor em uma ação"""
+    __tablename__ = "position_totals"
+    __table_args__ = (
+        UniqueConstraint("investor_id", "stock_id", name="uq_position_total"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    investor_id = Column(Integer, ForeignKey("investors.id"), nullable=False)
+    stock_id = Column(Integer, ForeignKey("stocks.id"), nullable=False)
+    total_value_cents = Column(BigInteger, nullable=False, default=0)
+    movements_count = Column(Integer, nullable=False, default=0)
+    last_date_of_occurrence = Column(DateTime(timezone=True), nullable=False)
+
+    @hybrid_property
+    def total_value(self) -> float:
+        return from_cents(self.total_value_cents)
+
+    @total_value.expression
+    def total_value(cls):
+        return cls.total_value_cents / float(CENTS)
+
+
+class Job(Base):
+    """Tarefa executada em segundo plano (ex.: cálculo de taxas por data para toda a carteira)"""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_status_id", "status", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False, default="pending")
+    params = Column(Text, nullable=False)
+    processed = Column(Integer, nullable=False, default=0)
+    total = Column(Integer)
+    error = Column(Text)
+    worker = Column(String(200))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    heartbeat_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+
+    results = relationship("JobResult", back_populates="job", cascade="all, delete-orphan")
+
+
+class JobResult(Base):
+    """Linha de resultado de uma tarefa, em JSON, na ordem em que foi produzida (`position`)"""
+    __tablename__ = "job_results"
+    __table_args__ = (
+        UniqueConstraint("job_id", "position", name="uq_job_result_position"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("jobs.id"), nullable=False)
+    position = Column(Integer, nullable=False)
+    payload = Column(Text, nullable=False)
+
+    job = relationship("Job", back_populates="results")
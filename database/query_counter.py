@@ -0,0 +1,37 @@
+from contextlib import contextmanager
+from typing import Iterator, List
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from database.database import engine as default_engine
+
+
+class QueryCounter:
+    """Registra os comandos SQL executados em um engine enquanto ativo"""
+
+    def __init__(self):
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine: Engine = default_engine) -> Iterator[QueryCounter]:
+    """
+    Conta os comandos SQL emitidos dentro do bloco
+
+    Exemplo:
+        with count_queries() as counter:
+            service.get_investor_portfolio_summary(db, 1)
+        assert counter.count == 1
+    """
+    counter = QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter._before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", counter._before_cursor_execute)
@@ -1,11 +1,16 @@
+import argparse
 import sys
 import os
 from datetime import datetime, timedelta
+import numpy as np
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from database.database import SessionLocal, create_tables
-from database.models import Investor, Stock, Movement
+from database.models import Investor, Stock, Movement, PositionSnapshot
+from services.position_service import PositionService
+from services.movement_service import MovementService
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
 def init_sample_data():
@@ -16,6 +21,9 @@ def init_sample_data():
     try:
         if db.query(Investor).first():
             print("Dados de exemplo já existem. Pulando inicialização.")
+            if db.query(Movement).first() and not db.query(PositionSnapshot).first():
+                snapshots = PositionService().rebuild(db)
+                print(f"   - {snapshots} snapshots de posição recriados")
             return
         
         print("Inicializando banco de dados com dados de exemplo...")
@@ -73,11 +81,7 @@ def init_sample_data():
             {"investor_id": investors[3].id, "stock_id": stocks[3].id, "stock_value": 93.50, "date_of_occurrence": datetime.now() - timedelta(days=5)},
         ]
         
-        for movement_data in movements_data:
-            movement = Movement(**movement_data)
-            db.add(movement)
-        
-        db.commit()
+        MovementService().create_movements_bulk(db, movements_data)
         
         print("Dados de exemplo criados com sucesso!")
         print(f"   - {len(investors)} investidores")
@@ -91,5 +95,86 @@ def init_sample_data():
     finally:
         db.close()
 
+def generate_synthetic_data(db: Session, movements: int, investors: int = None, stocks: int = 20,
+                            days: int = 365, start: datetime = datetime(2024, 1, 1), seed: int = 42,
+                            chunk_size: int = 50000) -> dict:
+    """
+    Popula o banco com dados sintéticos reprodutíveis (mesma semente, mesmos dados)
+
+    Os movimentos são inseridos em lotes direto na tabela, sem passar pela
+    validação do serviço, e os snapshots de posição são recriados no final.
+    Pensado para bancos de benchmark com milhões de movimentos.
+
+    Args:
+        db: Sessão de um banco vazio, com as tabelas já criadas
+        movements: Quantidade de movimentações
+        investors: Quantidade de investidores (padrão: 1 para cada 100 movimentações)
+        stocks: Quantidade de fundos
+        days: Janela de datas, a partir de `start`
+        seed: Semente do gerador
+        chunk_size: Movimentações por lote de inserção
+
+    Returns:
+        Quantidades inseridas por tabela
+    """
+    investors = investors or max(10, movements // 100)
+    rng = np.random.default_rng(seed)
+
+    db.execute(insert(Investor), [
+        {"name": f"Investidor {i}", "email": f"investidor{i}@email.com"} for i in range(1, investors + 1)
+    ])
+    db.execute(insert(Stock), [
+        {"symbol": f"SPRT{i:02d}", "name": f"Fundo Sintético {i}"} for i in range(1, stocks + 1)
+    ])
+
+    for offset in range(0, movements, chunk_size):
+        size = min(chunk_size, movements - offset)
+        investor_ids = rng.integers(1, investors + 1, size).tolist()
+        stock_ids = rng.integers(1, stocks + 1, size).tolist()
+        values_cents = rng.integers(5000, 100001, size).tolist()
+        minutes = rng.integers(0, days * 24 * 60, size).tolist()
+        db.execute(insert(Movement), [
+            {
+                "investor_id": investor_id,
+                "stock_id": stock_id,
+                "stock_value_cents": value_cents,
+                "date_of_occurrence": start + timedelta(minutes=minute)
+            }
+            for investor_id, stock_id, value_cents, minute in zip(investor_ids, stock_ids, values_cents, minutes)
+        ])
+    db.commit()
+
+    snapshots = PositionService().rebuild(db)
+    return {"investors": investors, "stocks": stocks, "movements": movements, "snapshots": snapshots}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inicializa o banco de dados da API Sparta")
+    parser.add_argument("--synthetic", type=int, metavar="MOVIMENTOS",
+                        help="Gera dados sintéticos com esta quantidade de movimentações em vez dos dados de exemplo")
+    parser.add_argument("--investors", type=int, help="Quantidade de investidores sintéticos")
+    parser.add_argument("--stocks", type=int, default=20, help="Quantidade de fundos sintéticos")
+    parser.add_argument("--days", type=int, default=365, help="Janela de datas dos movimentos sintéticos")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.synthetic is None:
+        init_sample_data()
+        return
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        if db.query(Investor).first():
+            print("O banco já possui dados; dados sintéticos só são gerados em um banco vazio.")
+            return
+        counts = generate_synthetic_data(db, args.synthetic, args.investors, args.stocks, args.days, seed=args.seed)
+        print("Dados sintéticos criados com sucesso!")
+        for table, count in counts.items():
+            print(f"   - {count} {table}")
+    finally:
+        db.close()
+
+
 if __name__ == "__main__":
-    init_sample_data()
+    main()
@@ -1,26 +1,58 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Request, Response, Query
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Match
+from contextlib import asynccontextmanager
 from typing import Optional
+from datetime import datetime
+import time
 from controllers.fee_controller import FeeController
 from controllers.investor_controller import InvestorController
 from controllers.stock_controller import StockController
 from controllers.movement_controller import MovementController
 from controllers.portfolio_fee_controller import PortfolioFeeController
-from models.fee_models import FeeCalculationRequest
+from controllers.spreadsheet_controller import SpreadsheetController
+from controllers.job_controller import JobController
+from models.fee_models import FeeCalculationRequest, FeeCalculationBinaryRequest, FeeCalculationBatchRequest
+from models.job_models import JobResponse
 from models.portfolio_models import (
     InvestorCreate, InvestorResponse, InvestorListResponse,
     StockCreate, StockResponse, StockListResponse,
-    MovementCreate, MovementResponse, MovementListResponse,
-    FeeCalculationByDateRequest, FeeCalculationByInvestorRequest
+    MovementCreate, MovementResponse, MovementListResponse, MovementBulkResponse, MovementImportResponse,
+    FeeCalculationByDateRequest, FeeCalculationByInvestorRequest, FeeCalculationByPeriodRequest
 )
-from database.database import create_tables, get_db
-from sqlalchemy.orm import Session
+from database.database import create_tables, get_db, engine, async_engine
+from services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from services.movement_service import DEFAULT_BULK_CHUNK_SIZE, MAX_BULK_CHUNK_SIZE
+from services.investor_service import investor_cache
+from services.stock_service import stock_cache
+from services.portfolio_fee_service import fee_result_cache
+from services.spreadsheet_service import SPREADSHEET_FORMATS
+from services import metrics
+from services.profiling import create_profile, profile_request
+from services.job_worker import job_worker_pool
+from config import PROFILING_ENABLED
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Migrações antes dos workers, que já consultam a tabela de tarefas
+    create_tables()
+    # Workers das tarefas em segundo plano (SPARTA_JOB_WORKERS=0 desliga neste processo)
+    job_worker_pool.start()
+    yield
+    job_worker_pool.stop()
+    # As conexões do pool do aiosqlite têm threads próprias que impedem o processo de terminar
+    await async_engine.dispose()
+
 
 app = FastAPI(
     title="Sparta - API de Gestão de Investimentos",
     description="API para cálculo de taxas de fundos de investimento e gestão de portfólios com movimentações em fundos Sparta",
     version="2.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 fee_controller = FeeController()
@@ -28,6 +60,65 @@ investor_controller = InvestorController()
 stock_controller = StockController()
 movement_controller = MovementController()
 portfolio_fee_controller = PortfolioFeeController()
+spreadsheet_controller = SpreadsheetController()
+job_controller = JobController()
+
+metrics.instrument_engine(engine)
+metrics.instrument_engine(async_engine.sync_engine)
+metrics.registry.add_collector(metrics.cache_collector(
+    {"investors": investor_cache, "stocks": stock_cache, "fee_results": fee_result_cache}
+))
+
+
+def _route_template(request: Request) -> str:
+    """Caminho declarado da rota (ex.: /investors/{investor_id}), para não explodir a cardinalidade das métricas"""
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return getattr(route, "path", request.url.path)
+    return "desconhecida"
+
+
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    """
+    Mede cada requisição: etapas dos serviços e comandos SQL vão para o
+    cabeçalho Server-Timing e para /metrics. Com SPARTA_PROFILING=1, o
+    cabeçalho X-Profile (cprofile | pyinstrument) grava um profiling da
+    requisição, cujo caminho volta em X-Profile-File.
+    """
+    route = _route_template(request)
+    profiler_kind = request.headers.get("x-profile") if PROFILING_ENABLED else None
+    profile = None
+    if profiler_kind:
+        try:
+            profile = create_profile(profiler_kind.lower())
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={"detail": str(e)})
+    started = time.perf_counter()
+
+    try:
+        with metrics.request_timings(route) as timings:
+            if profile:
+                with profile_request(profile, f"{request.method}_{request.url.path}"):
+                    response = await call_next(request)
+                response.headers["X-Profile-File"] = profile.path
+            else:
+                response = await call_next(request)
+    except Exception:
+        # Erros não tratados seguem para o ServerErrorMiddleware (500), mas entram nas métricas
+        _record_request(request.method, route, 500, time.perf_counter() - started)
+        raise
+
+    total = time.perf_counter() - started
+    response.headers["Server-Timing"] = timings.server_timing(total)
+    _record_request(request.method, route, response.status_code, total)
+    return response
+
+
+def _record_request(method: str, route: str, status_code: int, duration: float) -> None:
+    metrics.http_requests_total.inc(method, route, str(status_code))
+    metrics.http_request_duration.observe(duration, method, route)
 
 
 @app.get("/", 
@@ -36,90 +127,204 @@ portfolio_fee_controller = PortfolioFeeController()
 async def root():
     return {"message": "Sparta API - Vinicius"}
 
+@app.get("/cache/stats",
+         summary="Estatísticas de Cache",
+         description="Contadores de acertos/falhas e ocupação dos caches de investidores, fundos e resultados de taxas")
+async def get_cache_stats():
+    return {"investors": investor_cache.stats(), "stocks": stock_cache.stats(), "fee_results": fee_result_cache.stats()}
+
+@app.get("/metrics",
+         response_class=PlainTextResponse,
+         summary="Métricas",
+         description="Métricas do processo no formato texto do Prometheus: requisições, etapas dos serviços, comandos SQL e caches")
+async def get_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.post("/calculate-fees", 
           response_model=list[float],
           summary="Calcular Taxas de Fundos",
           description="Calcula taxas de administração de fundos de investimento (como pedido)")
 async def calculate_fees(request_data: FeeCalculationRequest):
-    return await fee_controller.calculate_fees(request_data.dict())
+    return await fee_controller.calculate_fees(request_data)
+
+@app.post("/calculate-fees/batch",
+          response_model=dict[str, list[float]],
+          summary="Calcular Taxas de Vários Fundos",
+          description="Calcula, em uma única requisição, as taxas de vários fundos (ex.: JURO11, CDII11, CRAA11, DIVS11), "
+                      "cada um com a sua taxa e série de cotas. Retorna as taxas por investidor indexadas pelo fundo")
+async def calculate_fees_batch(request_data: FeeCalculationBatchRequest):
+    return await fee_controller.calculate_fees_batch(request_data)
+
+@app.post("/calculate-fees/binary",
+          response_class=Response,
+          summary="Calcular Taxas de Fundos (binário)",
+          description="Calcula taxas a partir de um payload float64 colunar: cabeçalho <taxa:f64, dias:u32, investidores:u32>, "
+                      "seguido dos valores por dia e da matriz dias x investidores de quantidades. Retorna as taxas em float64.")
+async def calculate_fees_binary(request: Request):
+    content = await fee_controller.calculate_fees_binary(await request.body())
+    return Response(content=content, media_type=FeeCalculationBinaryRequest.MEDIA_TYPE)
+
+@app.post("/calculate-fees/stream",
+          response_model=list[float],
+          summary="Calcular Taxas de Fundos (streaming)",
+          description="Calcula taxas a partir de um corpo NDJSON, uma cota por linha ({\"valor\": ..., \"quantidades\": [...]}), "
+                      "processado de forma incremental")
+async def calculate_fees_stream(request: Request, taxa: float = Query(..., ge=0, description="Taxa de administração anual (>= 0.0)")):
+    return await fee_controller.calculate_fees_stream(taxa, request.stream())
 
 @app.post("/investors", 
           response_model=InvestorResponse,
           summary="Criar Investidor",
           description="Cria um novo investidor no sistema")
-async def create_investor(investor_data: InvestorCreate, db: Session = Depends(get_db)):
+async def create_investor(investor_data: InvestorCreate, db: AsyncSession = Depends(get_db)):
     return await investor_controller.create_investor(investor_data, db)
 
 @app.get("/investors", 
          response_model=InvestorListResponse,
          summary="Listar Investidores",
-         description="Lista todos os investidores cadastrados no sistema")
-async def get_investors(db: Session = Depends(get_db)):
-    return await investor_controller.get_investors(db)
+         description="Lista os investidores com paginação por cursor (keyset por id). Com stream=true, "
+                     "retorna todos os registros a partir do cursor em NDJSON")
+async def get_investors(limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Tamanho da página"),
+                        cursor: Optional[str] = Query(None, description="Cursor retornado em next_cursor"),
+                        include_total: bool = Query(False, description="Inclui a contagem total (COUNT)"),
+                        stream: bool = Query(False, description="Transmite os registros em NDJSON"),
+                        db: AsyncSession = Depends(get_db)):
+    return await investor_controller.get_investors(db, limit, cursor, include_total, stream)
 
 @app.get("/investors/{investor_id}", 
          response_model=InvestorResponse,
          summary="Buscar Investidor",
          description="Busca um investidor específico pelo ID")
-async def get_investor(investor_id: int, db: Session = Depends(get_db)):
+async def get_investor(investor_id: int, db: AsyncSession = Depends(get_db)):
     return await investor_controller.get_investor(investor_id, db)
 
 @app.post("/stocks", 
           response_model=StockResponse,
           summary="Adicionar Fundo",
           description="Adiciona um novo fundo Sparta ao sistema")
-async def create_stock(stock_data: StockCreate, db: Session = Depends(get_db)):
+async def create_stock(stock_data: StockCreate, db: AsyncSession = Depends(get_db)):
     return await stock_controller.create_stock(stock_data, db)
 
 @app.get("/stocks", 
          response_model=StockListResponse,
          summary="Listar Fundos",
          description="Lista todos os fundos Sparta disponíveis para investimento")
-async def get_stocks(db: Session = Depends(get_db)):
+async def get_stocks(db: AsyncSession = Depends(get_db)):
     return await stock_controller.get_stocks(db)
 
 @app.post("/movements", 
           response_model=MovementResponse,
           summary="Criar Movimentação",
           description="Registra uma nova movimentação de investimento em fundo")
-async def create_movement(movement_data: MovementCreate, db: Session = Depends(get_db)):
+async def create_movement(movement_data: MovementCreate, db: AsyncSession = Depends(get_db)):
     return await movement_controller.create_movement(movement_data, db)
 
+@app.post("/movements/bulk",
+          response_model=MovementBulkResponse,
+          summary="Importar Movimentações em Lote",
+          description="Importa movimentações em lote a partir de uma lista JSON, NDJSON (application/x-ndjson) ou CSV (text/csv "
+                      "com cabeçalho investor_id,stock_id,stock_value,date_of_occurrence). As linhas válidas são inseridas em "
+                      "blocos em uma única transação; linhas inválidas são reportadas sem interromper o lote")
+async def create_movements_bulk(request: Request,
+                                chunk_size: int = Query(DEFAULT_BULK_CHUNK_SIZE, ge=1, le=MAX_BULK_CHUNK_SIZE,
+                                                        description="Linhas por INSERT"),
+                                db: AsyncSession = Depends(get_db)):
+    return await movement_controller.create_movements_bulk(request.headers.get("content-type"), await request.body(), db, chunk_size)
+
 @app.get("/movements", 
          response_model=MovementListResponse,
          summary="Listar Movimentações",
-         description="Lista todas as movimentações com filtros opcionais por investidor e fundo")
-async def get_movements(investor_id: Optional[int] = None, stock_id: Optional[int] = None, db: Session = Depends(get_db)):
-    return await movement_controller.get_movements(db, investor_id, stock_id)
+         description="Lista as movimentações (mais recentes primeiro) com filtros opcionais por investidor e fundo e "
+                     "paginação por cursor (keyset em date_of_occurrence, id). Com stream=true, retorna todos os "
+                     "registros a partir do cursor em NDJSON")
+async def get_movements(investor_id: Optional[int] = None, stock_id: Optional[int] = None,
+                        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Tamanho da página"),
+                        cursor: Optional[str] = Query(None, description="Cursor retornado em next_cursor"),
+                        include_total: bool = Query(False, description="Inclui a contagem total (COUNT)"),
+                        stream: bool = Query(False, description="Transmite os registros em NDJSON"),
+                        db: AsyncSession = Depends(get_db)):
+    return await movement_controller.get_movements(db, investor_id, stock_id, limit, cursor, include_total, stream)
 
 @app.get("/movements/{movement_id}", 
          response_model=MovementResponse,
          summary="Buscar Movimentação",
          description="Busca uma movimentação específica pelo ID")
-async def get_movement(movement_id: int, db: Session = Depends(get_db)):
+async def get_movement(movement_id: int, db: AsyncSession = Depends(get_db)):
     return await movement_controller.get_movement(movement_id, db)
 
 @app.get("/movements/investor/{investor_id}", 
          response_model=MovementListResponse,
          summary="Movimentações do Investidor",
          description="Lista todas as movimentações de um investidor específico")
-async def get_movements_by_investor(investor_id: int, db: Session = Depends(get_db)):
+async def get_movements_by_investor(investor_id: int, db: AsyncSession = Depends(get_db)):
     return await movement_controller.get_movements_by_investor(investor_id, db)
 
 @app.get("/investors/{investor_id}/portfolio",
          summary="Portfólio do Investidor",
-         description="Obtém o resumo do portfólio de um investidor")
-async def get_investor_portfolio(investor_id: int, db: Session = Depends(get_db)):
-    return await movement_controller.get_investor_portfolio_summary(investor_id, db)
+         description="Obtém o resumo do portfólio de um investidor. Com as_of, retorna o portfólio naquela data/hora, "
+                     "a partir dos snapshots diários de posição e dos movimentos do próprio dia")
+async def get_investor_portfolio(investor_id: int,
+                                 as_of: Optional[datetime] = Query(None, description="Data/hora da posição (padrão: atual)"),
+                                 db: AsyncSession = Depends(get_db)):
+    return await movement_controller.get_investor_portfolio_summary(investor_id, db, as_of)
 
 @app.post("/calculate-fees/by-date",
           summary="Calcular Taxas por Data",
           description="Calcula taxas de administração para todos os investidores em uma data específica")
-async def calculate_fees_by_date(request: FeeCalculationByDateRequest, db: Session = Depends(get_db)):
+async def calculate_fees_by_date(request: FeeCalculationByDateRequest, db: AsyncSession = Depends(get_db)):
     return await portfolio_fee_controller.calculate_fees_by_date(request, db)
 
 @app.post("/calculate-fees/by-investor",
           summary="Calcular Taxas por Investidor",
           description="Calcula taxas de administração para um investidor específico baseado em todas as movimentações")
-async def calculate_fees_by_investor(request: FeeCalculationByInvestorRequest, db: Session = Depends(get_db)):
+async def calculate_fees_by_investor(request: FeeCalculationByInvestorRequest, db: AsyncSession = Depends(get_db)):
     return await portfolio_fee_controller.calculate_fees_by_investor(request, db)
+
+@app.post("/calculate-fees/by-period",
+          summary="Calcular Taxas por Período",
+          description="Acumula taxas de administração diárias (dias úteis) sobre as posições de cada investidor em um intervalo de datas")
+async def calculate_fees_by_period(request: FeeCalculationByPeriodRequest, db: AsyncSession = Depends(get_db)):
+    return await portfolio_fee_controller.calculate_fees_by_period(request, db)
+
+@app.post("/import/movements",
+          response_model=MovementImportResponse,
+          summary="Importar Planilha de Movimentações",
+          description="Importa movimentações de uma planilha CSV (text/csv) ou Excel (.xlsx) enviada no corpo, com cabeçalho "
+                      "investor_id,stock_id,stock_value,date_of_occurrence. A planilha é lida linha a linha e inserida em "
+                      "blocos, em uma única transação; a resposta traz as linhas rejeitadas e a vazão (linhas/s)")
+async def import_movements(request: Request,
+                           format: Optional[str] = Query(None, pattern=f"^({'|'.join(SPREADSHEET_FORMATS)})$",
+                                                         description="Formato da planilha (padrão: pelo Content-Type)"),
+                           chunk_size: int = Query(DEFAULT_BULK_CHUNK_SIZE, ge=1, le=MAX_BULK_CHUNK_SIZE,
+                                                   description="Linhas por INSERT")):
+    return await spreadsheet_controller.import_movements(request.headers.get("content-type"), format, request.stream(),
+                                                         chunk_size)
+
+@app.get("/export/fees",
+         response_class=Response,
+         summary="Exportar Taxas por Data",
+         description="Exporta as taxas por investidor de /calculate-fees/by-date em CSV ou Excel (.xlsx), gravadas linha a "
+                     "linha. Os cabeçalhos X-Export-Rows e X-Export-Rows-Per-Second informam linhas e vazão")
+async def export_fees(calculation_date: datetime = Query(..., description="Data para o cálculo das taxas de administração"),
+                      taxa: float = Query(..., ge=0, description="Taxa de administração anual (>= 0.0)"),
+                      format: str = Query("csv", pattern=f"^({'|'.join(SPREADSHEET_FORMATS)})$", description="Formato do arquivo")):
+    return await spreadsheet_controller.export_fees(calculation_date, taxa, format)
+
+@app.post("/jobs/fee-runs",
+          response_model=JobResponse,
+          status_code=202,
+          summary="Enfileirar Cálculo de Taxas por Data",
+          description="Cria uma tarefa em segundo plano que calcula as taxas de todos os investidores em uma data (como "
+                      "/calculate-fees/by-date). Retorna a tarefa pendente; acompanhe o progresso em GET /jobs/{job_id}")
+async def create_fee_run(request: FeeCalculationByDateRequest, db: AsyncSession = Depends(get_db)):
+    return await job_controller.create_fee_run(request, db)
+
+@app.get("/jobs/{job_id}",
+         response_model=JobResponse,
+         summary="Consultar Tarefa",
+         description="Estado e progresso de uma tarefa e uma página dos resultados já gravados (paginação por cursor)")
+async def get_job(job_id: int,
+                  limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Resultados por página"),
+                  cursor: Optional[str] = Query(None, description="Cursor retornado em next_cursor"),
+                  db: AsyncSession = Depends(get_db)):
+    return await job_controller.get_job(job_id, db, limit, cursor)
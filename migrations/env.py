@@ -0,0 +1,75 @@
+from logging.config import fileConfig
+
+from sqlalchemy import create_engine, inspect, pool
+
+from alembic import context
+from alembic.script import ScriptDirectory
+
+from database.database import Base, SQLALCHEMY_DATABASE_URL
+import database.models  # noqa: F401 - registra as tabelas no metadata
+
+config = context.config
+
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def get_url() -> str:
+    return config.get_main_option("sqlalchemy.url") or SQLALCHEMY_DATABASE_URL
+
+
+def run_migrations_offline() -> None:
+    context.configure(
+        url=get_url(),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=True,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run_with_connection(connection)
+        return
+
+    connectable = create_engine(get_url(), poolclass=pool.NullPool)
+    with connectable.connect() as connection:
+        _run_with_connection(connection)
+
+
+def _run_with_connection(connection) -> None:
+    context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=True)
+
+    with context.begin_transaction():
+        _stamp_existing_schema(connection)
+        context.run_migrations()
+
+
+def _stamp_existing_schema(connection) -> None:
+    """
+    Bancos criados antes das migrações: marca a revisão equivalente ao esquema existente
+
+    Uma alembic_version vazia conta como sem marcação; é o que sobra de um
+    upgrade que tentou rodar 0001 sobre um banco desses.
+    """
+    migration_context = context.get_context()
+    if migration_context.get_current_heads():
+        return
+
+    inspector = inspect(connection)
+    if inspector.has_table("movements"):
+        revision = "0002" if inspector.has_table("position_snapshots") else "0001"
+        migration_context.stamp(ScriptDirectory.from_config(config), revision)
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,100 @@
+"""Snapshots diários de posição por investidor e ação
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "position_snapshots",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("snapshot_date", sa.Date(), nullable=False),
+        sa.Column("investor_id", sa.Integer(), sa.ForeignKey("investors.id"), nullable=False),
+        sa.Column("stock_id", sa.Integer(), sa.ForeignKey("stocks.id"), nullable=False),
+        sa.Column("total_value", sa.Float(), nullable=False),
+        sa.Column("movements_count", sa.Integer(), nullable=False),
+        sa.Column("last_date_of_occurrence", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("investor_id", "stock_id", "snapshot_date", name="uq_position_snapshot"),
+    )
+    op.create_index("ix_position_snapshots_id", "position_snapshots", ["id"])
+    op.create_index("ix_position_snapshots_date", "position_snapshots", ["snapshot_date"])
+
+    _backfill()
+
+
+def _backfill() -> None:
+    """
+    Um snapshot por (investidor, ação, dia com movimentos), com o acumulado até
+    o fim do dia, como PositionService.rebuild; sem isso um banco existente
+    perderia o histórico nos cálculos por data
+    """
+    movements = sa.table(
+        "movements",
+        sa.column("investor_id", sa.Integer()),
+        sa.column("stock_id", sa.Integer()),
+        sa.column("stock_value", sa.Float()),
+        sa.column("date_of_occurrence", sa.DateTime(timezone=True)),
+    )
+    snapshots = sa.table(
+        "position_snapshots",
+        sa.column("snapshot_date", sa.Date()),
+        sa.column("investor_id", sa.Integer()),
+        sa.column("stock_id", sa.Integer()),
+        sa.column("total_value", sa.Float()),
+        sa.column("movements_count", sa.Integer()),
+        sa.column("last_date_of_occurrence", sa.DateTime(timezone=True)),
+    )
+
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(movements.c.investor_id, movements.c.stock_id, movements.c.stock_value, movements.c.date_of_occurrence)
+        .order_by(movements.c.investor_id, movements.c.stock_id, movements.c.date_of_occurrence)
+    )
+
+    batch = []
+    current = None
+    for investor_id, stock_id, value, date_of_occurrence in rows:
+        snapshot_date = date_of_occurrence.date()
+        same_pair = current is not None and current["investor_id"] == investor_id and current["stock_id"] == stock_id
+
+        if not same_pair or current["snapshot_date"] != snapshot_date:
+            if current is not None:
+                batch.append(current)
+            current = {
+                "snapshot_date": snapshot_date,
+                "investor_id": investor_id,
+                "stock_id": stock_id,
+                "total_value": current["total_value"] if same_pair else 0.0,
+                "movements_count": current["movements_count"] if same_pair else 0,
+                "last_date_of_occurrence": date_of_occurrence,
+            }
+            if len(batch) >= 5000:
+                bind.execute(snapshots.insert(), batch)
+                batch = []
+
+        current["total_value"] += value
+        current["movements_count"] += 1
+        current["last_date_of_occurrence"] = date_of_occurrence
+
+    if current is not None:
+        batch.append(current)
+    if batch:
+        bind.execute(snapshots.insert(), batch)
+
+
+def downgrade() -> None:
+    op.drop_table("position_snapshots")
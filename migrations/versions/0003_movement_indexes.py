@@ -0,0 +1,33 @@
+"""Índices compostos na tabela de movimentações
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_movements_investor_date", "movements", ["investor_id", "date_of_occurrence"])
+    op.create_index("ix_movements_stock_date", "movements", ["stock_id", "date_of_occurrence"])
+    op.create_index("ix_movements_date", "movements", ["date_of_occurrence"])
+    op.create_index(
+        "ix_movements_investor_stock_date", "movements",
+        ["investor_id", "stock_id", "date_of_occurrence", "stock_value"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_movements_investor_stock_date", table_name="movements")
+    op.drop_index("ix_movements_date", table_name="movements")
+    op.drop_index("ix_movements_stock_date", table_name="movements")
+    op.drop_index("ix_movements_investor_date", table_name="movements")
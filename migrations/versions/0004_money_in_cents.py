@@ -0,0 +1,55 @@
+"""Valores monetários em centavos (inteiros)
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _to_cents(table: str, old: str, new: str) -> None:
+    with op.batch_alter_table(table) as batch_op:
+        batch_op.add_column(sa.Column(new, sa.BigInteger(), nullable=True))
+    op.execute(f"UPDATE {table} SET {new} = CAST(ROUND({old} * 100) AS BIGINT)")
+    with op.batch_alter_table(table) as batch_op:
+        batch_op.alter_column(new, existing_type=sa.BigInteger(), nullable=False)
+        batch_op.drop_column(old)
+
+
+def _from_cents(table: str, old: str, new: str) -> None:
+    with op.batch_alter_table(table) as batch_op:
+        batch_op.add_column(sa.Column(new, sa.Float(), nullable=True))
+    op.execute(f"UPDATE {table} SET {new} = {old} / 100.0")
+    with op.batch_alter_table(table) as batch_op:
+        batch_op.alter_column(new, existing_type=sa.Float(), nullable=False)
+        batch_op.drop_column(old)
+
+
+def upgrade() -> None:
+    op.drop_index("ix_movements_investor_stock_date", table_name="movements")
+    _to_cents("movements", "stock_value", "stock_value_cents")
+    op.create_index(
+        "ix_movements_investor_stock_date", "movements",
+        ["investor_id", "stock_id", "date_of_occurrence", "stock_value_cents"]
+    )
+    _to_cents("position_snapshots", "total_value", "total_value_cents")
+
+
+def downgrade() -> None:
+    _from_cents("position_snapshots", "total_value_cents", "total_value")
+    op.drop_index("ix_movements_investor_stock_date", table_name="movements")
+    _from_cents("movements", "stock_value_cents", "stock_value")
+    op.create_index(
+        "ix_movements_investor_stock_date", "movements",
+        ["investor_id", "stock_id", "date_of_occurrence", "stock_value"]
+    )
@@ -0,0 +1,43 @@
+"""Posição corrente agregada por investidor e ação
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "position_totals",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("investor_id", sa.Integer(), sa.ForeignKey("investors.id"), nullable=False),
+        sa.Column("stock_id", sa.Integer(), sa.ForeignKey("stocks.id"), nullable=False),
+        sa.Column("total_value_cents", sa.BigInteger(), nullable=False),
+        sa.Column("movements_count", sa.Integer(), nullable=False),
+        sa.Column("last_date_of_occurrence", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("investor_id", "stock_id", name="uq_position_total"),
+    )
+    op.create_index("ix_position_totals_id", "position_totals", ["id"])
+
+    op.execute(
+        "INSERT INTO position_totals (investor_id, stock_id, total_value_cents, movements_count, last_date_of_occurrence) "
+        "SELECT investor_id, stock_id, SUM(stock_value_cents), COUNT(id), MAX(date_of_occurrence) "
+        "FROM movements GROUP BY investor_id, stock_id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_position_totals_id", table_name="position_totals")
+    op.drop_table("position_totals")
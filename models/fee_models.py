@@ -1,5 +1,7 @@
 from pydantic import BaseModel, Field, field_validator
 from typing import List
+import struct
+import numpy as np
 
 class CotaData(BaseModel):
     valor: float = Field(..., gt=0, description="Valor unitário da cota do fundo")
@@ -53,5 +55,89 @@ class FeeCalculationRequest(BaseModel):
             }
         }
 
+class FundFeeGroup(FeeCalculationRequest):
+    fundo: str = Field(..., min_length=1, max_length=20, description="Identificador do fundo (ex: JURO11), chave da resposta")
+
+
+class FeeCalculationBatchRequest(BaseModel):
+    grupos: List[FundFeeGroup] = Field(..., min_length=1, description="Fundos com a sua taxa e série de cotas")
+    
+    @field_validator('grupos')
+    @classmethod
+    def validar_fundos_unicos(cls, v):
+        """Fundos repetidos sobrescreveriam uns aos outros na resposta"""
+        vistos = set()
+        for i, grupo in enumerate(v):
+            if grupo.fundo in vistos:
+                raise ValueError(f"Grupo {i}: fundo {grupo.fundo} repetido")
+            vistos.add(grupo.fundo)
+        return v
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "grupos": [
+                    {"fundo": "JURO11", "taxa": 0.01, "cotas": [{"valor": 100.0, "quantidades": [10, 20]}]},
+                    {"fundo": "CDII11", "taxa": 0.008, "cotas": [{"valor": 95.5, "quantidades": [5, 15, 30]}]}
+                ]
+            }
+        }
+
+
 class FeeCalculationResponse(BaseModel):
     fees: List[float] = Field(..., description="Taxas de administração calculadas por investidor")
+
+
+class FeeCalculationBinaryRequest:
+    """
+    Requisição de cálculo em formato binário colunar (application/octet-stream)
+
+    Layout (little-endian):
+        cabeçalho: taxa (float64), dias (uint32), investidores (uint32)
+        valores:   dias float64
+        quantidades: dias * investidores float64, ordem por linha (dia a dia)
+    """
+
+    MEDIA_TYPE = "application/octet-stream"
+    HEADER = struct.Struct("<dII")
+
+    def __init__(self, taxa: float, valores: np.ndarray, quantidades: np.ndarray):
+        self.taxa = taxa
+        self.valores = valores
+        self.quantidades = quantidades
+
+    @classmethod
+    def from_bytes(cls, body: bytes) -> "FeeCalculationBinaryRequest":
+        """Decodifica e valida o payload em bloco, sem validação por elemento"""
+        if len(body) < cls.HEADER.size:
+            raise ValueError("Payload binário menor que o cabeçalho")
+
+        taxa, dias, investidores = cls.HEADER.unpack_from(body)
+        if not np.isfinite(taxa) or taxa < 0:
+            raise ValueError("Taxa deve ser não negativa")
+        if dias < 1:
+            raise ValueError("Pelo menos uma cota é necessária")
+        if investidores < 1:
+            raise ValueError("Pelo menos um investidor é necessário")
+
+        esperado = cls.HEADER.size + 8 * dias * (investidores + 1)
+        if len(body) != esperado:
+            raise ValueError(f"Payload com {len(body)} bytes, esperado {esperado} para {dias} dias e {investidores} investidores")
+
+        dados = np.frombuffer(body, dtype="<f8", offset=cls.HEADER.size)
+        if not np.all(np.isfinite(dados)):
+            raise ValueError("Payload contém valores não finitos")
+        valores = dados[:dias]
+        quantidades = dados[dias:].reshape(dias, investidores)
+
+        if not np.all(valores > 0):
+            raise ValueError("Valores das cotas devem ser positivos")
+        if not np.all(quantidades >= 0):
+            raise ValueError("Quantidades devem ser positivas")
+
+        return cls(taxa, valores, quantidades)
+
+    @staticmethod
+    def encode_fees(fees: List[float]) -> bytes:
+        """Codifica o vetor de taxas como float64 little-endian"""
+        return np.asarray(fees, dtype="<f8").tobytes()
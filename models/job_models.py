@@ -0,0 +1,18 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    status: str = Field(..., description="pending, running, completed ou failed")
+    params: Dict[str, Any] = Field(..., description="Parâmetros com que a tarefa foi criada")
+    processed: int = Field(..., description="Itens já processados (investidores, no cálculo de taxas)")
+    total: Optional[int] = Field(None, description="Total de itens, conhecido quando a execução começa")
+    progress: float = Field(..., description="Fração concluída, de 0 a 1")
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    results: List[Dict[str, Any]] = Field(default_factory=list, description="Página de resultados já gravados, na ordem de produção")
+    next_cursor: Optional[str] = Field(None, description="Cursor da próxima página de resultados")
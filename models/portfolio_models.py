@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, field_validator
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, date
 from decimal import Decimal
 
 class InvestorCreate(BaseModel):
@@ -52,8 +52,25 @@ class MovementCreate(BaseModel):
     def validate_stock_value(cls, v):
         if v <= 0:
             raise ValueError('Valor da ação deve ser positivo')
+        # Valores são armazenados em centavos
+        if round(v, 2) <= 0:
+            raise ValueError('Valor da ação deve ser de pelo menos 0,01')
         return round(v, 2)
 
+class MovementBulkError(BaseModel):
+    row: int = Field(..., description="Índice da linha no lote (começando em 0, sem o cabeçalho do CSV)")
+    error: str
+
+class MovementBulkResponse(BaseModel):
+    inserted: int = Field(..., description="Quantidade de movimentações inseridas")
+    failed: int = Field(..., description="Quantidade de linhas rejeitadas")
+    errors: List[MovementBulkError]
+
+class MovementImportResponse(MovementBulkResponse):
+    rows: int = Field(..., description="Linhas lidas da planilha (sem o cabeçalho)")
+    elapsed_seconds: float = Field(..., description="Duração da importação")
+    rows_per_second: float = Field(..., description="Vazão da importação em linhas por segundo")
+
 class MovementResponse(BaseModel):
     id: int
     investor_id: int
@@ -89,10 +106,31 @@ class FeeCalculationByInvestorRequest(BaseModel):
             raise ValueError('Taxa deve ser não negativa')
         return v
 
+class DateRange(BaseModel):
+    start_date: date = Field(..., description="Data inicial (inclusive)")
+    end_date: date = Field(..., description="Data final (inclusive)")
+
+class FeeCalculationByPeriodRequest(BaseModel):
+    start_date: date = Field(..., description="Data inicial do período (inclusive)")
+    end_date: date = Field(..., description="Data final do período (inclusive)")
+    taxa: float = Field(..., ge=0, description="Taxa de administração anual (>= 0.0)")
+    investor_ids: Optional[List[int]] = Field(None, description="Restringe o cálculo a estes investidores")
+    include_daily: bool = Field(False, description="Inclui a posição e a taxa de cada dia útil por investidor")
+    sub_ranges: List[DateRange] = Field(default_factory=list, description="Sub-períodos para os quais retornar a taxa acumulada")
+    
+    @field_validator('end_date')
+    @classmethod
+    def validate_end_date(cls, v, info):
+        start_date = info.data.get('start_date')
+        if start_date and v < start_date:
+            raise ValueError('Data final deve ser maior ou igual à data inicial')
+        return v
+
 
 class InvestorListResponse(BaseModel):
     investors: List[InvestorResponse]
-    total: int
+    total: Optional[int] = Field(None, description="Total de registros (apenas com include_total=true)")
+    next_cursor: Optional[str] = Field(None, description="Cursor da próxima página; ausente na última página")
 
 class StockListResponse(BaseModel):
     stocks: List[StockResponse]
@@ -100,4 +138,5 @@ class StockListResponse(BaseModel):
 
 class MovementListResponse(BaseModel):
     movements: List[MovementResponse]
-    total: int
+    total: Optional[int] = Field(None, description="Total de registros (apenas com include_total=true)")
+    next_cursor: Optional[str] = Field(None, description="Cursor da próxima página; ausente na última página")
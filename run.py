@@ -16,6 +16,7 @@ def main():
   python run.py build     - Instala dependências, inicializa banco e inicia
   python run.py install   - Instala apenas as dependências
   python run.py init      - Inicializa apenas o banco de dados
+  python run.py check     - Verifica as posições agregadas e os snapshots contra as movimentações
         """)
         return
     
@@ -39,6 +40,9 @@ def main():
     
     elif command == "init":
         run_command("python init_database.py", "Inicializando banco de dados")
+    
+    elif command == "check":
+        run_command("python check_consistency.py " + " ".join(sys.argv[2:]), "Verificando consistência das posições")
         
     else:
         print(f"Comando desconhecido: {command}")
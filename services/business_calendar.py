@@ -0,0 +1,83 @@
+from datetime import date
+from functools import lru_cache
+from typing import Iterable
+import numpy as np
+from config import HOLIDAYS_FILE
+
+# Dias úteis por ano usados para converter a taxa anual em taxa diária
+TRADING_DAYS_PER_YEAR = 252
+
+
+class BusinessCalendar:
+    """
+    Calendário de dias úteis pré-computado para um intervalo fechado de anos
+
+    Guarda um bitmap (um byte por dia corrido) e a contagem acumulada de dias
+    úteis, de modo que contar ou listar os dias úteis entre duas datas é uma
+    consulta O(1) nos arrays, sem testar data a data.
+    """
+
+    def __init__(self, holidays: Iterable[date], first_day: date, last_day: date):
+        self.first_day = first_day
+        self.last_day = last_day
+        self._origin = np.datetime64(first_day, "D")
+
+        days = np.arange(self._origin, np.datetime64(last_day, "D") + 1)
+        holiday_days = np.array(sorted(set(holidays)), dtype="datetime64[D]")
+        self.bitmap = np.is_busday(days, holidays=holiday_days)
+
+        # cumulative[i] = dias úteis em [first_day, first_day + i)
+        self.cumulative = np.zeros(len(days) + 1, dtype=np.int32)
+        np.cumsum(self.bitmap, out=self.cumulative[1:])
+        self._business_days = days[self.bitmap]
+
+    @classmethod
+    def from_file(cls, path: str) -> "BusinessCalendar":
+        """
+        Carrega os feriados de um arquivo texto (uma data ISO por linha)
+
+        O calendário cobre os anos completos entre o primeiro e o último feriado.
+        """
+        holidays = []
+        with open(path, encoding="utf-8") as file:
+            for line_number, line in enumerate(file, start=1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                try:
+                    holidays.append(date.fromisoformat(line.split()[0]))
+                except ValueError:
+                    raise ValueError(f"{path}:{line_number}: data inválida '{line}'")
+
+        if not holidays:
+            raise ValueError(f"{path}: nenhum feriado encontrado")
+
+        return cls(holidays, date(min(holidays).year, 1, 1), date(max(holidays).year, 12, 31))
+
+    def is_business_day(self, day: date) -> bool:
+        return bool(self.bitmap[self._index(day)])
+
+    def business_days_between(self, start: date, end: date) -> int:
+        """Quantidade de dias úteis entre `start` e `end` (inclusive)"""
+        if end < start:
+            return 0
+        return int(self.cumulative[self._index(end) + 1] - self.cumulative[self._index(start)])
+
+    def business_days(self, start: date, end: date) -> np.ndarray:
+        """Dias úteis entre `start` e `end` (inclusive), como datetime64[D] ordenado"""
+        if end < start:
+            return self._business_days[:0]
+        return self._business_days[self.cumulative[self._index(start)]:self.cumulative[self._index(end) + 1]]
+
+    def _index(self, day: date) -> int:
+        if not self.first_day <= day <= self.last_day:
+            raise ValueError(
+                f"Data {day} fora do calendário de dias úteis ({self.first_day} a {self.last_day})"
+            )
+        return int((np.datetime64(day, "D") - self._origin).astype(np.int64))
+
+
+@lru_cache(maxsize=None)
+def get_business_calendar(path: str = None) -> BusinessCalendar:
+    """Calendário compartilhado entre os serviços, carregado uma vez por processo"""
+    return BusinessCalendar.from_file(path or HOLIDAYS_FILE)
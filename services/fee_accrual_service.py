@@ -0,0 +1,168 @@
+from sqlalchemy.orm import Session
+from typing import Dict, List, Optional
+from datetime import date, datetime, time, timedelta
+import numpy as np
+from database.models import Movement, Investor
+from models.portfolio_models import FeeCalculationByPeriodRequest
+from services.position_service import PositionService
+from services.business_calendar import get_business_calendar
+from services.money import from_cents, fees_from_cents
+from services.metrics import stage
+
+
+class FeeAccrualTable:
+    """
+    Taxas diárias acumuladas por investidor em um período de dias úteis
+
+    `positions` guarda a posição de cada dia útil em centavos (int64) e
+    `prefix[d, i]` a soma das posições do investidor i até o dia útil d - 1.
+    Como a taxa é linear na posição, a taxa de qualquer sub-período sai de uma
+    diferença de duas linhas, O(1), e a soma inteira é exata.
+    """
+
+    def __init__(self, business_days: np.ndarray, investor_ids: List[int], positions: np.ndarray, taxa: float):
+        self.business_days = business_days
+        self.investor_ids = investor_ids
+        self.taxa = taxa
+        self.positions = positions
+        self._day_index = {day: index for index, day in enumerate(business_days.tolist())}
+        self._investor_index = {investor_id: index for index, investor_id in enumerate(investor_ids)}
+
+        self.prefix = np.zeros((len(business_days) + 1, len(investor_ids)), dtype=np.int64)
+        np.cumsum(positions, axis=0, out=self.prefix[1:])
+
+    def total(self, investor_id: int, start: date, end: date) -> float:
+        """Taxa acumulada do investidor entre `start` e `end` (inclusive)"""
+        column = self._investor_index[investor_id]
+        first, last = self._bounds(start, end)
+        return float(fees_from_cents(self.prefix[last, column] - self.prefix[first, column], self.taxa))
+
+    def totals(self, start: date, end: date) -> np.ndarray:
+        """Taxas acumuladas de todos os investidores entre `start` e `end` (inclusive)"""
+        first, last = self._bounds(start, end)
+        return fees_from_cents(self.prefix[last] - self.prefix[first], self.taxa)
+
+    def daily_fees(self, investor_id: int) -> np.ndarray:
+        return fees_from_cents(self.positions[:, self._investor_index[investor_id]], self.taxa)
+
+    def _bounds(self, start: date, end: date):
+        first = self._next_business_day_index(start)
+        last = self._next_business_day_index(end + timedelta(days=1))
+        return first, max(first, last)
+
+    def _next_business_day_index(self, day: date) -> int:
+        index = self._day_index.get(day)
+        if index is None:
+            index = int(np.searchsorted(self.business_days, np.datetime64(day, "D")))
+        return index
+
+
+class FeeAccrualService:
+
+    def __init__(self):
+        self.position_service = PositionService()
+
+    def build_accrual_table(self, db: Session, start_date: date, end_date: date, taxa: float,
+                            investor_ids: Optional[List[int]] = None) -> FeeAccrualTable:
+        """
+        Monta a tabela de taxas diárias com uma única passada pelos movimentos do período
+
+        A posição de partida vem dos snapshots até o dia anterior a `start_date`;
+        os movimentos do período são lidos em ordem de data e somados ao primeiro
+        dia útil em que passam a valer (fim do dia). A taxa de cada dia útil é
+        posição * taxa / TRADING_DAYS_PER_YEAR, nos dias úteis do calendário da B3.
+        Posições são acumuladas em centavos.
+        """
+        business_days = self.business_days(start_date, end_date)
+        period_start = datetime.combine(start_date, time.min)
+        period_end = datetime.combine(end_date + timedelta(days=1), time.min)
+
+        with stage("positions"):
+            opening = self.position_service.get_positions_as_of(
+                db, period_start - timedelta(microseconds=1), investor_ids
+            )
+
+        movements_query = db.query(
+            Movement.investor_id, Movement.stock_value_cents, Movement.date_of_occurrence
+        ).filter(
+            Movement.date_of_occurrence >= period_start,
+            Movement.date_of_occurrence < period_end
+        )
+        if investor_ids is not None:
+            movements_query = movements_query.filter(Movement.investor_id.in_(investor_ids))
+        with stage("movements"):
+            movements = movements_query.order_by(Movement.date_of_occurrence).all()
+
+        with stage("accrual"):
+            ids = sorted({position['investor_id'] for position in opening} | {movement[0] for movement in movements})
+            column = {investor_id: index for index, investor_id in enumerate(ids)}
+
+            positions = np.zeros((len(business_days), len(ids)), dtype=np.int64)
+            if len(business_days):
+                for position in opening:
+                    positions[0, column[position['investor_id']]] += position['total_value_cents']
+
+                days = np.array([movement[2].date() for movement in movements], dtype="datetime64[D]")
+                rows = np.searchsorted(business_days, days)
+                for (investor_id, value_cents, _), row in zip(movements, rows.tolist()):
+                    if row < len(business_days):
+                        positions[row, column[investor_id]] += value_cents
+
+                np.cumsum(positions, axis=0, out=positions)
+
+            return FeeAccrualTable(business_days, ids, positions, taxa)
+
+    def calculate_fees_by_period(self, db: Session, request: FeeCalculationByPeriodRequest) -> Dict:
+        for sub_range in request.sub_ranges:
+            if sub_range.start_date < request.start_date or sub_range.end_date > request.end_date:
+                raise ValueError(
+                    f"Sub-período {sub_range.start_date} a {sub_range.end_date} fora do período solicitado"
+                )
+            if sub_range.end_date < sub_range.start_date:
+                raise ValueError(f"Sub-período {sub_range.start_date} a {sub_range.end_date} inválido")
+
+        table = self.build_accrual_table(db, request.start_date, request.end_date, request.taxa, request.investor_ids)
+
+        names = dict(db.query(Investor.id, Investor.name).filter(Investor.id.in_(table.investor_ids)).all()) if table.investor_ids else {}
+        totals = table.totals(request.start_date, request.end_date).tolist()
+        sub_totals = [table.totals(sub_range.start_date, sub_range.end_date).tolist() for sub_range in request.sub_ranges]
+        days = [day.isoformat() for day in table.business_days.tolist()]
+
+        investors = []
+        for index, investor_id in enumerate(table.investor_ids):
+            investor = {
+                'investor_id': investor_id,
+                'investor_name': names.get(investor_id),
+                'total_fees': totals[index]
+            }
+            if request.sub_ranges:
+                investor['sub_ranges'] = [
+                    {
+                        'start_date': sub_range.start_date,
+                        'end_date': sub_range.end_date,
+                        'total_fees': sub_total[index]
+                    }
+                    for sub_range, sub_total in zip(request.sub_ranges, sub_totals)
+                ]
+            if request.include_daily:
+                daily_fees = table.daily_fees(investor_id)
+                investor['daily'] = [
+                    {
+                        'date': day,
+                        'position': from_cents(position),
+                        'fee': fee
+                    }
+                    for day, position, fee in zip(days, table.positions[:, index].tolist(), daily_fees.tolist())
+                ]
+            investors.append(investor)
+
+        return {
+            'start_date': request.start_date,
+            'end_date': request.end_date,
+            'taxa': request.taxa,
+            'business_days': len(days),
+            'investors': investors
+        }
+
+    def business_days(self, start_date: date, end_date: date) -> np.ndarray:
+        return get_business_calendar().business_days(start_date, end_date)
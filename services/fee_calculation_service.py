@@ -1,34 +1,223 @@
-from typing import List
+from typing import List, Sequence, Tuple
+import numpy as np
+from services.money import CENTS, fee_from_cents, fees_from_cents
+from services.metrics import stage
+
+# Somas em float64 são exatas abaixo de 2^53; totais em int64 cabem abaixo de 2^63
+LIMITE_FLOAT_EXATO = 2.0 ** 53
+LIMITE_INT64 = 2.0 ** 63
 
 class FeeCalculationService:
     """Calculo para taxas de fundo"""
-    
+
+    # Dias processados por bloco no motor vetorizado (limita as matrizes temporárias)
+    BLOCO_DIAS = 64
+
     def calculate_fees(self, taxa: float, cotas: List[dict]) -> List[float]:
         """
-        Calcula taxas de fundo
-        
+        Calcula taxas de fundo (motor vetorizado)
+
         Args:
             taxa: Taxa anual (ex: 0.01 = 1%)
             cotas: Lista de dados com valor e quantidades
-            
+
         Returns:
+            Taxas por investidor, arredondadas em 4 casas decimais
+        """
+        if not cotas:
+            raise ValueError("Pelo menos uma cota é necessária")
+
+        num_investidores = len(cotas[0]['quantidades'])
+        for i, cota in enumerate(cotas):
+            if len(cota['quantidades']) != num_investidores:
+                raise ValueError(f"Cota {i}: {len(cota['quantidades'])} investidores, esperado {num_investidores}")
+
+        valores = np.fromiter((cota['valor'] for cota in cotas), dtype=np.float64, count=len(cotas))
+        quantidades = np.array([cota['quantidades'] for cota in cotas], dtype=np.float64)
+
+        return self.calculate_fees_array(taxa, valores, quantidades)
+
+    def calculate_fees_array(self, taxa: float, valores: np.ndarray, quantidades: np.ndarray) -> List[float]:
+        """
+        Calcula taxas a partir de dados colunares
+
+        Args:
+            taxa: Taxa anual (ex: 0.01 = 1%)
+            valores: Vetor (dias,) com o valor da cota em cada dia
+            quantidades: Matriz (dias, investidores) com as quantidades
+
+        Returns:
+            Taxas por investidor, arredondadas em 4 casas decimais
+        """
+        with stage("fee_kernel"):
+            totais = self._totais_em_centavos(valores, quantidades)
+            return fees_from_cents(totais, taxa).tolist()
+
+    def calculate_fees_batch(self, grupos: Sequence[Tuple[float, np.ndarray, np.ndarray]]) -> List[List[float]]:
+        """
+        Calcula as taxas de vários fundos, cada um com a sua taxa e série de cotas
+
+        Os totais em centavos de cada fundo saem do mesmo motor de
+        calculate_fees_array; a conversão para taxas é uma única operação
+        vetorizada sobre os investidores de todos os fundos, com a taxa de cada
+        fundo repetida para os seus investidores. O resultado é idêntico ao de
+        calcular fundo a fundo.
+
+        Args:
+            grupos: (taxa, valores, quantidades) por fundo, como em calculate_fees_array
+
+        Returns:
+            Taxas por investidor de cada fundo, na ordem de `grupos`
+        """
+        if not grupos:
+            raise ValueError("Pelo menos um fundo é necessário")
+
+        with stage("fee_kernel"):
+            totais = [self._totais_em_centavos(valores, quantidades) for _, valores, quantidades in grupos]
+            tamanhos = [total.size for total in totais]
+            taxas = np.repeat(np.array([taxa for taxa, _, _ in grupos], dtype=np.float64), tamanhos)
+            fees = fees_from_cents(np.concatenate(totais), taxas)
+            return [parte.tolist() for parte in np.split(fees, np.cumsum(tamanhos)[:-1])]
+
+    def _totais_em_centavos(self, valores: np.ndarray, quantidades: np.ndarray) -> np.ndarray:
+        """
+        Soma, por investidor, o saldo diário (valor x quantidade) arredondado ao centavo
+
+        Cada bloco de dias é somado em float64, exato para inteiros abaixo de 2^53,
+        e os blocos são acumulados em int64; o total não depende da ordem das somas.
+        Quando os valores não cabem nesses limites, a soma é feita em inteiros do
+        Python (mesmo resultado de calculate_fees_reference, sem estouro silencioso).
+        """
+        dias = len(valores)
+        totais = np.zeros(quantidades.shape[1] if quantidades.ndim == 2 else 0, dtype=np.int64)
+        if dias == 0 or totais.size == 0:
+            return totais
+
+        bloco = np.empty((min(self.BLOCO_DIAS, dias), totais.size), dtype=np.float64)
+        limite = 0.0
+        for inicio in range(0, dias, self.BLOCO_DIAS):
+            linhas = bloco[:min(self.BLOCO_DIAS, dias - inicio)]
+            # Produtos que estouram float64 viram inf e são rejeitados abaixo
+            with np.errstate(over="ignore", invalid="ignore"):
+                np.multiply(quantidades[inicio:inicio + len(linhas)], valores[inicio:inicio + len(linhas), None], out=linhas)
+                linhas *= CENTS
+                np.rint(linhas, out=linhas)
+                somas = linhas.sum(axis=0)
+
+            # Limite das somas parciais do bloco: sem saldos negativos, a maior soma de coluna;
+            # senão, o maior saldo em módulo vezes o número de dias
+            minimo = float(linhas.min())
+            if minimo >= 0:
+                maximo = float(somas.max())
+            else:
+                maximo = max(float(linhas.max()), -minimo) * len(linhas)
+            if not np.isfinite(maximo):
+                raise ValueError("Valores, quantidades e seus produtos devem ser finitos")
+            limite += maximo
+            if maximo >= LIMITE_FLOAT_EXATO or limite >= LIMITE_INT64:
+                return self._totais_em_centavos_exatos(valores, quantidades)
+
+            totais += somas.astype(np.int64)
+        return totais
+
+    def _totais_em_centavos_exatos(self, valores: np.ndarray, quantidades: np.ndarray) -> np.ndarray:
+        """Como _totais_em_centavos, acumulando em inteiros do Python (array de objetos)"""
+        totais = [0] * quantidades.shape[1]
+        for inicio in range(0, len(valores), self.BLOCO_DIAS):
+            linhas = quantidades[inicio:inicio + self.BLOCO_DIAS] * valores[inicio:inicio + self.BLOCO_DIAS, None]
+            linhas *= CENTS
+            for linha in np.rint(linhas).tolist():
+                for i, centavos in enumerate(linha):
+                    totais[i] += int(centavos)
+        resultado = np.empty(len(totais), dtype=object)
+        resultado[:] = totais
+        return resultado
+
+    def create_accumulator(self, taxa: float) -> "FeeAccumulator":
+        """Cria um acumulador para cálculo incremental, dia a dia"""
+        return FeeAccumulator(self, taxa)
+
+    def calculate_fees_reference(self, taxa: float, cotas: List[dict]) -> List[float]:
+        """
+        Implementação de referência (laço puro em Python), mantida para
+        testes de equivalência com o motor vetorizado
         """
         if not cotas:
             raise ValueError("Pelo menos uma cota é necessária")
-        
+
         num_investidores = len(cotas[0]['quantidades'])
         for i, cota in enumerate(cotas):
             if len(cota['quantidades']) != num_investidores:
                 raise ValueError(f"Cota {i}: {len(cota['quantidades'])} investidores, esperado {num_investidores}")
-        
-        taxas_investidores = [0.0] * num_investidores
-        
+
+        totais_centavos = [0] * num_investidores
+
         for cota in cotas:
             valor = cota['valor']
             quantidades = cota['quantidades']
-            
+
             for i, quantidade in enumerate(quantidades):
-                taxa_diaria = quantidade * valor * taxa
-                taxas_investidores[i] += taxa_diaria
-        
-        return [float(f"{taxa / 252:.4f}") for taxa in taxas_investidores]
+                totais_centavos[i] += round(quantidade * valor * CENTS)
+
+        return [fee_from_cents(total, taxa) for total in totais_centavos]
+
+
+class FeeAccumulator:
+    """
+    Acumula somas por investidor (em centavos) linha a linha, para séries de
+    cotas recebidas em streaming. A memória cresce com o número de investidores,
+    não com o número de dias.
+    """
+
+    def __init__(self, service: FeeCalculationService, taxa: float):
+        self.service = service
+        self.taxa = taxa
+        self.dias = 0
+        self.totais = None
+        self.limite = 0.0
+
+    def add(self, valor: float, quantidades: List[float]) -> None:
+        """
+        Soma uma linha (dia) às taxas acumuladas
+
+        Args:
+            valor: Valor unitário da cota no dia
+            quantidades: Quantidades de cotas por investidor no dia
+        """
+        if not valor > 0:
+            raise ValueError(f"Cota {self.dias}: valor deve ser positivo")
+
+        linha = np.asarray(quantidades, dtype=np.float64)
+        if linha.ndim != 1 or linha.size == 0:
+            raise ValueError(f"Cota {self.dias}: quantidades devem ser uma lista não vazia")
+        if not np.all(linha >= 0):
+            raise ValueError(f"Cota {self.dias}: quantidades devem ser positivas")
+
+        if self.totais is None:
+            self.totais = np.zeros(linha.size, dtype=np.int64)
+        elif linha.size != self.totais.size:
+            raise ValueError(f"Cota {self.dias}: {linha.size} investidores, esperado {self.totais.size}")
+
+        with np.errstate(over="ignore", invalid="ignore"):
+            centavos = np.rint(linha * valor * CENTS)
+        maximo = float(centavos.max())
+        if not np.isfinite(maximo):
+            raise ValueError(f"Cota {self.dias}: valores, quantidades e seus produtos devem ser finitos")
+
+        # Acima do limite de int64 os totais passam a inteiros do Python (array de objetos)
+        self.limite += maximo
+        if self.totais.dtype != object and self.limite >= LIMITE_INT64:
+            self.totais = self.totais.astype(object)
+        if self.totais.dtype == object:
+            novos = np.empty(linha.size, dtype=object)
+            novos[:] = [int(valor_centavos) for valor_centavos in centavos.tolist()]
+            self.totais += novos
+        else:
+            self.totais += centavos.astype(np.int64)
+        self.dias += 1
+
+    def result(self) -> List[float]:
+        """Retorna as taxas por investidor, arredondadas em 4 casas decimais"""
+        if self.totais is None:
+            raise ValueError("Pelo menos uma cota é necessária")
+        return fees_from_cents(self.totais, self.taxa).tolist()
@@ -1,7 +1,15 @@
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy.orm import Session, Query
+from sqlalchemy.engine import Row
+from typing import List, Optional, Sequence, Tuple
 from database.models import Investor
 from models.portfolio_models import InvestorCreate, InvestorResponse
+from services.pagination import encode_cursor, decode_cursor, STREAM_BATCH_SIZE
+from services.cache import TTLCache
+
+investor_cache = TTLCache("investors", maxsize=10000, ttl=300.0)
+
+# Colunas das listagens sem objetos do ORM (caminho rápido de serialização)
+INVESTOR_ROW_COLUMNS = (Investor.id, Investor.name, Investor.email, Investor.created_at)
 
 class InvestorService:
     
@@ -13,16 +21,55 @@ class InvestorService:
         db.add(db_investor)
         db.commit()
         db.refresh(db_investor)
+        investor_cache.clear()
         return db_investor
     
-    def get_investor(self, db: Session, investor_id: int) -> Optional[Investor]:
-        return db.query(Investor).filter(Investor.id == investor_id).first()
+    def get_investor(self, db: Session, investor_id: int) -> Optional[InvestorResponse]:
+        return investor_cache.get_or_load(
+            ("id", investor_id),
+            lambda: self._to_response(db.query(Investor).filter(Investor.id == investor_id).first())
+        )
+    
+    def get_investor_by_email(self, db: Session, email: str) -> Optional[InvestorResponse]:
+        return investor_cache.get_or_load(
+            ("email", email.lower()),
+            lambda: self._to_response(db.query(Investor).filter(Investor.email == email).first())
+        )
     
-    def get_investor_by_email(self, db: Session, email: str) -> Optional[Investor]:
-        return db.query(Investor).filter(Investor.email == email).first()
+    def _to_response(self, investor: Optional[Investor]) -> Optional[InvestorResponse]:
+        return InvestorResponse.model_validate(investor) if investor else None
     
     def get_investors(self, db: Session) -> List[Investor]:
         return db.query(Investor).all()
     
+    def get_investors_page(self, db: Session, limit: int, cursor: Optional[str] = None) -> Tuple[List[Investor], Optional[str]]:
+        return self._page(self._keyset_query(db, cursor), limit)
+    
+    def get_investor_rows_page(self, db: Session, limit: int, cursor: Optional[str] = None) -> Tuple[List[Row], Optional[str]]:
+        """Como get_investors_page, mas retorna tuplas (INVESTOR_ROW_COLUMNS) em vez de objetos do ORM"""
+        return self._page(self._keyset_query(db, cursor, INVESTOR_ROW_COLUMNS), limit)
+    
+    def _page(self, query: Query, limit: int) -> Tuple[list, Optional[str]]:
+        investors = query.limit(limit + 1).all()
+        
+        next_cursor = None
+        if len(investors) > limit:
+            investors = investors[:limit]
+            next_cursor = encode_cursor([investors[-1].id])
+        
+        return investors, next_cursor
+    
+    def iter_investors(self, db: Session, cursor: Optional[str] = None) -> Query:
+        return self._keyset_query(db, cursor).yield_per(STREAM_BATCH_SIZE)
+    
+    def _keyset_query(self, db: Session, cursor: Optional[str], columns: Optional[Sequence] = None) -> Query:
+        query = db.query(*columns) if columns else db.query(Investor)
+        if cursor:
+            values = decode_cursor(cursor)
+            if len(values) != 1 or not isinstance(values[0], int):
+                raise ValueError("Cursor de paginação inválido")
+            query = query.filter(Investor.id > values[0])
+        return query.order_by(Investor.id)
+    
     def get_investors_count(self, db: Session) -> int:
         return db.query(Investor).count()
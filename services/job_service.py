@@ -0,0 +1,182 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, insert
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+import json
+import os
+import socket
+from database.models import Job, JobResult
+from models.portfolio_models import FeeCalculationByDateRequest
+from services.portfolio_fee_service import PortfolioFeeService
+from services.position_service import PositionService
+from services.pagination import encode_cursor, decode_cursor
+from services.metrics import registry, stage
+from config import JOB_BATCH_SIZE, JOB_LEASE_SECONDS
+
+JOB_FEE_RUN = "fee_run"
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+jobs_total = registry.counter("sparta_jobs_total", "Tarefas em segundo plano finalizadas", ("kind", "status"))
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _json_default(value: Any) -> str:
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+def worker_name(thread_name: str) -> str:
+    """Identificação do worker gravada na tarefa: host, pid e thread"""
+    return f"{socket.gethostname()}:{os.getpid()}:{thread_name}"
+
+
+class JobService:
+    """
+    Fila de tarefas em segundo plano, persistida no banco (tabelas jobs e job_results)
+
+    Uma tarefa é executada no máximo uma vez: o worker só a assume com um UPDATE
+    condicional (status 'pending' -> 'running'), e uma tarefa interrompida no meio
+    (processo encerrado) é marcada como 'failed' em vez de recomeçar, já que parte
+    dos resultados pode ter sido gravada. Tarefas pendentes sobrevivem a
+    reinícios e são assumidas pelo próximo worker.
+
+    Enquanto executa, o processo renova `heartbeat_at` (ver JobWorkerPool); uma
+    tarefa sem heartbeat há mais de `lease_seconds` é considerada interrompida.
+    Ao contrário de host e pid, isso continua valendo quando um contêiner
+    reinicia com o mesmo hostname e os mesmos pids.
+    """
+
+    def __init__(self, batch_size: int = JOB_BATCH_SIZE, lease_seconds: float = JOB_LEASE_SECONDS):
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.portfolio_fee_service = PortfolioFeeService()
+        self.position_service = PositionService()
+        self.runners: Dict[str, Callable[[Session, Job], None]] = {
+            JOB_FEE_RUN: self._run_fee_run,
+        }
+
+    def create_fee_run(self, db: Session, request: FeeCalculationByDateRequest) -> Job:
+        """Enfileira o cálculo de taxas por data para todos os investidores"""
+        job = Job(kind=JOB_FEE_RUN, status=JOB_PENDING, params=request.model_dump_json(), processed=0)
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        return job
+
+    def get_job(self, db: Session, job_id: int) -> Optional[Job]:
+        return db.query(Job).filter(Job.id == job_id).first()
+
+    def get_results_page(self, db: Session, job_id: int, limit: int,
+                         cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """Página de resultados na ordem de produção (keyset em position)"""
+        query = db.query(JobResult.position, JobResult.payload).filter(JobResult.job_id == job_id)
+        if cursor:
+            values = decode_cursor(cursor)
+            if len(values) != 1 or not isinstance(values[0], int):
+                raise ValueError("Cursor de paginação inválido")
+            query = query.filter(JobResult.position > values[0])
+
+        rows = query.order_by(JobResult.position).limit(limit + 1).all()
+        next_cursor = encode_cursor([rows[limit - 1].position]) if len(rows) > limit else None
+        return [json.loads(row.payload) for row in rows[:limit]], next_cursor
+
+    def claim_next(self, db: Session, worker: str) -> Optional[Job]:
+        """
+        Assume a tarefa pendente mais antiga, ou retorna None se não houver
+
+        O UPDATE só altera a linha se ela ainda estiver pendente; se outro worker
+        (thread ou processo) a assumiu antes, tenta a próxima.
+        """
+        while True:
+            job_id = db.query(Job.id).filter(Job.status == JOB_PENDING).order_by(Job.id).limit(1).scalar()
+            if job_id is None:
+                db.rollback()
+                return None
+
+            claimed = db.query(Job).filter(Job.id == job_id, Job.status == JOB_PENDING).update(
+                {Job.status: JOB_RUNNING, Job.worker: worker, Job.started_at: _now(), Job.heartbeat_at: _now()},
+                synchronize_session=False
+            )
+            db.commit()
+            if claimed:
+                return self.get_job(db, job_id)
+
+    def run(self, db: Session, job: Job) -> None:
+        """Executa uma tarefa já assumida e grava o estado final (completed ou failed)"""
+        try:
+            runner = self.runners.get(job.kind)
+            if runner is None:
+                raise ValueError(f"Tipo de tarefa desconhecido: {job.kind}")
+            runner(db, job)
+            job.status = JOB_COMPLETED
+        except Exception as e:
+            db.rollback()
+            job.status = JOB_FAILED
+            job.error = str(e) or type(e).__name__
+        job.finished_at = _now()
+        db.commit()
+        jobs_total.inc(job.kind, job.status)
+
+    def heartbeat(self, db: Session, job_ids: Iterable[int]) -> None:
+        """Renova o heartbeat das tarefas em execução neste processo"""
+        job_ids = list(job_ids)
+        if job_ids:
+            db.query(Job).filter(Job.id.in_(job_ids), Job.status == JOB_RUNNING).update(
+                {Job.heartbeat_at: _now()}, synchronize_session=False
+            )
+        db.commit()
+
+    def fail_interrupted(self, db: Session) -> int:
+        """
+        Marca como 'failed' as tarefas em execução sem heartbeat há mais de `lease_seconds`
+
+        Chamado periodicamente pelos workers de todos os processos; o UPDATE é
+        condicional, então uma tarefa que renovou o heartbeat no meio não é tocada.
+
+        Returns:
+            Quantidade de tarefas marcadas
+        """
+        cutoff = _now() - timedelta(seconds=self.lease_seconds)
+        last_seen = func.coalesce(Job.heartbeat_at, Job.started_at)
+        expired = db.query(Job.id, Job.kind).filter(Job.status == JOB_RUNNING, last_seen < cutoff).all()
+
+        interrupted = 0
+        for job_id, kind in expired:
+            updated = db.query(Job).filter(Job.id == job_id, Job.status == JOB_RUNNING, last_seen < cutoff).update({
+                Job.status: JOB_FAILED,
+                Job.error: "Interrompida: o processo que executava a tarefa parou de renovar o heartbeat",
+                Job.finished_at: _now()
+            }, synchronize_session=False)
+            if updated:
+                interrupted += 1
+                jobs_total.inc(kind, JOB_FAILED)
+        db.commit()
+        return interrupted
+
+    def _run_fee_run(self, db: Session, job: Job) -> None:
+        request = FeeCalculationByDateRequest.model_validate_json(job.params)
+
+        with stage("job.positions"):
+            positions = self.position_service.get_positions_as_of(db, request.calculation_date)
+            investor_positions = self.portfolio_fee_service.group_by_investor(positions)
+        job.total = len(investor_positions)
+        db.commit()
+
+        # Cada lote é gravado com o progresso na mesma transação: resultados e `processed` não divergem
+        for start in range(0, len(investor_positions), self.batch_size):
+            batch = investor_positions[start:start + self.batch_size]
+            with stage("job.fees"):
+                fees = self.portfolio_fee_service.calculate_fees_partitioned(batch, request.taxa)
+            with stage("job.results"):
+                db.execute(insert(JobResult), [
+                    {'job_id': job.id, 'position': start + offset, 'payload': json.dumps(fee, default=_json_default)}
+                    for offset, fee in enumerate(fees)
+                ])
+                job.processed = start + len(batch)
+                db.commit()
@@ -0,0 +1,106 @@
+from typing import Callable, List, Optional, Set
+import logging
+import threading
+from sqlalchemy.orm import Session
+from database.database import SessionLocal
+from services.job_service import JobService, worker_name
+from config import JOB_WORKERS, JOB_POLL_INTERVAL, JOB_HEARTBEAT_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+class JobWorkerPool:
+    """
+    Threads que consomem a fila de tarefas do banco
+
+    Cada worker assume uma tarefa por vez com uma sessão própria. Sem tarefas,
+    espera `poll_interval` segundos ou até `notify()` (chamado ao enfileirar),
+    então tarefas criadas por outros processos também são encontradas.
+
+    Uma thread à parte renova a cada `heartbeat_interval` segundos o heartbeat
+    das tarefas em execução neste processo e marca como falhas as tarefas de
+    qualquer processo cujo heartbeat expirou (JobService.fail_interrupted).
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal, workers: int = JOB_WORKERS,
+                 poll_interval: float = JOB_POLL_INTERVAL, heartbeat_interval: float = JOB_HEARTBEAT_INTERVAL,
+                 service: Optional[JobService] = None):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.service = service or JobService()
+        self._threads: List[threading.Thread] = []
+        self._running: Set[int] = set()
+        self._running_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._wakeup = threading.Event()
+
+    def start(self) -> None:
+        """Inicia os workers e a thread de heartbeat"""
+        if self._threads or self.workers <= 0:
+            return
+
+        self._stopping.clear()
+        heartbeat = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        heartbeat.start()
+        self._threads.append(heartbeat)
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Para de assumir tarefas e espera as que estão em execução terminarem"""
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self) -> None:
+        """Acorda os workers ociosos (há tarefa nova na fila)"""
+        self._wakeup.set()
+
+    def _work(self) -> None:
+        worker = worker_name(threading.current_thread().name)
+        while not self._stopping.is_set():
+            db = self.session_factory()
+            try:
+                job = self.service.claim_next(db, worker)
+                if job is not None:
+                    with self._running_lock:
+                        self._running.add(job.id)
+                    try:
+                        self.service.run(db, job)
+                    finally:
+                        with self._running_lock:
+                            self._running.discard(job.id)
+                    continue
+            except Exception:
+                logger.exception("Erro no worker de tarefas %s", worker)
+            finally:
+                db.close()
+
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _heartbeat(self) -> None:
+        while not self._stopping.is_set():
+            db = self.session_factory()
+            try:
+                with self._running_lock:
+                    running = list(self._running)
+                self.service.heartbeat(db, running)
+                interrupted = self.service.fail_interrupted(db)
+                if interrupted:
+                    logger.warning("%d tarefa(s) interrompida(s) marcada(s) como falha", interrupted)
+            except Exception:
+                logger.exception("Erro ao renovar o heartbeat das tarefas")
+            finally:
+                db.close()
+
+            self._stopping.wait(self.heartbeat_interval)
+
+
+job_worker_pool = JobWorkerPool()
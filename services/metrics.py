@@ -0,0 +1,234 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import bisect
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Limites dos histogramas (segundos), os mesmos do cliente oficial do Prometheus
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, label_values)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # contagens por bucket (não cumulativas), soma, total
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    le_labels = _labels(self.labels + ("le",), label_values + (_number(bound),))
+                    lines.append(f"{self.name}_bucket{le_labels} {cumulative}")
+                lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), label_values + ('+Inf',))} {count}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, label_values)} {_number(total)}")
+                lines.append(f"{self.name}_count{_labels(self.labels, label_values)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Métricas do processo no formato texto do Prometheus"""
+
+    def __init__(self):
+        self._metrics: List = []
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help_text, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Histogram:
+        metric = Histogram(name, help_text, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], List[str]]) -> None:
+        """Registra uma função que gera linhas no momento da coleta (ex.: estatísticas de cache)"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+class RequestTimings:
+    """Tempos por etapa e comandos SQL de uma requisição"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.sql_count = 0
+        self.sql_duration = 0.0
+
+    def add_stage(self, name: str, duration: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + duration
+
+    def server_timing(self, total: float) -> str:
+        """
+        Valor do cabeçalho Server-Timing (durações em ms)
+
+        `app` é o tempo fora das etapas instrumentadas: roteamento, validação e
+        serialização da resposta.
+        """
+        entries = [f"total;dur={total * 1000:.2f}"]
+        entries.append(f'sql;dur={self.sql_duration * 1000:.2f};desc="{self.sql_count} comandos"')
+        for name, duration in self.stages.items():
+            entries.append(f"{name};dur={duration * 1000:.2f}")
+        # Etapas podem ser aninhadas; considera só as de primeiro nível
+        top_level = sum(duration for name, duration in self.stages.items() if "." not in name)
+        entries.append(f"app;dur={max(0.0, total - top_level) * 1000:.2f}")
+        return ", ".join(entries)
+
+
+registry = MetricsRegistry()
+
+http_requests_total = registry.counter(
+    "sparta_http_requests_total", "Requisições HTTP atendidas", ("method", "route", "status"))
+http_request_duration = registry.histogram(
+    "sparta_http_request_duration_seconds", "Duração das requisições HTTP", ("method", "route"))
+stage_duration = registry.histogram(
+    "sparta_stage_duration_seconds", "Duração das etapas instrumentadas nos serviços", ("stage",))
+sql_statements_total = registry.counter(
+    "sparta_sql_statements_total", "Comandos SQL executados", ("route",))
+sql_duration = registry.histogram(
+    "sparta_sql_statement_duration_seconds", "Duração dos comandos SQL", ("route",))
+
+_current_timings: ContextVar[Optional[RequestTimings]] = ContextVar("sparta_request_timings", default=None)
+_current_route: ContextVar[str] = ContextVar("sparta_request_route", default="")
+
+
+@contextmanager
+def request_timings(route: str = "") -> Iterator[RequestTimings]:
+    """Ativa a coleta de tempos para o contexto atual (uma requisição)"""
+    timings = RequestTimings()
+    timings_token = _current_timings.set(timings)
+    route_token = _current_route.set(route)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(timings_token)
+        _current_route.reset(route_token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Mede uma etapa de um serviço
+
+    A duração vai para o histograma do processo e, dentro de uma requisição,
+    para o cabeçalho Server-Timing. Sub-etapas usam nomes com ponto
+    (ex.: "positions.snapshots").
+
+    Exemplo:
+        with stage("positions"):
+            positions = self.position_service.get_positions_as_of(db, as_of)
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - started
+        stage_duration.observe(duration, name)
+        timings = _current_timings.get()
+        if timings is not None:
+            timings.add_stage(name, duration)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("sparta_query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info["sparta_query_started"].pop()
+    route = _current_route.get()
+    sql_statements_total.inc(route)
+    sql_duration.observe(duration, route)
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.sql_count += 1
+        timings.sql_duration += duration
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Passa a contar e medir os comandos SQL do engine (idempotente)"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def cache_collector(caches: Dict[str, object]) -> Callable[[], List[str]]:
+    """Exporta hits/misses/evictions/tamanho de caches que expõem `stats()`"""
+    def collect() -> List[str]:
+        stats = {name: cache.stats() for name, cache in caches.items()}
+        lines = []
+        for field, kind in (("hits", "counter"), ("misses", "counter"), ("evictions", "counter"), ("size", "gauge")):
+            metric = f"sparta_cache_{field}" + ("_total" if kind == "counter" else "")
+            lines.append(f"# TYPE {metric} {kind}")
+            for name, values in stats.items():
+                lines.append(f'{metric}{{cache="{name}"}} {values[field]}')
+        return lines
+    return collect
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
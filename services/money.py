@@ -0,0 +1,50 @@
+from typing import Union
+import numpy as np
+from services.business_calendar import TRADING_DAYS_PER_YEAR
+
+# Valores monetários são armazenados e somados em centavos (inteiros), e as taxas
+# são arredondadas para 4 casas decimais. Somas inteiras não dependem da ordem
+# de acumulação, então o resultado é reproduzível bit a bit.
+CENTS = 100
+FEE_DECIMALS = 4
+FEE_SCALE = 10 ** FEE_DECIMALS
+
+
+def to_cents(value: float) -> int:
+    """Converte um valor em reais para centavos (arredondamento ao centavo mais próximo)"""
+    return int(round(value * CENTS))
+
+
+def from_cents(cents: int) -> float:
+    return cents / CENTS
+
+
+def to_cents_array(values: np.ndarray) -> np.ndarray:
+    """Versão vetorizada de to_cents, com resultado em int64"""
+    return np.rint(np.asarray(values, dtype=np.float64) * CENTS).astype(np.int64)
+
+
+def _fee_factor(taxa: float) -> float:
+    # centavos -> taxa diária em unidades de 10^-4 reais
+    return taxa * FEE_SCALE / (TRADING_DAYS_PER_YEAR * CENTS)
+
+
+def fees_from_cents(totals_cents: np.ndarray, taxa: float) -> np.ndarray:
+    """
+    Taxa diária (4 casas decimais) de cada total em centavos
+
+    Um único produto em ponto flutuante por total, seguido de arredondamento
+    para o inteiro mais próximo em unidades de 10^-4, sem formatação de texto
+    valor a valor.
+    """
+    totals = np.asarray(totals_cents)
+    if totals.dtype == object:
+        # Totais acima de int64 (inteiros do Python): mesma aritmética, total a total
+        taxas = np.broadcast_to(np.asarray(taxa, dtype=np.float64), totals.shape)
+        return np.array([fee_from_cents(total, t) for total, t in zip(totals.tolist(), taxas.tolist())], dtype=np.float64)
+    return np.rint(totals * _fee_factor(taxa)) / FEE_SCALE
+
+
+def fee_from_cents(total_cents: Union[int, np.integer], taxa: float) -> float:
+    """Versão escalar de fees_from_cents (mesma aritmética, mesmo resultado)"""
+    return round(int(total_cents) * _fee_factor(taxa)) / FEE_SCALE
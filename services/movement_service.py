@@ -1,18 +1,46 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from typing import List, Optional
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import and_, tuple_, insert, literal, union_all
+from sqlalchemy.orm import Query
+from sqlalchemy.engine import Row
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from pydantic import ValidationError
 from datetime import datetime
 from database.models import Movement, Investor, Stock
-from models.portfolio_models import MovementCreate, MovementResponse
+from models.portfolio_models import MovementCreate, MovementResponse, MovementBulkError
+from services.position_service import PositionService
+from services.investor_service import InvestorService
+from services.stock_service import StockService
+from services.portfolio_fee_service import fee_result_cache
+from services.pagination import encode_cursor, decode_cursor, STREAM_BATCH_SIZE
+from services.metrics import stage
+from services.money import to_cents, from_cents
+
+DEFAULT_BULK_CHUNK_SIZE = 1000
+MAX_BULK_CHUNK_SIZE = 10000
+
+# Colunas das listagens sem objetos do ORM (caminho rápido de serialização); o
+# investidor e a ação vêm por JOIN em vez de selectinload
+MOVEMENT_ROW_COLUMNS = (
+    Movement.id, Movement.investor_id, Movement.stock_id, Movement.stock_value_cents,
+    Movement.date_of_occurrence, Movement.created_at,
+    Investor.name.label("investor_name"), Investor.email.label("investor_email"),
+    Investor.created_at.label("investor_created_at"),
+    Stock.symbol.label("stock_symbol"), Stock.name.label("stock_name"), Stock.created_at.label("stock_created_at"),
+)
 
 class MovementService:
+
+    def __init__(self):
+        self.position_service = PositionService()
+        self.investor_service = InvestorService()
+        self.stock_service = StockService()
     
     def create_movement(self, db: Session, movement_data: MovementCreate) -> Movement:
-        investor = db.query(Investor).filter(Investor.id == movement_data.investor_id).first()
+        investor = self.investor_service.get_investor(db, movement_data.investor_id)
         if not investor:
             raise ValueError(f"Investidor com ID {movement_data.investor_id} não encontrado")
         
-        stock = db.query(Stock).filter(Stock.id == movement_data.stock_id).first()
+        stock = self.stock_service.get_stock(db, movement_data.stock_id)
         if not stock:
             raise ValueError(f"Ação com ID {movement_data.stock_id} não encontrada")
         
@@ -23,15 +51,127 @@ class MovementService:
             date_of_occurrence=movement_data.date_of_occurrence
         )
         db.add(db_movement)
+        db.flush()
+        self.position_service.apply_movement(db, db_movement)
         db.commit()
+        fee_result_cache.invalidate_movements(movement_data.date_of_occurrence, [movement_data.investor_id])
         db.refresh(db_movement)
         return db_movement
     
+    def create_movements_bulk(self, db: Session, rows: Iterable[dict],
+                              chunk_size: int = DEFAULT_BULK_CHUNK_SIZE) -> Tuple[int, List[MovementBulkError]]:
+        """
+        Importa movimentos em lote, em uma única transação
+
+        Cada linha é validada individualmente; linhas inválidas ou com investidor/ação
+        inexistente são reportadas e não interrompem o lote. As linhas válidas são
+        inseridas em blocos de `chunk_size` (executemany) e aplicadas às posições.
+        
+        Returns:
+            Quantidade de movimentos inseridos e erros por linha
+        """
+        inserted = 0
+        earliest_date = None
+        investor_ids: Set[int] = set()
+        errors: List[MovementBulkError] = []
+        known_investors: Set[int] = set()
+        known_stocks: Set[int] = set()
+        
+        try:
+            chunk = []
+            for index, row in enumerate(rows):
+                try:
+                    chunk.append((index, MovementCreate.model_validate(row)))
+                except ValidationError as e:
+                    errors.append(MovementBulkError(row=index, error=self._format_validation_error(e)))
+                
+                if len(chunk) >= chunk_size:
+                    values = self._insert_chunk(db, chunk, known_investors, known_stocks, errors)
+                    inserted += len(values)
+                    earliest_date = self._track_written(values, earliest_date, investor_ids)
+                    chunk = []
+            
+            if chunk:
+                values = self._insert_chunk(db, chunk, known_investors, known_stocks, errors)
+                inserted += len(values)
+                earliest_date = self._track_written(values, earliest_date, investor_ids)
+            
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        
+        if earliest_date is not None:
+            fee_result_cache.invalidate_movements(earliest_date, investor_ids)
+        
+        errors.sort(key=lambda error: error.row)
+        return inserted, errors
+    
+    def _insert_chunk(self, db: Session, chunk: List[Tuple[int, MovementCreate]], known_investors: Set[int],
+                      known_stocks: Set[int], errors: List[MovementBulkError]) -> List[Dict]:
+        self._load_known_ids(
+            db,
+            {movement.investor_id for _, movement in chunk} - known_investors,
+            {movement.stock_id for _, movement in chunk} - known_stocks,
+            known_investors,
+            known_stocks
+        )
+        
+        values = []
+        for index, movement in chunk:
+            if movement.investor_id not in known_investors:
+                errors.append(MovementBulkError(row=index, error=f"Investidor com ID {movement.investor_id} não encontrado"))
+            elif movement.stock_id not in known_stocks:
+                errors.append(MovementBulkError(row=index, error=f"Ação com ID {movement.stock_id} não encontrada"))
+            else:
+                values.append({
+                    'investor_id': movement.investor_id,
+                    'stock_id': movement.stock_id,
+                    'stock_value_cents': to_cents(movement.stock_value),
+                    'date_of_occurrence': movement.date_of_occurrence
+                })
+        
+        if values:
+            with stage("insert"):
+                db.execute(insert(Movement), values)
+            with stage("positions"):
+                self.position_service.apply_movements(db, values)
+        
+        return values
+    
+    def _track_written(self, values: List[Dict], earliest_date: Optional[datetime], investor_ids: Set[int]) -> Optional[datetime]:
+        for value in values:
+            investor_ids.add(value['investor_id'])
+            occurred_at = value['date_of_occurrence'].replace(tzinfo=None)
+            if earliest_date is None or occurred_at < earliest_date:
+                earliest_date = occurred_at
+        return earliest_date
+    
+    def _load_known_ids(self, db: Session, investor_ids: Set[int], stock_ids: Set[int],
+                        known_investors: Set[int], known_stocks: Set[int]) -> None:
+        if not investor_ids and not stock_ids:
+            return
+        
+        query = union_all(
+            db.query(literal("investor"), Investor.id).filter(Investor.id.in_(investor_ids)).statement,
+            db.query(literal("stock"), Stock.id).filter(Stock.id.in_(stock_ids)).statement
+        )
+        for kind, id in db.execute(query):
+            (known_investors if kind == "investor" else known_stocks).add(id)
+    
+    def _format_validation_error(self, error: ValidationError) -> str:
+        return "; ".join(
+            f"{'.'.join(str(part) for part in detail['loc']) or 'linha'}: {detail['msg']}"
+            for detail in error.errors()
+        )
+    
     def get_movement(self, db: Session, movement_id: int) -> Optional[Movement]:
-        return db.query(Movement).filter(Movement.id == movement_id).first()
+        return db.query(Movement).options(
+            selectinload(Movement.investor), selectinload(Movement.stock)
+        ).filter(Movement.id == movement_id).first()
     
     def get_movements(self, db: Session, investor_id: Optional[int] = None, stock_id: Optional[int] = None) -> List[Movement]:
-        query = db.query(Movement)
+        query = db.query(Movement).options(selectinload(Movement.investor), selectinload(Movement.stock))
         
         if investor_id:
             query = query.filter(Movement.investor_id == investor_id)
@@ -40,6 +180,59 @@ class MovementService:
         
         return query.order_by(Movement.date_of_occurrence.desc()).all()
     
+    def get_movements_page(self, db: Session, limit: int, cursor: Optional[str] = None,
+                           investor_id: Optional[int] = None, stock_id: Optional[int] = None) -> Tuple[List[Movement], Optional[str]]:
+        return self._page(self._keyset_query(db, cursor, investor_id, stock_id), limit)
+    
+    def get_movement_rows_page(self, db: Session, limit: int, cursor: Optional[str] = None, investor_id: Optional[int] = None,
+                               stock_id: Optional[int] = None) -> Tuple[List[Row], Optional[str]]:
+        """Como get_movements_page, mas retorna tuplas (MOVEMENT_ROW_COLUMNS) em vez de objetos do ORM"""
+        return self._page(self._keyset_query(db, cursor, investor_id, stock_id, MOVEMENT_ROW_COLUMNS), limit)
+    
+    def get_movement_rows(self, db: Session, investor_id: Optional[int] = None, stock_id: Optional[int] = None) -> List[Row]:
+        """Todas as movimentações (mais recentes primeiro) como tuplas (MOVEMENT_ROW_COLUMNS)"""
+        return self._keyset_query(db, None, investor_id, stock_id, MOVEMENT_ROW_COLUMNS).all()
+    
+    def _page(self, query: Query, limit: int) -> Tuple[list, Optional[str]]:
+        movements = query.limit(limit + 1).all()
+        
+        next_cursor = None
+        if len(movements) > limit:
+            movements = movements[:limit]
+            last = movements[-1]
+            next_cursor = encode_cursor([last.date_of_occurrence.isoformat(), last.id])
+        
+        return movements, next_cursor
+    
+    def iter_movements(self, db: Session, cursor: Optional[str] = None, investor_id: Optional[int] = None,
+                       stock_id: Optional[int] = None) -> Query:
+        return self._keyset_query(db, cursor, investor_id, stock_id).yield_per(STREAM_BATCH_SIZE)
+    
+    def _keyset_query(self, db: Session, cursor: Optional[str], investor_id: Optional[int],
+                      stock_id: Optional[int], columns: Optional[Sequence] = None) -> Query:
+        if columns:
+            query = db.query(*columns).join(Investor, Movement.investor_id == Investor.id).join(Stock, Movement.stock_id == Stock.id)
+        else:
+            query = db.query(Movement).options(selectinload(Movement.investor), selectinload(Movement.stock))
+        
+        if investor_id:
+            query = query.filter(Movement.investor_id == investor_id)
+        if stock_id:
+            query = query.filter(Movement.stock_id == stock_id)
+        if cursor:
+            try:
+                last_date, last_id = decode_cursor(cursor)
+                last_date = datetime.fromisoformat(last_date)
+            except (ValueError, TypeError):
+                raise ValueError("Cursor de paginação inválido")
+            if not isinstance(last_id, int):
+                raise ValueError("Cursor de paginação inválido")
+            query = query.filter(
+                tuple_(Movement.date_of_occurrence, Movement.id) < tuple_(last_date, last_id)
+            )
+        
+        return query.order_by(Movement.date_of_occurrence.desc(), Movement.id.desc())
+    
     def get_movements_count(self, db: Session, investor_id: Optional[int] = None, 
                            stock_id: Optional[int] = None) -> int:
         query = db.query(Movement)
@@ -56,7 +249,9 @@ class MovementService:
     
     def get_movements_by_date_range(self, db: Session, start_date: datetime, 
                                    end_date: datetime, investor_id: Optional[int] = None) -> List[Movement]:
-        query = db.query(Movement).filter(
+        query = db.query(Movement).options(
+            selectinload(Movement.investor), selectinload(Movement.stock)
+        ).filter(
             and_(
                 Movement.date_of_occurrence >= start_date,
                 Movement.date_of_occurrence <= end_date
@@ -68,23 +263,29 @@ class MovementService:
         
         return query.order_by(Movement.date_of_occurrence.desc()).all()
     
-    def get_investor_portfolio_summary(self, db: Session, investor_id: int) -> dict:
-        movements = db.query(Movement).filter(
-            Movement.investor_id == investor_id
-        ).order_by(Movement.date_of_occurrence.desc()).all()
+    def get_investor_portfolio_summary(self, db: Session, investor_id: int, as_of: Optional[datetime] = None) -> dict:
+        """
+        Posições do investidor por ação, atuais ou em uma data/hora (`as_of`)
+
+        Sem `as_of`, lê position_totals. Com `as_of`, busca pelo índice o último
+        snapshot diário de cada ação anterior ao dia e reaplica só os movimentos
+        do próprio dia até `as_of` (PositionService.get_positions_as_of). O custo
+        é uma busca no índice por ação em carteira, mais os movimentos do dia; a
+        quantidade de dias com snapshot só pesa na profundidade do índice.
+        """
+        if as_of is None:
+            positions = self.position_service.get_totals(db, investor_id)
+        else:
+            positions = self.position_service.get_positions_as_of(db, as_of, [investor_id])
+        positions.sort(key=lambda position: position['last_date_of_occurrence'], reverse=True)
         
         portfolio = {}
-        for movement in movements:
-            stock_symbol = movement.stock.symbol
-            if stock_symbol not in portfolio:
-                portfolio[stock_symbol] = {
-                    'stock_id': movement.stock_id,
-                    'stock_name': movement.stock.name,
-                    'total_value': 0,
-                    'movements_count': 0
-                }
-            
-            portfolio[stock_symbol]['total_value'] += movement.stock_value
-            portfolio[stock_symbol]['movements_count'] += 1
+        for position in positions:
+            portfolio[position['stock_symbol']] = {
+                'stock_id': position['stock_id'],
+                'stock_name': position['stock_name'],
+                'total_value': from_cents(position['total_value_cents']),
+                'movements_count': position['movements_count']
+            }
         
         return portfolio
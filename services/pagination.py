@@ -0,0 +1,25 @@
+import base64
+import json
+from typing import Any, List
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 1000
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """Codifica a chave do último registro de uma página em um cursor opaco"""
+    payload = json.dumps(values, default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(cursor + padding))
+    except (ValueError, TypeError):
+        raise ValueError("Cursor de paginação inválido")
+
+    if not isinstance(values, list):
+        raise ValueError("Cursor de paginação inválido")
+    return values
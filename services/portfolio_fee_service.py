@@ -1,70 +1,317 @@
 from sqlalchemy.orm import Session
-from typing import List, Dict, Optional
+from sqlalchemy import func
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
-from database.models import Movement, Investor, Stock
+import json
+import math
+import multiprocessing
+import threading
+import time
+import numpy as np
+from database.models import Movement
 from models.portfolio_models import FeeCalculationByDateRequest, FeeCalculationByInvestorRequest
+from services.position_service import PositionService
+from services.money import from_cents, fee_from_cents, fees_from_cents
+from services.metrics import stage
+from services.pagination import STREAM_BATCH_SIZE
+from config import FEE_WORKERS, FEE_EXECUTOR, FEE_PARALLEL_MIN_INVESTORS, FEE_CACHE_TTL
+
+class FeeResultCache:
+    """
+    Memoização dos cálculos de taxa, limitada por um orçamento de memória (LRU)
+
+    Cada escrita de movimentos incrementa `version` e descarta apenas o que ela
+    afeta: resultados por data com calculation_date >= data do movimento e
+    resultados do investidor do movimento. Um resultado calculado enquanto uma
+    escrita acontecia (versão mudou) não é armazenado.
+
+    Escritas de outros processos (outros workers da API, init_database.py, a
+    fila de tarefas) são percebidas por `sync`, que compara o maior id de
+    movements com o último visto. Reconstruções que não criam movimentos
+    (check_consistency.py --fix) só são percebidas pelo TTL das entradas.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: float = FEE_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.version = 0
+        self.last_movement_id: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = 0
+        self._entries: "OrderedDict[Hashable, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def sync(self, db: Session) -> None:
+        """Descarta os resultados afetados por movimentos gravados desde a última consulta, por qualquer processo"""
+        last_id = db.query(func.max(Movement.id)).scalar() or 0
+        with self._lock:
+            seen = self.last_movement_id
+            if seen is None or last_id < seen:
+                # Primeira consulta, ou banco trocado/recriado: nada do que está em memória é confiável
+                self._clear()
+                self.last_movement_id = last_id
+                return
+            if last_id == seen:
+                return
+
+        earliest_date, = db.query(func.min(Movement.date_of_occurrence)).filter(Movement.id > seen).one()
+        investor_ids = [investor_id for investor_id, in
+                        db.query(Movement.investor_id).filter(Movement.id > seen).distinct()]
+        self.invalidate_movements(earliest_date, investor_ids)
+        with self._lock:
+            self.last_movement_id = max(self.last_movement_id or 0, last_id)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any], calculation_date: Optional[datetime] = None,
+                       investor_id: Optional[int] = None) -> Any:
+        """Retorna uma cópia do resultado (o chamador pode alterá-la sem afetar o cache)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['expires'] <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return _copy(entry['value'])
+            self.misses += 1
+            version = self.version
+
+        value = compute()
+        size = len(json.dumps(value, default=str))
+
+        with self._lock:
+            if version != self.version or size > self.max_bytes:
+                return value
+
+            self._remove(key)
+            self._entries[key] = {
+                'value': value,
+                'size': size,
+                'expires': time.monotonic() + self.ttl,
+                'calculation_date': _naive(calculation_date) if calculation_date else None,
+                'investor_id': investor_id
+            }
+            self._size += size
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return _copy(value)
+
+    def invalidate_movements(self, earliest_date: datetime, investor_ids: Iterable[int]) -> None:
+        """Registra uma escrita de movimentos e descarta os resultados afetados"""
+        earliest_date = _naive(earliest_date)
+        investor_ids = set(investor_ids)
+        with self._lock:
+            self.version += 1
+            stale = [
+                key for key, entry in self._entries.items()
+                if (entry['calculation_date'] is not None and entry['calculation_date'] >= earliest_date)
+                or entry['investor_id'] in investor_ids
+            ]
+            for key in stale:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clear()
+            self.last_movement_id = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "version": self.version,
+                "last_movement_id": self.last_movement_id,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+    def _clear(self) -> None:
+        self.version += 1
+        self._entries.clear()
+        self._size = 0
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry['size']
+
+
+def _copy(value: Any) -> Any:
+    """Cópia das listas e dicts de um resultado; as folhas (números, textos, datas) são imutáveis"""
+    if isinstance(value, dict):
+        return {key: _copy(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy(item) for item in value]
+    return value
+
+
+fee_result_cache = FeeResultCache()
+
+
+def _naive(value: datetime) -> datetime:
+    return value.replace(tzinfo=None)
+
+
+_executors: Dict[Tuple[str, int], Executor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_fee_executor(kind: str, workers: int) -> Executor:
+    """Pool compartilhado por (tipo, workers), criado sob demanda"""
+    with _executors_lock:
+        executor = _executors.get((kind, workers))
+        if executor is None:
+            if kind == "process":
+                executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            elif kind == "thread":
+                executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fee-worker")
+            else:
+                raise ValueError(f"Executor de taxas desconhecido: {kind}")
+            _executors[(kind, workers)] = executor
+        return executor
+
+
+def _calculate_fees_shard(investor_positions: List[Tuple[int, List[Dict]]], taxa: float) -> List[Dict]:
+    return PortfolioFeeService(workers=1)._calculate_fees_for_investors(investor_positions, taxa)
+
 
 class PortfolioFeeService:
+
+    def __init__(self, workers: int = FEE_WORKERS, executor: str = FEE_EXECUTOR,
+                 parallel_min_investors: int = FEE_PARALLEL_MIN_INVESTORS):
+        self.position_service = PositionService()
+        self.workers = workers
+        self.executor = executor
+        self.parallel_min_investors = parallel_min_investors
     
     def calculate_fees_by_date(self, db: Session, request: FeeCalculationByDateRequest) -> List[Dict]:
-        movements = db.query(Movement).filter(
-            Movement.date_of_occurrence <= request.calculation_date
-        ).all()
+        fee_result_cache.sync(db)
+        return fee_result_cache.get_or_compute(
+            ("date", _naive(request.calculation_date), request.taxa),
+            lambda: self._compute_fees_by_date(db, request),
+            calculation_date=request.calculation_date
+        )
+    
+    def calculate_fees_by_investor(self, db: Session, request: FeeCalculationByInvestorRequest) -> Dict:
+        fee_result_cache.sync(db)
+        return fee_result_cache.get_or_compute(
+            ("investor", request.investor_id, request.taxa),
+            lambda: self._compute_fees_by_investor(db, request),
+            investor_id=request.investor_id
+        )
+    
+    def _compute_fees_by_date(self, db: Session, request: FeeCalculationByDateRequest) -> List[Dict]:
+        with stage("positions"):
+            positions = self.position_service.get_positions_as_of(db, request.calculation_date)
         
-        investor_movements = {}
-        for movement in movements:
-            if movement.investor_id not in investor_movements:
-                investor_movements[movement.investor_id] = []
-            investor_movements[movement.investor_id].append(movement)
+        with stage("aggregation"):
+            return self.calculate_fees_partitioned(self.group_by_investor(positions), request.taxa)
+    
+    def iter_fees_by_date(self, db: Session, request: FeeCalculationByDateRequest,
+                          batch_size: int = STREAM_BATCH_SIZE) -> Iterator[Dict]:
+        """
+        Como calculate_fees_by_date, mas sem cache: as taxas são calculadas e
+        entregues em lotes de `batch_size` investidores, sem manter a lista
+        completa de resultados (exportações grandes)
+        """
+        with stage("positions"):
+            positions = self.position_service.get_positions_as_of(db, request.calculation_date)
+        investor_positions = self.group_by_investor(positions)
+        del positions
+
+        for start in range(0, len(investor_positions), batch_size):
+            yield from self.calculate_fees_partitioned(investor_positions[start:start + batch_size], request.taxa)
+    
+    def group_by_investor(self, positions: List[Dict]) -> List[Tuple[int, List[Dict]]]:
+        """Agrupa as posições por investidor, na ordem em que cada investidor aparece"""
+        investor_positions = {}
+        for position in positions:
+            if position['investor_id'] not in investor_positions:
+                investor_positions[position['investor_id']] = []
+            investor_positions[position['investor_id']].append(position)
+        return list(investor_positions.items())
+    
+    def calculate_fees_partitioned(self, investor_positions: List[Tuple[int, List[Dict]]], taxa: float) -> List[Dict]:
+        """
+        Calcula as taxas de cada investidor, dividindo-os em shards entre os workers
+
+        Os shards são fatias contíguas da lista de entrada e os resultados são
+        concatenados na ordem dos shards, então a saída é determinística e segue
+        a ordem de `investor_positions` independentemente do número de workers.
+        """
+        if self.workers <= 1 or not investor_positions or len(investor_positions) < self.parallel_min_investors:
+            return self._calculate_fees_for_investors(investor_positions, taxa)
+        
+        shard_size = math.ceil(len(investor_positions) / self.workers)
+        shards = [investor_positions[start:start + shard_size] for start in range(0, len(investor_positions), shard_size)]
         
+        executor = get_fee_executor(self.executor, self.workers)
+        results = executor.map(_calculate_fees_shard, shards, [taxa] * len(shards))
+        
+        return [investor_fee for shard_results in results for investor_fee in shard_results]
+    
+    def _calculate_fees_for_investors(self, investor_positions: List[Tuple[int, List[Dict]]], taxa: float) -> List[Dict]:
+        totals_cents = np.fromiter(
+            (sum(position['total_value_cents'] for position in investor_pos) for _, investor_pos in investor_positions),
+            dtype=np.int64, count=len(investor_positions)
+        )
+        fees = fees_from_cents(totals_cents, taxa).tolist()
         results = []
         
-        for investor_id, investor_movs in investor_movements.items():
-            investor_fee = self._calculate_investor_fee(investor_movs, request.taxa)
+        for (investor_id, investor_pos), total_cents, total_fees in zip(investor_positions, totals_cents.tolist(), fees):
+            investor_fee = self._investor_fee(investor_pos, taxa, total_cents, total_fees)
             investor_fee['investor_id'] = investor_id
-            investor_fee['investor_name'] = investor_movs[0].investor.name
+            investor_fee['investor_name'] = investor_pos[0]['investor_name']
             results.append(investor_fee)
         
         return results
     
-    def calculate_fees_by_investor(self, db: Session, request: FeeCalculationByInvestorRequest) -> Dict:
-        movements = db.query(Movement).filter(
-            Movement.investor_id == request.investor_id
-        ).all()
+    def _compute_fees_by_investor(self, db: Session, request: FeeCalculationByInvestorRequest) -> Dict:
+        with stage("query"):
+            positions = self.position_service.get_totals(db, request.investor_id)
         
-        if not movements:
+        if not positions:
             raise ValueError(f"Nenhum movimento encontrado para o investidor {request.investor_id}")
         
-        investor_fee = self._calculate_investor_fee(movements, request.taxa)
+        with stage("aggregation"):
+            investor_fee = self._calculate_investor_fee(positions, request.taxa)
         investor_fee['investor_id'] = request.investor_id
-        investor_fee['investor_name'] = movements[0].investor.name
+        investor_fee['investor_name'] = positions[0]['investor_name']
         
         return investor_fee
     
-    def _calculate_investor_fee(self, movements: List[Movement], taxa: float) -> Dict:
+    def _calculate_investor_fee(self, positions: List[Dict], taxa: float) -> Dict:
+        total_cents = sum(position['total_value_cents'] for position in positions)
+        return self._investor_fee(positions, taxa, total_cents, fee_from_cents(total_cents, taxa))
+    
+    def _investor_fee(self, positions: List[Dict], taxa: float, total_cents: int, total_fees: float) -> Dict:
+        """Monta o resultado de um investidor; valores em centavos são convertidos para reais só aqui"""
         stock_values = {}
         
-        for movement in movements:
-            stock_symbol = movement.stock.symbol
-            if stock_symbol not in stock_values:
-                stock_values[stock_symbol] = {
-                    'stock_name': movement.stock.name,
-                    'total_value': 0,
-                    'movements_count': 0
-                }
-            
-            stock_values[stock_symbol]['total_value'] += movement.stock_value
-            stock_values[stock_symbol]['movements_count'] += 1
-        
-        total_portfolio_value = sum(stock['total_value'] for stock in stock_values.values())
-        total_fees = total_portfolio_value * taxa / 252
+        for position in positions:
+            stock_values[position['stock_symbol']] = {
+                'stock_name': position['stock_name'],
+                'total_value': from_cents(position['total_value_cents']),
+                'movements_count': position['movements_count']
+            }
         
         return {
-            'calculation_date': movements[-1].date_of_occurrence if movements else None,
+            'calculation_date': max(position['last_date_of_occurrence'] for position in positions) if positions else None,
             'taxa': taxa,
-            'total_portfolio_value': round(total_portfolio_value, 2),
-            'total_fees': float(f"{total_fees:.4f}"),
-            'movements_count': len(movements),
+            'total_portfolio_value': from_cents(total_cents),
+            'total_fees': total_fees,
+            'movements_count': sum(position['movements_count'] for position in positions),
             'stocks_count': len(stock_values),
             'stock_breakdown': stock_values
         }
@@ -0,0 +1,447 @@
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import and_, case, func, insert, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from typing import Dict, Iterator, List, Optional, Tuple
+from datetime import datetime, time
+from database.models import Movement, Investor, Stock, PositionSnapshot, PositionTotal
+from services.metrics import stage
+
+def _naive(value: datetime) -> datetime:
+    return value.replace(tzinfo=None)
+
+
+# INSERT ... ON CONFLICT DO UPDATE por dialeto, para atualizar position_totals em um comando
+UPSERT_INSERTS = {
+    "sqlite": sqlite_insert,
+    "postgresql": postgresql_insert,
+}
+
+
+class PositionService:
+    """
+    Mantém as posições materializadas: diárias em position_snapshots e a
+    posição corrente por (investidor, ação) em position_totals
+    """
+
+    def apply_movement(self, db: Session, movement: Movement) -> None:
+        """Incorpora um movimento às posições, na transação corrente (sem commit)"""
+        snapshot_date = movement.date_of_occurrence.date()
+
+        snapshot = db.query(PositionSnapshot).filter(
+            PositionSnapshot.investor_id == movement.investor_id,
+            PositionSnapshot.stock_id == movement.stock_id,
+            PositionSnapshot.snapshot_date == snapshot_date
+        ).first()
+
+        if snapshot is None:
+            previous = db.query(PositionSnapshot).filter(
+                PositionSnapshot.investor_id == movement.investor_id,
+                PositionSnapshot.stock_id == movement.stock_id,
+                PositionSnapshot.snapshot_date < snapshot_date
+            ).order_by(PositionSnapshot.snapshot_date.desc()).first()
+
+            snapshot = PositionSnapshot(
+                snapshot_date=snapshot_date,
+                investor_id=movement.investor_id,
+                stock_id=movement.stock_id,
+                total_value_cents=previous.total_value_cents if previous else 0,
+                movements_count=previous.movements_count if previous else 0,
+                last_date_of_occurrence=movement.date_of_occurrence
+            )
+            db.add(snapshot)
+        elif _naive(movement.date_of_occurrence) > _naive(snapshot.last_date_of_occurrence):
+            snapshot.last_date_of_occurrence = movement.date_of_occurrence
+
+        snapshot.total_value_cents += movement.stock_value_cents
+        snapshot.movements_count += 1
+
+        db.query(PositionSnapshot).filter(
+            PositionSnapshot.investor_id == movement.investor_id,
+            PositionSnapshot.stock_id == movement.stock_id,
+            PositionSnapshot.snapshot_date > snapshot_date
+        ).update({
+            PositionSnapshot.total_value_cents: PositionSnapshot.total_value_cents + movement.stock_value_cents,
+            PositionSnapshot.movements_count: PositionSnapshot.movements_count + 1
+        }, synchronize_session=False)
+
+        self._add_to_totals(db, [{
+            'investor_id': movement.investor_id,
+            'stock_id': movement.stock_id,
+            'total_value_cents': movement.stock_value_cents,
+            'movements_count': 1,
+            'last_date_of_occurrence': movement.date_of_occurrence
+        }])
+
+    def apply_movements(self, db: Session, movements: List[Dict]) -> None:
+        """
+        Incorpora um lote de movimentos às posições, na transação corrente (sem commit)
+
+        Agrupa os movimentos por (investidor, ação, dia), carrega uma única vez os
+        snapshots dos pares afetados e propaga os deltas para os dias seguintes.
+        Os movimentos trazem o valor em centavos ('stock_value_cents').
+        """
+        deltas: Dict[Tuple[int, int], Dict] = {}
+        for movement in movements:
+            pair = (movement['investor_id'], movement['stock_id'])
+            day = movement['date_of_occurrence'].date()
+            delta = deltas.setdefault(pair, {}).setdefault(day, [0, 0, movement['date_of_occurrence']])
+            delta[0] += movement['stock_value_cents']
+            delta[1] += 1
+            if _naive(movement['date_of_occurrence']) > _naive(delta[2]):
+                delta[2] = movement['date_of_occurrence']
+
+        existing: Dict[Tuple[int, int], Dict] = {}
+        pairs = list(deltas)
+        for start in range(0, len(pairs), 500):
+            snapshots = db.query(PositionSnapshot).filter(
+                tuple_(PositionSnapshot.investor_id, PositionSnapshot.stock_id).in_(pairs[start:start + 500])
+            )
+            for snapshot in snapshots:
+                existing.setdefault((snapshot.investor_id, snapshot.stock_id), {})[snapshot.snapshot_date] = snapshot
+
+        new_snapshots = []
+        for pair, pair_deltas in deltas.items():
+            pair_snapshots = existing.get(pair, {})
+            previous_total, previous_count = 0, 0
+            added_total, added_count = 0, 0
+
+            for day in sorted(set(pair_snapshots) | set(pair_deltas)):
+                delta = pair_deltas.get(day)
+                if delta:
+                    added_total += delta[0]
+                    added_count += delta[1]
+
+                snapshot = pair_snapshots.get(day)
+                if snapshot is None:
+                    new_snapshots.append({
+                        'snapshot_date': day,
+                        'investor_id': pair[0],
+                        'stock_id': pair[1],
+                        'total_value_cents': previous_total + added_total,
+                        'movements_count': previous_count + added_count,
+                        'last_date_of_occurrence': delta[2]
+                    })
+                    continue
+
+                previous_total, previous_count = snapshot.total_value_cents, snapshot.movements_count
+                snapshot.total_value_cents += added_total
+                snapshot.movements_count += added_count
+                if delta and _naive(delta[2]) > _naive(snapshot.last_date_of_occurrence):
+                    snapshot.last_date_of_occurrence = delta[2]
+
+        if new_snapshots:
+            db.bulk_insert_mappings(PositionSnapshot, new_snapshots)
+        # Grava os snapshots alterados já: até o flush a sessão os mantém em memória, e um
+        # lote grande (importações) acumularia todos os snapshots carregados até o commit
+        db.flush()
+
+        totals = []
+        for (investor_id, stock_id), pair_deltas in deltas.items():
+            totals.append({
+                'investor_id': investor_id,
+                'stock_id': stock_id,
+                'total_value_cents': sum(delta[0] for delta in pair_deltas.values()),
+                'movements_count': sum(delta[1] for delta in pair_deltas.values()),
+                'last_date_of_occurrence': max((delta[2] for delta in pair_deltas.values()), key=_naive)
+            })
+        self._add_to_totals(db, totals)
+
+    def get_positions_as_of(self, db: Session, as_of: datetime, investor_ids: Optional[List[int]] = None) -> List[Dict]:
+        """
+        Posições de todos os investidores em uma data/hora
+
+        Para cada par (investidor, ação) de position_totals, busca pelo índice único
+        (investor_id, stock_id, snapshot_date) o último snapshot anterior ao dia de
+        `as_of` e reaplica apenas os movimentos do próprio dia até `as_of`. O custo
+        cresce com o número de pares e com os movimentos do dia, não com a
+        quantidade de snapshots diários. Os valores das posições vêm em centavos
+        ('total_value_cents').
+        """
+        day_start = datetime.combine(as_of.date(), time.min)
+
+        previous = aliased(PositionSnapshot)
+        latest_date = select(previous.snapshot_date).where(
+            previous.investor_id == PositionTotal.investor_id,
+            previous.stock_id == PositionTotal.stock_id,
+            previous.snapshot_date < as_of.date()
+        ).order_by(previous.snapshot_date.desc()).limit(1).correlate(PositionTotal).scalar_subquery()
+
+        snapshot_query = db.query(
+            PositionSnapshot.investor_id,
+            Investor.name,
+            PositionSnapshot.stock_id,
+            Stock.symbol,
+            Stock.name,
+            PositionSnapshot.total_value_cents,
+            PositionSnapshot.movements_count,
+            PositionSnapshot.last_date_of_occurrence
+        ).select_from(PositionTotal).join(PositionSnapshot, and_(
+            PositionSnapshot.investor_id == PositionTotal.investor_id,
+            PositionSnapshot.stock_id == PositionTotal.stock_id,
+            PositionSnapshot.snapshot_date == latest_date
+        )).join(Investor, Investor.id == PositionTotal.investor_id
+        ).join(Stock, Stock.id == PositionTotal.stock_id)
+        if investor_ids is not None:
+            snapshot_query = snapshot_query.filter(PositionTotal.investor_id.in_(investor_ids))
+
+        same_day_query = db.query(
+            Movement.investor_id,
+            Investor.name,
+            Movement.stock_id,
+            Stock.symbol,
+            Stock.name,
+            Movement.stock_value_cents,
+            Movement.date_of_occurrence
+        ).join(Investor, Investor.id == Movement.investor_id
+        ).join(Stock, Stock.id == Movement.stock_id).filter(
+            Movement.date_of_occurrence >= day_start,
+            Movement.date_of_occurrence <= as_of
+        )
+        if investor_ids is not None:
+            same_day_query = same_day_query.filter(Movement.investor_id.in_(investor_ids))
+
+        with stage("positions.query"):
+            snapshot_rows = snapshot_query.all()
+            same_day_rows = same_day_query.all()
+
+        with stage("positions.build"):
+            positions: Dict[Tuple[int, int], Dict] = {}
+            for investor_id, investor_name, stock_id, symbol, stock_name, total_cents, count, last_date in snapshot_rows:
+                positions[(investor_id, stock_id)] = self._position(
+                    investor_id, investor_name, stock_id, symbol, stock_name, total_cents, count, last_date
+                )
+
+            for investor_id, investor_name, stock_id, symbol, stock_name, value_cents, date_of_occurrence in same_day_rows:
+                key = (investor_id, stock_id)
+                if key not in positions:
+                    positions[key] = self._position(
+                        investor_id, investor_name, stock_id, symbol, stock_name, 0, 0, date_of_occurrence
+                    )
+                position = positions[key]
+                position['total_value_cents'] += value_cents
+                position['movements_count'] += 1
+                position['last_date_of_occurrence'] = max(position['last_date_of_occurrence'], date_of_occurrence)
+
+            return [positions[key] for key in sorted(positions)]
+
+    def get_totals(self, db: Session, investor_id: int) -> List[Dict]:
+        """
+        Posição corrente do investidor em cada ação, lida de position_totals
+
+        O custo é proporcional ao número de ações em carteira, não ao de movimentos.
+        Os valores vêm em centavos ('total_value_cents').
+        """
+        rows = db.query(
+            PositionTotal.stock_id,
+            Stock.symbol,
+            Stock.name,
+            Investor.name,
+            PositionTotal.total_value_cents,
+            PositionTotal.movements_count,
+            PositionTotal.last_date_of_occurrence
+        ).join(Stock, Stock.id == PositionTotal.stock_id
+        ).join(Investor, Investor.id == PositionTotal.investor_id).filter(
+            PositionTotal.investor_id == investor_id
+        ).order_by(PositionTotal.stock_id).all()
+
+        return [
+            self._position(investor_id, investor_name, stock_id, symbol, stock_name, total_cents, count, last_date)
+            for stock_id, symbol, stock_name, investor_name, total_cents, count, last_date in rows
+        ]
+
+    def check_totals(self, db: Session) -> List[Dict]:
+        """
+        Compara position_totals com as posições recalculadas a partir dos movimentos
+
+        Returns:
+            Divergências por (investidor, ação), com os valores esperados
+            ('expected', do histórico) e os gravados ('actual'); None indica
+            linha ausente de um dos lados. Lista vazia quando a tabela está consistente.
+        """
+        expected = {
+            (investor_id, stock_id): (total_cents, count, _naive(last_date))
+            for investor_id, stock_id, total_cents, count, last_date in db.execute(self._totals_from_ledger())
+        }
+        actual = {
+            (investor_id, stock_id): (total_cents, count, _naive(last_date))
+            for investor_id, stock_id, total_cents, count, last_date in db.query(
+                PositionTotal.investor_id,
+                PositionTotal.stock_id,
+                PositionTotal.total_value_cents,
+                PositionTotal.movements_count,
+                PositionTotal.last_date_of_occurrence
+            )
+        }
+
+        differences = []
+        for pair in sorted(set(expected) | set(actual)):
+            if expected.get(pair) != actual.get(pair):
+                differences.append({
+                    'investor_id': pair[0],
+                    'stock_id': pair[1],
+                    'expected': self._total_values(expected.get(pair)),
+                    'actual': self._total_values(actual.get(pair))
+                })
+        return differences
+
+    def rebuild_totals(self, db: Session) -> int:
+        """Recria position_totals a partir do histórico de movimentos (sem commit)"""
+        db.query(PositionTotal).delete(synchronize_session=False)
+        db.execute(insert(PositionTotal).from_select(
+            ['investor_id', 'stock_id', 'total_value_cents', 'movements_count', 'last_date_of_occurrence'],
+            self._totals_from_ledger()
+        ))
+        return db.query(func.count(PositionTotal.id)).scalar()
+
+    def check_snapshots(self, db: Session) -> List[Dict]:
+        """
+        Compara position_snapshots com os snapshots recalculados a partir dos movimentos
+
+        Os dois lados são lidos na ordem (investidor, ação, dia) e comparados em
+        sequência, sem carregar a tabela inteira em memória.
+
+        Returns:
+            Divergências por (investidor, ação, dia), no mesmo formato de check_totals
+        """
+        actual_rows = db.query(
+            PositionSnapshot.investor_id,
+            PositionSnapshot.stock_id,
+            PositionSnapshot.snapshot_date,
+            PositionSnapshot.total_value_cents,
+            PositionSnapshot.movements_count,
+            PositionSnapshot.last_date_of_occurrence
+        ).order_by(PositionSnapshot.investor_id, PositionSnapshot.stock_id, PositionSnapshot.snapshot_date)
+
+        expected_iter = (
+            ((snapshot['investor_id'], snapshot['stock_id'], snapshot['snapshot_date']),
+             (snapshot['total_value_cents'], snapshot['movements_count'], _naive(snapshot['last_date_of_occurrence'])))
+            for snapshot in self._snapshots_from_ledger(db)
+        )
+        actual_iter = (
+            ((investor_id, stock_id, snapshot_date), (total_cents, count, _naive(last_date)))
+            for investor_id, stock_id, snapshot_date, total_cents, count, last_date in actual_rows.yield_per(10000)
+        )
+
+        differences = []
+        expected, actual = next(expected_iter, None), next(actual_iter, None)
+        while expected is not None or actual is not None:
+            if actual is None or (expected is not None and expected[0] < actual[0]):
+                key, expected_values, actual_values = expected[0], expected[1], None
+                expected = next(expected_iter, None)
+            elif expected is None or actual[0] < expected[0]:
+                key, expected_values, actual_values = actual[0], None, actual[1]
+                actual = next(actual_iter, None)
+            else:
+                key, expected_values, actual_values = expected[0], expected[1], actual[1]
+                expected, actual = next(expected_iter, None), next(actual_iter, None)
+
+            if expected_values != actual_values:
+                differences.append({
+                    'investor_id': key[0],
+                    'stock_id': key[1],
+                    'snapshot_date': key[2],
+                    'expected': self._total_values(expected_values),
+                    'actual': self._total_values(actual_values)
+                })
+        return differences
+
+    def rebuild(self, db: Session) -> int:
+        """
+        Recria todos os snapshots e a tabela de posições correntes a partir do
+        histórico de movimentos (com commit)
+
+        Returns:
+            Quantidade de snapshots gravados
+        """
+        snapshots = list(self._snapshots_from_ledger(db))
+        db.query(PositionSnapshot).delete(synchronize_session=False)
+        if snapshots:
+            db.bulk_insert_mappings(PositionSnapshot, snapshots)
+        self.rebuild_totals(db)
+        db.commit()
+        return len(snapshots)
+
+    def _snapshots_from_ledger(self, db: Session) -> Iterator[Dict]:
+        """Snapshots diários recalculados dos movimentos, na ordem (investidor, ação, dia)"""
+        movements = db.query(
+            Movement.investor_id,
+            Movement.stock_id,
+            Movement.stock_value_cents,
+            Movement.date_of_occurrence
+        ).order_by(Movement.investor_id, Movement.stock_id, Movement.date_of_occurrence)
+
+        current = None
+        for investor_id, stock_id, value_cents, date_of_occurrence in movements.yield_per(10000):
+            snapshot_date = date_of_occurrence.date()
+            same_pair = current is not None and current['investor_id'] == investor_id and current['stock_id'] == stock_id
+
+            if not same_pair or current['snapshot_date'] != snapshot_date:
+                if current is not None:
+                    yield current
+                current = {
+                    'snapshot_date': snapshot_date,
+                    'investor_id': investor_id,
+                    'stock_id': stock_id,
+                    'total_value_cents': current['total_value_cents'] if same_pair else 0,
+                    'movements_count': current['movements_count'] if same_pair else 0,
+                    'last_date_of_occurrence': date_of_occurrence
+                }
+
+            current['total_value_cents'] += value_cents
+            current['movements_count'] += 1
+            current['last_date_of_occurrence'] = date_of_occurrence
+
+        if current is not None:
+            yield current
+
+    def _add_to_totals(self, db: Session, totals: List[Dict]) -> None:
+        """Soma deltas por (investidor, ação) em position_totals, criando as linhas que faltam"""
+        if not totals:
+            return
+
+        upsert = UPSERT_INSERTS[db.get_bind().dialect.name](PositionTotal)
+        excluded = upsert.excluded
+        db.execute(upsert.on_conflict_do_update(
+            index_elements=[PositionTotal.investor_id, PositionTotal.stock_id],
+            set_={
+                'total_value_cents': PositionTotal.total_value_cents + excluded.total_value_cents,
+                'movements_count': PositionTotal.movements_count + excluded.movements_count,
+                'last_date_of_occurrence': case(
+                    (excluded.last_date_of_occurrence > PositionTotal.last_date_of_occurrence, excluded.last_date_of_occurrence),
+                    else_=PositionTotal.last_date_of_occurrence
+                )
+            }
+        ), totals)
+
+    def _totals_from_ledger(self):
+        return select(
+            Movement.investor_id,
+            Movement.stock_id,
+            func.sum(Movement.stock_value_cents),
+            func.count(Movement.id),
+            func.max(Movement.date_of_occurrence)
+        ).group_by(Movement.investor_id, Movement.stock_id)
+
+    def _total_values(self, values: Optional[Tuple]) -> Optional[Dict]:
+        if values is None:
+            return None
+        total_cents, movements_count, last_date = values
+        return {
+            'total_value_cents': total_cents,
+            'movements_count': movements_count,
+            'last_date_of_occurrence': last_date
+        }
+
+    def _position(self, investor_id: int, investor_name: str, stock_id: int, symbol: str, stock_name: str,
+                  total_value_cents: int, movements_count: int, last_date: datetime) -> Dict:
+        return {
+            'investor_id': investor_id,
+            'investor_name': investor_name,
+            'stock_id': stock_id,
+            'stock_symbol': symbol,
+            'stock_name': stock_name,
+            'total_value_cents': total_value_cents,
+            'movements_count': movements_count,
+            'last_date_of_occurrence': last_date
+        }
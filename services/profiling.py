@@ -0,0 +1,68 @@
+from contextlib import contextmanager
+from typing import Iterator, Optional
+from datetime import datetime
+import cProfile
+import os
+import re
+from config import PROFILE_DIR
+
+PROFILER_KINDS = ("cprofile", "pyinstrument")
+
+
+class RequestProfile:
+    """Profiler de uma requisição; `path` é preenchido ao final do profiling"""
+
+    def __init__(self, kind: str, profiler):
+        self.kind = kind
+        self.profiler = profiler
+        self.path: Optional[str] = None
+
+
+def create_profile(kind: str) -> RequestProfile:
+    """
+    Cria o profiler do tipo pedido, sem iniciá-lo
+
+    `cprofile` gera um arquivo .prof (abrir com pstats ou snakeviz) e
+    `pyinstrument` um .html. O cProfile mede a thread inteira, então
+    requisições concorrentes no mesmo event loop também aparecem no resultado.
+
+    Raises:
+        ValueError: Tipo de profiler desconhecido ou pyinstrument não instalado
+    """
+    if kind not in PROFILER_KINDS:
+        raise ValueError(f"Profiler desconhecido '{kind}', use um de: {', '.join(PROFILER_KINDS)}")
+
+    if kind == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise ValueError("pyinstrument não está instalado (pip install pyinstrument)")
+        return RequestProfile(kind, Profiler(async_mode="enabled"))
+    return RequestProfile(kind, cProfile.Profile())
+
+
+@contextmanager
+def profile_request(profile: RequestProfile, label: str) -> Iterator[RequestProfile]:
+    """Faz o profiling do bloco com `profile` (de create_profile) e grava o resultado em PROFILE_DIR"""
+    kind, profiler = profile.kind, profile.profiler
+    if kind == "pyinstrument":
+        profiler.start()
+    else:
+        profiler.enable()
+    try:
+        yield profile
+    finally:
+        if kind == "pyinstrument":
+            profiler.stop()
+        else:
+            profiler.disable()
+
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        name = re.sub(r"[^A-Za-z0-9_.-]+", "_", label).strip("_") or "root"
+        stamp = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+        profile.path = os.path.join(PROFILE_DIR, f"{stamp}_{name}.{'html' if kind == 'pyinstrument' else 'prof'}")
+        if kind == "pyinstrument":
+            with open(profile.path, "w", encoding="utf-8") as file:
+                file.write(profiler.output_html())
+        else:
+            profiler.dump_stats(profile.path)
@@ -0,0 +1,208 @@
+from sqlalchemy.orm import Session
+from typing import BinaryIO, Dict, Iterator, Optional
+import csv
+import io
+import time
+from models.portfolio_models import FeeCalculationByDateRequest
+from services.movement_service import MovementService, DEFAULT_BULK_CHUNK_SIZE
+from services.portfolio_fee_service import PortfolioFeeService
+from services.metrics import registry, stage
+
+SPREADSHEET_FORMATS = ("csv", "xlsx")
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+FEE_EXPORT_COLUMNS = (
+    "investor_id", "investor_name", "calculation_date", "taxa",
+    "total_portfolio_value", "total_fees", "movements_count", "stocks_count"
+)
+
+spreadsheet_rows_total = registry.counter(
+    "sparta_spreadsheet_rows_total", "Linhas lidas ou gravadas em planilhas", ("operation", "format"))
+
+
+def spreadsheet_format(content_type: Optional[str], requested: Optional[str] = None) -> str:
+    """
+    Formato da planilha: o parâmetro explícito tem precedência sobre o Content-Type
+
+    Raises:
+        ValueError: Formato não suportado
+    """
+    if requested:
+        if requested not in SPREADSHEET_FORMATS:
+            raise ValueError(f"Formato não suportado: {requested} (use {' ou '.join(SPREADSHEET_FORMATS)})")
+        return requested
+
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    for file_format, known_type in MEDIA_TYPES.items():
+        if media_type == known_type:
+            return file_format
+    raise ValueError(f"Content-Type não suportado: {media_type or 'ausente'} (use {MEDIA_TYPES['csv']} ou "
+                     f"{MEDIA_TYPES['xlsx']}, ou informe format)")
+
+
+def _load_openpyxl():
+    try:
+        import openpyxl
+    except ImportError:
+        raise ValueError("openpyxl não está instalado (pip install openpyxl); use o formato csv")
+    return openpyxl
+
+
+def _rate(rows: int, elapsed: float) -> Dict:
+    return {
+        "rows": rows,
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(rows / elapsed, 1) if elapsed > 0 else 0.0
+    }
+
+
+class SpreadsheetService:
+    """
+    Importação de movimentações e exportação de taxas em CSV ou Excel (.xlsx)
+
+    As planilhas são lidas e gravadas linha a linha a partir de arquivos (o
+    controlador grava o upload em disco antes): o openpyxl trabalha em modo
+    read_only/write_only, então a memória não cresce com o número de linhas.
+    """
+
+    def __init__(self):
+        self.movement_service = MovementService()
+        self.portfolio_fee_service = PortfolioFeeService()
+
+    def iter_rows(self, file: BinaryIO, file_format: str) -> Iterator[Dict]:
+        """Linhas da planilha como dicts, com as chaves do cabeçalho (primeira linha) em minúsculas"""
+        if file_format == "csv":
+            return self._iter_csv(file)
+        return self._iter_xlsx(file)
+
+    def _iter_csv(self, file: BinaryIO) -> Iterator[Dict]:
+        text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+        try:
+            reader = csv.DictReader(text)
+            if reader.fieldnames:
+                reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+            yield from reader
+        finally:
+            text.detach()
+
+    def _iter_xlsx(self, file: BinaryIO) -> Iterator[Dict]:
+        openpyxl = _load_openpyxl()
+        try:
+            workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+        except Exception as e:
+            raise ValueError(f"Arquivo .xlsx inválido: {e}")
+
+        try:
+            sheet = workbook.active
+            # Algumas ferramentas gravam a dimensão da planilha errada; no modo read_only ela limitaria a leitura
+            sheet.reset_dimensions()
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            columns = [str(name).strip().lower() if name is not None else None for name in header]
+            for values in rows:
+                if all(value is None for value in values):
+                    continue
+                yield {column: value for column, value in zip(columns, values) if column is not None}
+        finally:
+            workbook.close()
+
+    def import_movements(self, db: Session, file: BinaryIO, file_format: str,
+                         chunk_size: int = DEFAULT_BULK_CHUNK_SIZE) -> Dict:
+        """
+        Importa as movimentações de uma planilha pelo caminho em lote do MovementService
+
+        A planilha precisa das colunas investor_id, stock_id, stock_value e
+        date_of_occurrence. As linhas são lidas sob demanda e inseridas em blocos
+        de `chunk_size`, em uma única transação; linhas inválidas são reportadas.
+
+        Returns:
+            Inseridas, rejeitadas, erros por linha (a partir de 0, sem o cabeçalho) e linhas por segundo
+        """
+        if file_format == "xlsx":
+            _load_openpyxl()
+
+        counter = {"rows": 0}
+
+        def counted(rows: Iterator[Dict]) -> Iterator[Dict]:
+            for row in rows:
+                counter["rows"] += 1
+                yield row
+
+        started = time.perf_counter()
+        with stage("import"):
+            inserted, errors = self.movement_service.create_movements_bulk(
+                db, counted(self.iter_rows(file, file_format)), chunk_size
+            )
+        spreadsheet_rows_total.inc("import", file_format, amount=counter["rows"])
+
+        return {
+            "inserted": inserted,
+            "failed": len(errors),
+            "errors": errors,
+            **_rate(counter["rows"], time.perf_counter() - started)
+        }
+
+    def export_fees(self, db: Session, request: FeeCalculationByDateRequest, file_format: str, output: BinaryIO) -> Dict:
+        """
+        Grava em `output` as taxas por investidor de /calculate-fees/by-date
+
+        As taxas vêm de PortfolioFeeService.iter_fees_by_date, em lotes e fora do
+        cache de resultados: a lista completa não fica em memória.
+
+        Returns:
+            Linhas gravadas (sem o cabeçalho), tempo total e linhas por segundo
+        """
+        if file_format == "xlsx":
+            _load_openpyxl()
+
+        started = time.perf_counter()
+        investor_fees = self.portfolio_fee_service.iter_fees_by_date(db, request)
+
+        with stage("export"):
+            rows = (
+                (
+                    investor_fee['investor_id'], investor_fee['investor_name'], investor_fee['calculation_date'],
+                    investor_fee['taxa'], investor_fee['total_portfolio_value'], investor_fee['total_fees'],
+                    investor_fee['movements_count'], investor_fee['stocks_count']
+                )
+                for investor_fee in investor_fees
+            )
+            if file_format == "csv":
+                written = self._write_csv(output, rows)
+            else:
+                written = self._write_xlsx(output, rows)
+        spreadsheet_rows_total.inc("export", file_format, amount=written)
+
+        return _rate(written, time.perf_counter() - started)
+
+    def _write_csv(self, output: BinaryIO, rows: Iterator[tuple]) -> int:
+        text = io.TextIOWrapper(output, encoding="utf-8", newline="")
+        try:
+            writer = csv.writer(text)
+            writer.writerow(FEE_EXPORT_COLUMNS)
+            written = 0
+            for row in rows:
+                writer.writerow(value.isoformat() if hasattr(value, "isoformat") else value for value in row)
+                written += 1
+            text.flush()
+        finally:
+            text.detach()
+        return written
+
+    def _write_xlsx(self, output: BinaryIO, rows: Iterator[tuple]) -> int:
+        openpyxl = _load_openpyxl()
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet("Taxas")
+        sheet.append(FEE_EXPORT_COLUMNS)
+        written = 0
+        for row in rows:
+            sheet.append(row)
+            written += 1
+        workbook.save(output)
+        return written
@@ -2,6 +2,9 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 from database.models import Stock
 from models.portfolio_models import StockCreate, StockResponse
+from services.cache import TTLCache
+
+stock_cache = TTLCache("stocks", maxsize=1000, ttl=300.0)
 
 class StockService:
     
@@ -13,10 +16,23 @@ class StockService:
         db.add(db_stock)
         db.commit()
         db.refresh(db_stock)
+        stock_cache.clear()
         return db_stock
     
-    def get_stock_by_symbol(self, db: Session, symbol: str) -> Optional[Stock]:
-        return db.query(Stock).filter(Stock.symbol == symbol.upper()).first()
+    def get_stock(self, db: Session, stock_id: int) -> Optional[StockResponse]:
+        return stock_cache.get_or_load(
+            ("id", stock_id),
+            lambda: self._to_response(db.query(Stock).filter(Stock.id == stock_id).first())
+        )
+    
+    def get_stock_by_symbol(self, db: Session, symbol: str) -> Optional[StockResponse]:
+        return stock_cache.get_or_load(
+            ("symbol", symbol.upper()),
+            lambda: self._to_response(db.query(Stock).filter(Stock.symbol == symbol.upper()).first())
+        )
+    
+    def _to_response(self, stock: Optional[Stock]) -> Optional[StockResponse]:
+        return StockResponse.model_validate(stock) if stock else None
     
     def get_stocks(self, db: Session) -> List[Stock]:
         return db.query(Stock).all()
@@ -0,0 +1,128 @@
+"""
+Equivalência do motor vetorizado de FeeCalculationService com
+calculate_fees_reference (laço puro em Python)
+"""
+import random
+
+import numpy as np
+import pytest
+
+from services.fee_calculation_service import FeeCalculationService
+
+service = FeeCalculationService()
+
+
+def random_cotas(rng: random.Random, dias: int, investidores: int, escala: float) -> list:
+    return [
+        {
+            "valor": round(rng.uniform(0.01, escala), 4),
+            "quantidades": [rng.choice([0.0, round(rng.uniform(0, escala), 2)]) for _ in range(investidores)]
+        }
+        for _ in range(dias)
+    ]
+
+
+def as_arrays(cotas: list) -> tuple:
+    valores = np.array([cota["valor"] for cota in cotas], dtype=np.float64)
+    quantidades = np.array([cota["quantidades"] for cota in cotas], dtype=np.float64)
+    return valores, quantidades
+
+
+def accumulated(taxa: float, cotas: list) -> list:
+    accumulator = service.create_accumulator(taxa)
+    for cota in cotas:
+        accumulator.add(cota["valor"], cota["quantidades"])
+    return accumulator.result()
+
+
+def assert_all_paths_match(taxa: float, cotas: list) -> None:
+    expected = service.calculate_fees_reference(taxa, cotas)
+    valores, quantidades = as_arrays(cotas)
+
+    assert service.calculate_fees(taxa, cotas) == expected
+    assert service.calculate_fees_array(taxa, valores, quantidades) == expected
+    assert accumulated(taxa, cotas) == expected
+    assert service.calculate_fees_batch([(taxa, valores, quantidades)]) == [expected]
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_random_inputs_match_reference(seed):
+    rng = random.Random(seed)
+    # Mais dias que FeeCalculationService.BLOCO_DIAS em parte dos casos, para cobrir vários blocos
+    cotas = random_cotas(rng, dias=rng.randint(1, 200), investidores=rng.randint(1, 40), escala=rng.choice([10, 1000, 1e5]))
+    assert_all_paths_match(round(rng.uniform(0, 0.05), 4), cotas)
+
+
+def test_batch_matches_reference_per_fund():
+    rng = random.Random(99)
+    funds = [(round(rng.uniform(0, 0.05), 4), random_cotas(rng, rng.randint(1, 100), rng.randint(1, 20), 1000))
+             for _ in range(5)]
+
+    batch = service.calculate_fees_batch([(taxa, *as_arrays(cotas)) for taxa, cotas in funds])
+
+    assert batch == [service.calculate_fees_reference(taxa, cotas) for taxa, cotas in funds]
+
+
+@pytest.mark.parametrize("cotas", [
+    # valor x quantidade em centavos acima de int64
+    [{"valor": 1e9, "quantidades": [1e9, 1.0]}],
+    # saldos diários (1e15 centavos) abaixo de 2^53, mas a soma de um bloco acima
+    [{"valor": 1e4, "quantidades": [1e9, 3.0]} for _ in range(100)],
+    # blocos abaixo de 2^53 (1e14 por dia), total acima de int64 só depois de ~92 mil dias
+    [{"valor": 1e3, "quantidades": [1e9, 0.5]} for _ in range(100000)],
+])
+def test_large_values_use_exact_fallback(cotas, monkeypatch):
+    exact = FeeCalculationService._totais_em_centavos_exatos
+    calls = []
+
+    def spy(self, valores, quantidades):
+        calls.append(len(valores))
+        return exact(self, valores, quantidades)
+
+    monkeypatch.setattr(FeeCalculationService, "_totais_em_centavos_exatos", spy)
+    assert_all_paths_match(0.01, cotas)
+    assert calls, "o caso deveria usar a soma exata em inteiros do Python"
+
+
+def test_large_values_in_batch_with_regular_fund():
+    large = [{"valor": 1e9, "quantidades": [1e9, 1.0]}]
+    regular = [{"valor": 101.5, "quantidades": [10.0, 25.0, 30.0]}]
+
+    batch = service.calculate_fees_batch([(0.01, *as_arrays(large)), (0.02, *as_arrays(regular))])
+
+    assert batch == [service.calculate_fees_reference(0.01, large), service.calculate_fees_reference(0.02, regular)]
+
+
+def test_mixed_sign_balances_match_reference():
+    # Só pelo motor (a API rejeita quantidades negativas): somas parciais que se cancelam acima de 2^53
+    cotas = [{"valor": 1e7, "quantidades": [1e9, 2.0]}, {"valor": 1e7, "quantidades": [-1e9, 3.0]},
+             {"valor": 1.0, "quantidades": [0.01, 4.0]}]
+    valores, quantidades = as_arrays(cotas)
+
+    assert service.calculate_fees_array(0.01, valores, quantidades) == service.calculate_fees_reference(0.01, cotas)
+
+
+@pytest.mark.parametrize("taxa, centavos, esperado", [
+    # taxa 0.0252 -> fator 0.01: empates exatos em 0.5 unidade de 10^-4 arredondam para o par
+    (0.0252, 50, 0.0),
+    (0.0252, 150, 0.0002),
+    (0.0252, 250, 0.0002),
+    (0.0252, 75, 0.0001),
+    (0.0504, 25, 0.0),
+    (0.0504, 75, 0.0002),
+    (0.126, 50, 0.0002),
+    (0.126, 150, 0.0008),
+])
+def test_fee_rounding_edges(taxa, centavos, esperado):
+    # valor 1.0 e quantidade em reais: o total do investidor é exatamente `centavos`
+    cotas = [{"valor": 1.0, "quantidades": [centavos / 100]}]
+
+    assert service.calculate_fees_reference(taxa, cotas) == [esperado]
+    assert_all_paths_match(taxa, cotas)
+
+
+def test_non_finite_products_are_rejected():
+    with pytest.raises(ValueError):
+        service.calculate_fees(0.01, [{"valor": 1e200, "quantidades": [1e200]}])
+    with pytest.raises(ValueError):
+        accumulated(0.01, [{"valor": 1e200, "quantidades": [1e200]}])
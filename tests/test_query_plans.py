@@ -0,0 +1,35 @@
+"""
+Regressão de planos de consulta (benchmarks/check_query_plans.py)
+
+Popular o banco leva tempo, então o teste só roda com SPARTA_QUERY_PLAN_ROWS
+definida com a quantidade de movimentações:
+
+    SPARTA_QUERY_PLAN_ROWS=1000000 python -m pytest tests/test_query_plans.py
+"""
+import os
+
+import pytest
+
+import database.database as database
+from benchmarks.check_query_plans import build_database, collect_plans, service_queries
+
+ROWS = int(os.environ.get("SPARTA_QUERY_PLAN_ROWS") or 0)
+
+pytestmark = pytest.mark.skipif(not ROWS, reason="defina SPARTA_QUERY_PLAN_ROWS para verificar os planos de consulta")
+
+
+@pytest.fixture(scope="module")
+def plans(tmp_path_factory):
+    original_engine = database.engine
+    engine = build_database(str(tmp_path_factory.mktemp("plans") / "query_plans.db"), ROWS, 10_000, 50)
+    try:
+        yield {name: (query_plans, scans) for name, query_plans, scans in collect_plans(engine)}
+    finally:
+        database.engine = original_engine
+        engine.dispose()
+
+
+@pytest.mark.parametrize("name", [name for name, _ in service_queries()])
+def test_query_does_not_scan_large_tables(plans, name):
+    query_plans, scans = plans[name]
+    assert not scans, "\n".join(["Varreduras inesperadas:", *scans, "Planos:", *(line for plan in query_plans for line in plan)])